@@ -1,4 +1,54 @@
 import { Redis } from '@upstash/redis';
+import { createHash } from 'node:crypto';
+import zlib from 'node:zlib';
+
+const ITEMS_HASH_KEY = 'cache:inventory_items';
+const ITEMS_VERSION_KEY = 'cache:inventory_items:version';
+const ALL_ITEMS_BLOB_KEY = 'cache:all_inventory_items';
+const STATS_KEY = 'cache:inventory_stats';
+
+// Versioned cache envelope written by the bridge (supa/cache_payload.py)
+interface CachePayload {
+  format: number;
+  etag: string;
+  count: number | null;
+  encoding: 'identity' | 'gzip' | 'zstd';
+  data: any;
+}
+
+// Unwraps the legacy blob; plain arrays written before the envelope existed are returned as they are
+function decodePayload(value: any): { data: any; etag: string | null } {
+  if (!value || typeof value !== 'object' || Array.isArray(value) || !('format' in value)) {
+    return { data: value ?? null, etag: null };
+  }
+  const payload = value as CachePayload;
+  if (payload.encoding === 'identity') {
+    return { data: payload.data, etag: payload.etag };
+  }
+  const compressed = Buffer.from(payload.data, 'base64');
+  let raw: Buffer;
+  if (payload.encoding === 'gzip') {
+    raw = zlib.gunzipSync(compressed);
+  } else if (payload.encoding === 'zstd' && typeof (zlib as any).zstdDecompressSync === 'function') {
+    raw = (zlib as any).zstdDecompressSync(compressed);
+  } else {
+    throw new Error(`Unsupported cache payload encoding '${payload.encoding}'`);
+  }
+  return { data: JSON.parse(raw.toString('utf8')), etag: payload.etag };
+}
+
+function weakEtag(...parts: any[]): string {
+  return `W/"${createHash('sha1').update(JSON.stringify(parts)).digest('hex').slice(0, 20)}"`;
+}
+
+function clientHasEtag(ifNoneMatch: string | undefined, etag: string): boolean {
+  if (!ifNoneMatch) return false;
+  const bare = etag.replace(/^W\//, '');
+  return ifNoneMatch.split(',').some((tag) => {
+    const candidate = tag.trim();
+    return candidate === '*' || candidate.replace(/^W\//, '') === bare;
+  });
+}
 
 // Helper to initialize Redis client, potentially memoized for warm functions
 let redis: Redis | null = null;
@@ -26,18 +76,69 @@ export default defineEventHandler(async (event) => {
     return { error: 'Redis not configured on server', items: null, stats: null, source: 'server-error' };
   }
 
+  const query = getQuery(event);
+  const itemId = query.id ? String(query.id) : null;
+
   try {
-    const pipeline = redisClient.pipeline();
-    pipeline.get("cache:all_inventory_items");
-    pipeline.get("cache:inventory_stats");
-    const [cachedItemsResult, cachedStatsResult] = await pipeline.exec<[any | null, any | null]>();
+    // Single item lookup straight from the per-item hash
+    if (itemId) {
+      const item = await redisClient.hget(ITEMS_HASH_KEY, itemId);
+      if (item) {
+        return { item, error: null, source: 'redis-cache' };
+      }
+      setResponseStatus(event, 404, 'Item not found in cache');
+      return { item: null, error: 'Cache miss', source: 'cache-miss' };
+    }
+
+    const ifNoneMatch = getRequestHeader(event, 'if-none-match');
+    let cachedItemsHash: Record<string, any> | null = null;
+    let cachedVersion: number | null;
+    let stats: any | null;
 
-    const items = cachedItemsResult || null;
-    const stats = cachedStatsResult || null;
+    if (ifNoneMatch) {
+      // Revalidation: check the version and stats first, and only read the whole hash if they changed
+      const head = redisClient.pipeline();
+      head.get(ITEMS_VERSION_KEY);
+      head.get(STATS_KEY);
+      [cachedVersion, stats] = await head.exec<[number | null, any | null]>();
+      if (cachedVersion != null) {
+        const etag = weakEtag(cachedVersion, stats);
+        if (clientHasEtag(ifNoneMatch, etag)) {
+          setResponseHeader(event, 'ETag', etag);
+          return sendNoContent(event, 304);
+        }
+      }
+      cachedItemsHash = await redisClient.hgetall<Record<string, any>>(ITEMS_HASH_KEY);
+    } else {
+      const pipeline = redisClient.pipeline();
+      pipeline.hgetall(ITEMS_HASH_KEY);
+      pipeline.get(ITEMS_VERSION_KEY);
+      pipeline.get(STATS_KEY);
+      [cachedItemsHash, cachedVersion, stats] =
+        await pipeline.exec<[Record<string, any> | null, number | null, any | null]>();
+    }
+
+    let items: any[] | null = cachedItemsHash ? Object.values(cachedItemsHash) : null;
+    stats = stats || null;
+    // The hash is versioned by its counter, read before the items; the legacy blob carries a content hash
+    let etag: string | null = items && cachedVersion != null ? weakEtag(cachedVersion, stats) : null;
+
+    // Fall back to the legacy single-blob layout if the hash has not been written yet
+    if (!items) {
+      const blob = decodePayload(await redisClient.get(ALL_ITEMS_BLOB_KEY));
+      items = blob.data || null;
+      etag = blob.etag ? weakEtag(blob.etag, stats) : null;
+    }
 
     if (items || stats) {
-      console.log(`[API Route] Fetched from Redis: ${items ? items.length : 'no'} items, stats ${stats ? 'found' : 'not found'}`);
-      return { items, stats, error: null, source: 'redis-cache' };
+      if (etag) {
+        setResponseHeader(event, 'ETag', etag);
+        if (clientHasEtag(ifNoneMatch, etag)) {
+          return sendNoContent(event, 304);
+        }
+      }
+      console.log(`[API Route] Fetched from Redis: ${items ? items.length : 'no'} items (version ${cachedVersion ?? 'n/a'}), stats ${stats ? 'found' : 'not found'}`);
+      return { items, stats, version: cachedVersion ?? null, error: null, source: 'redis-cache' };
     }
 
     console.log('[API Route] Cache miss in Redis.');
@@ -1,25 +1,151 @@
-from flask import Flask, request, jsonify
+import os
+import hashlib
+import itertools
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from flask_socketio import SocketIO
+from flask_socketio import SocketIO, join_room, leave_room
 from dotenv import load_dotenv
 import database_operations as db
+import async_engine
+import metrics
+import serialization
+from broadcast import ALL_ITEMS_ROOM, stock_room
+from message_queue import socketio_options
 
 load_dotenv()
 
 app = Flask(__name__)
+app.json = serialization.FastJSONProvider(app)
 CORS(app)  
-socketio = SocketIO(app, cors_allowed_origins="*")
+# With several API workers, emits and room membership are shared through a message queue (message_queue.py)
+socketio = SocketIO(app, cors_allowed_origins="*", json=serialization.SocketIOJSON,
+                    **socketio_options(os.getenv("SOCKETIO_MESSAGE_QUEUE")))
+# Item changes go out as batched item_updates frames (broadcast.py); API writes and their NOTIFY echo are de-duplicated
+broadcaster = db.get_item_broadcaster(socketio)
+SHARED_MESSAGE_QUEUE = bool(os.getenv("SOCKETIO_MESSAGE_QUEUE"))
+
+def broadcasts_api_writes():
+    """Whether this worker broadcasts its own writes right away.
+
+    De-duplication is per process, so only the bridge leader (which also
+    broadcasts the NOTIFY echo) or a worker without a shared queue does;
+    other workers' clients get the leader's frame through the queue.
+    """
+    return db.bridge_leader.is_leader or not SHARED_MESSAGE_QUEUE
+
+DEFAULT_PAGE_SIZE = int(os.getenv("API_DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", "1000"))
+STREAM_BATCH_SIZE = int(os.getenv("API_STREAM_BATCH_SIZE", "1000"))
+
+def prefetch(batches):
+    """Start a batch generator now, so a failing query becomes an error response rather than a cut-off stream"""
+    first = next(batches, None)
+    if first is None:
+        return iter(())
+    return itertools.chain([first], batches)
+
+def stream_json_array(batches):
+    """Yield a JSON array chunk by chunk from batches of items"""
+    yield '['
+    first = True
+    for batch in batches:
+        for item in batch:
+            yield ('' if first else ',') + serialization.dumps(item)
+            first = False
+    yield ']'
+
+def stream_ndjson(batches):
+    """Yield one JSON document per line from batches of items"""
+    for batch in batches:
+        yield ''.join(serialization.dumps(item) + '\n' for item in batch)
+
+def items_etag(version):
+    """Weak ETag for an items response: the content version plus the query string (None without a version)"""
+    if version is None:
+        return None
+    return hashlib.sha1(f"{version}?{request.query_string.decode()}".encode()).hexdigest()[:20]
+
+def not_modified(etag):
+    """A 304 response if the client already has ``etag``, else None"""
+    if etag and request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+    return None
+
+def with_etag(response, etag):
+    if etag:
+        response.set_etag(etag, weak=True)
+    return response
+
+@socketio.on('connect')
+def on_connect():
+    """Every client gets all item updates until it subscribes to stock levels"""
+    join_room(ALL_ITEMS_ROOM)
+
+@socketio.on('subscribe_items')
+def on_subscribe_items(data):
+    """Only receive updates for items at the given stock levels: {"stock_levels": ["low", ...]}"""
+    levels = [level for level in (data or {}).get("stock_levels", []) if level in db.STOCK_LEVELS]
+    if not levels:
+        return {"error": f"stock_levels must be a non-empty subset of {list(db.STOCK_LEVELS)}"}
+    leave_room(ALL_ITEMS_ROOM)
+    for level in levels:
+        join_room(stock_room(level))
+    return {"subscribed": levels}
+
+@socketio.on('unsubscribe_items')
+def on_unsubscribe_items(data=None):
+    """Back to receiving every item update"""
+    for level in db.STOCK_LEVELS:
+        leave_room(stock_room(level))
+    join_room(ALL_ITEMS_ROOM)
+    return {"subscribed": "all"}
 
 @app.route('/api/items', methods=['GET'])
 def get_items():
-    """API endpoint to get all items"""
-    items = db.get_all_items()
-    return jsonify(items)
+    """API endpoint to get all items.
+
+    Filters: ?q= (name/SKU search), ?stock_level=low|medium|high,
+    ?min_rate= / ?max_rate=, ?sort=<field> or -<field>.
+    ?after=<item_id>&limit=<n> returns one keyset page, ?stream=ndjson streams
+    NDJSON; otherwise all matching items are streamed as a chunked JSON array.
+    Responses served from the in-memory snapshot carry an ETag; If-None-Match
+    is answered with 304.
+    """
+    etag = items_etag(db.get_items_version())
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    filters = {
+        "q": request.args.get('q') or None,
+        "stock_level": request.args.get('stock_level') or None,
+        "min_rate": request.args.get('min_rate', type=float),
+        "max_rate": request.args.get('max_rate', type=float),
+        "sort": request.args.get('sort') or None,
+    }
+    after = request.args.get('after', type=int)
+    limit = request.args.get('limit', type=int)
+    try:
+        if after is not None or limit is not None:
+            limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+            items = db.get_items_page(after, limit, **filters)
+            next_after = items[-1]["item_id"] if len(items) == limit else None
+            return with_etag(jsonify({"items": items, "next_after": next_after, "limit": limit}), etag)
+        batches = prefetch(db.iter_items(STREAM_BATCH_SIZE, **filters))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception:
+        return jsonify({"error": "Failed to read items"}), 500
+
+    if request.args.get('stream') == 'ndjson':
+        return with_etag(Response(stream_ndjson(batches), mimetype='application/x-ndjson'), etag)
+    return with_etag(Response(stream_json_array(batches), mimetype='application/json'), etag)
 
 @app.route('/api/items/<int:item_id>', methods=['GET'])
 def get_item(item_id):
     """API endpoint to get a specific item"""
-    item = db.get_item_by_id(item_id)
+    item = db.get_item(item_id)
     if item:
         return jsonify(item)
     return jsonify({"error": "Item not found"}), 404
@@ -33,7 +159,8 @@ def create_item():
     
     item = db.insert_item(data)
     if item:
-        socketio.emit('item_update', {'operation': 'INSERT', 'item': item})
+        if broadcasts_api_writes():
+            broadcaster.publish('INSERT', item=item)
         return jsonify(item), 201
     return jsonify({"error": "Failed to create item"}), 500
 
@@ -46,7 +173,8 @@ def update_item_endpoint(item_id):
     
     updated_item = db.update_item(item_id, data)
     if updated_item:
-        socketio.emit('item_update', {'operation': 'UPDATE', 'item': updated_item})
+        if broadcasts_api_writes():
+            broadcaster.publish('UPDATE', item_id, item=updated_item)
         return jsonify(updated_item)
     return jsonify({"error": "Item not found or update failed"}), 404
 
@@ -55,6 +183,194 @@ def delete_item_endpoint(item_id):
     """API endpoint to delete an item"""
     success = db.delete_item(item_id)
     if success:
-        socketio.emit('item_update', {'operation': 'DELETE', 'item_id': item_id})
+        if broadcasts_api_writes():
+            broadcaster.publish('DELETE', item_id)
         return jsonify({"success": True})
-    return jsonify({"error": "Item not found or delete failed"}), 404
\ No newline at end of file
+    return jsonify({"error": "Item not found or delete failed"}), 404
+
+def bulk_payload(data, key):
+    """Accept either a bare JSON list or an object wrapping the list under ``key``"""
+    if isinstance(data, dict):
+        data = data.get(key)
+    return data if isinstance(data, list) and data else None
+
+def as_int(value):
+    """An integer from a JSON number or numeric string, else None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().lstrip('-').isdigit():
+        return int(value)
+    return None
+
+def coerce_int_fields(items, fields):
+    """Convert ``fields`` of every item to int in place. Returns the index and field of the first bad value, or None"""
+    for index, item in enumerate(items):
+        for field in fields:
+            value = as_int(item[field])
+            if value is None:
+                return index, field
+            item[field] = value
+    return None
+
+def missing_item_fields(items, required):
+    """Return the index and missing fields of the first invalid item, or None"""
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            return index, list(required)
+        missing = [field for field in required if field not in item]
+        if missing:
+            return index, missing
+    return None
+
+@app.route('/api/items/bulk', methods=['POST'])
+def bulk_create_items():
+    """API endpoint to create many items in one transaction"""
+    items = bulk_payload(request.json, "items")
+    if not items:
+        return jsonify({"error": "No items provided"}), 400
+    invalid = missing_item_fields(items, db.ITEM_FIELDS)
+    if invalid:
+        return jsonify({"error": f"Item {invalid[0]} is missing fields: {', '.join(invalid[1])}"}), 400
+
+    created = db.bulk_insert_items(items)
+    if created is None:
+        return jsonify({"error": "Failed to create items"}), 500
+    if broadcasts_api_writes():
+        broadcaster.publish_many('INSERT', items=created)
+    return jsonify({"items": created, "count": len(created)}), 201
+
+@app.route('/api/items/bulk', methods=['PUT'])
+def bulk_update_items_endpoint():
+    """API endpoint to update many items in one transaction"""
+    items = bulk_payload(request.json, "items")
+    if not items:
+        return jsonify({"error": "No items provided"}), 400
+    invalid = missing_item_fields(items, ("item_id",) + db.ITEM_FIELDS)
+    if invalid:
+        return jsonify({"error": f"Item {invalid[0]} is missing fields: {', '.join(invalid[1])}"}), 400
+    invalid = coerce_int_fields(items, ("item_id", "stock on hand"))
+    if invalid:
+        return jsonify({"error": f"Item {invalid[0]} has a non-integer '{invalid[1]}'"}), 400
+
+    updated = db.bulk_update_items(items)
+    if updated is None:
+        return jsonify({"error": "Failed to update items"}), 500
+    if broadcasts_api_writes():
+        broadcaster.publish_many('UPDATE', items=updated)
+    return jsonify({"items": updated, "count": len(updated)})
+
+@app.route('/api/items/bulk', methods=['DELETE'])
+def bulk_delete_items_endpoint():
+    """API endpoint to delete many items in one statement"""
+    item_ids = bulk_payload(request.json, "item_ids")
+    if not item_ids:
+        return jsonify({"error": "No item_ids provided"}), 400
+    ids = [as_int(item_id) for item_id in item_ids]
+    if None in ids:
+        return jsonify({"error": f"Invalid item_id {item_ids[ids.index(None)]!r}"}), 400
+    item_ids = ids
+
+    deleted_ids = db.bulk_delete_items(item_ids)
+    if deleted_ids is None:
+        return jsonify({"error": "Failed to delete items"}), 500
+    if broadcasts_api_writes():
+        broadcaster.publish_many('DELETE', item_ids=deleted_ids)
+    return jsonify({"item_ids": deleted_ids, "count": len(deleted_ids)})
+
+@app.route('/api/pool/stats', methods=['GET'])
+def pool_stats():
+    """API endpoint to get PostgreSQL connection pool statistics"""
+    return jsonify(db.get_pool_stats())
+
+@app.route('/api/cache/rebuild-stats', methods=['GET'])
+def rebuild_stats():
+    """API endpoint to get Redis cache rebuild statistics"""
+    return jsonify(db.get_rebuild_stats())
+
+@app.route('/api/cache/stats-aggregator', methods=['GET'])
+def stats_aggregator_info():
+    """API endpoint to get incremental inventory stats counters"""
+    return jsonify(db.get_inventory_stats_info())
+
+@app.route('/api/cache/items', methods=['GET'])
+def get_cached_items():
+    """API endpoint to get all items from the Redis item cache (If-None-Match is checked against the version first)"""
+    cached = not_modified(items_etag(db.get_cached_items_version()))
+    if cached:
+        return cached
+    items, version = db.get_cached_items()
+    if items is None:
+        return jsonify({"error": "Cache not available"}), 503
+    return with_etag(jsonify({"items": items, "version": version}), items_etag(version))
+
+@app.route('/api/cache/items/<int:item_id>', methods=['GET'])
+def get_cached_item(item_id):
+    """API endpoint to get a specific item from the Redis item cache"""
+    item = db.get_cached_item(item_id)
+    if item:
+        return jsonify(item)
+    return jsonify({"error": "Item not found in cache"}), 404
+
+@app.route('/api/snapshot/stats', methods=['GET'])
+def snapshot_stats():
+    """API endpoint to get in-memory inventory snapshot size and counters"""
+    return jsonify(db.get_snapshot_stats())
+
+@app.route('/api/read-cache/stats', methods=['GET'])
+def read_cache_stats():
+    """API endpoint to get local read-through cache hit/miss/eviction counters"""
+    return jsonify(db.get_read_cache_stats())
+
+@app.route('/api/sync/stats', methods=['GET'])
+def sync_stats():
+    """API endpoint to get Supabase batch sync statistics"""
+    return jsonify(db.get_sync_stats())
+
+@app.route('/api/pipeline/stats', methods=['GET'])
+def pipeline_stats():
+    """API endpoint to get change pipeline queue depth and lag statistics"""
+    return jsonify(db.get_pipeline_stats())
+
+@app.route('/api/changelog/stats', methods=['GET'])
+def change_log_stats():
+    """API endpoint to get change-log position, checkpoint, backlog, throughput and lag"""
+    return jsonify(db.get_change_log_stats())
+
+@app.route('/api/replication/stats', methods=['GET'])
+def replication_stats():
+    """API endpoint to get logical replication change source statistics"""
+    return jsonify(db.get_replication_stats())
+
+@app.route('/api/broadcast/stats', methods=['GET'])
+def broadcast_stats():
+    """API endpoint to get websocket broadcast batching statistics"""
+    return jsonify(db.get_broadcast_stats())
+
+@app.route('/api/tables/stats', methods=['GET'])
+def table_bridge_stats():
+    """API endpoint to get per-table statistics for the config-driven table bridges"""
+    return jsonify(db.get_table_bridge_stats())
+
+@app.route('/api/engine/stats', methods=['GET'])
+def engine_stats():
+    """API endpoint to get statistics for the running bridge engine"""
+    if async_engine.current_engine:
+        return jsonify({"engine": "asyncio", "stats": async_engine.current_engine.stats()})
+    return jsonify({"engine": "threaded", "stats": db.get_pipeline_stats()})
+
+@app.route('/api/http/stats', methods=['GET'])
+def http_stats():
+    """API endpoint to get per-endpoint HTTP latency histograms for Supabase and Upstash"""
+    return jsonify(db.get_http_stats())
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """API endpoint to get counters, histograms and gauges in the Prometheus text format"""
+    return Response(db.get_metrics(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/api/leader/stats', methods=['GET'])
+def leader_stats():
+    """API endpoint to get the bridge leader lock state of this worker"""
+    return jsonify(db.get_leader_stats())
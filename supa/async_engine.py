@@ -0,0 +1,460 @@
+import os
+import time
+import asyncio
+import threading
+import logging
+
+try:
+    import asyncpg
+except ImportError:  # Optional dependency, only needed for the asyncio engine
+    asyncpg = None
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    from upstash_redis.asyncio import Redis as AsyncRedis
+except ImportError:
+    AsyncRedis = None
+
+import metrics
+import serialization
+import database_operations as db
+from cache_backend import RedisItemCache, ALL_ITEMS_BLOB_KEY
+from pipeline import ChangeEvent
+
+log = logging.getLogger(__name__)
+
+SELECT_ITEMS_SQL = 'SELECT "item_id", "name", "sku", "rate", "purchase rate", "stock on hand" FROM "public"."items"'
+
+# Set by run_async_engine() so the API can report on the running engine
+current_engine = None
+
+
+# How often an idle LISTEN connection is checked with a query
+LISTEN_HEALTH_CHECK_INTERVAL = float(os.getenv("ASYNC_LISTEN_HEALTH_CHECK_INTERVAL", "30"))
+
+
+def reconcile_supabase():
+    """Repair Supabase against Postgres after missed notifications (blocking, run in a worker thread)"""
+    import reconcile
+    reconciler = reconcile.Reconciler(
+        reconcile.PostgresSource(db.pg_pool),
+        reconcile.SupabaseSource(db.supabase, db.ITEMS_TABLE.supabase_table),
+        db.supabase_syncer,
+        workers=db.SUPABASE_SYNC_WORKERS,
+    )
+    try:
+        stats = reconciler.run(passes=1)
+        log.info("Async listener: Supabase resync upserted %s and deleted %s row(s).",
+                 stats["rows_upserted"], stats["rows_deleted"])
+    except Exception as e:
+        log.error("Error resyncing Supabase: %s", e)
+
+
+def encode_snapshot():
+    """Every snapshot row encoded for the Redis item hash (run in a worker thread)"""
+    return db.snapshot_rows_to_cache_json(db.inventory_snapshot.rows())
+
+
+class AsyncBridgeEngine:
+    """asyncio implementation of the bridge, mirroring ``db_listener_thread``.
+
+    LISTEN and the engine's reads go through asyncpg (the API's CRUD stays on
+    the psycopg2 pool, shared with API-only workers), Supabase is reached through
+    its PostgREST endpoint with a shared ``httpx.AsyncClient``, and Redis
+    through the async Upstash client. Every notification becomes its own
+    task (bounded by ``concurrency``); changes to the same item are chained
+    so they are applied in arrival order, while different items sync
+    concurrently.
+    """
+
+    def __init__(self, socketio_instance=None, concurrency=50, pool_min=1, pool_max=10):
+        missing = [name for name, mod in (("asyncpg", asyncpg), ("httpx", httpx), ("upstash_redis.asyncio", AsyncRedis)) if mod is None]
+        if missing:
+            raise RuntimeError(f"asyncio engine requires: {', '.join(missing)}")
+
+        self.socketio = socketio_instance
+        self.concurrency = concurrency
+        self.pool_min = pool_min
+        self.pool_max = pool_max
+
+        self.pool = None
+        self._snapshot_select_sql = SELECT_ITEMS_SQL
+        self.http = None
+        self.redis = None
+        self.item_cache = None
+        self._listen_conn = None
+        self._sem = None
+        self._tails = {}  # item_id -> last task touching that item
+        self._cache_dirty = None
+        self._pending_cache_events = 0
+        self._stopped = None
+        self._tasks = set()
+
+        self._stats = {
+            "events": 0,
+            "processed": 0,
+            "errors": 0,
+            "in_flight": 0,
+            "max_in_flight": 0,
+            "supabase_calls": 0,
+            "cache_flushes": 0,
+            "listener_restarts": 0,
+            "resyncs": 0,
+            "lag_total_ms": 0.0,
+            "max_lag_ms": 0.0,
+        }
+
+    # Lifecycle
+    async def start(self):
+        self._sem = asyncio.Semaphore(self.concurrency)
+        self._cache_dirty = asyncio.Event()
+        self._stopped = asyncio.Event()
+
+        self.pool = await asyncpg.create_pool(min_size=self.pool_min, max_size=self.pool_max, **db.PG_CONNECTION_PARAMS)
+        numeric_columns = await self.pool.fetchval(
+            "SELECT count(*) FROM information_schema.columns "
+            "WHERE table_schema = 'public' AND table_name = 'items' "
+            "AND column_name IN ('rate_numeric', 'purchase_rate_numeric');"
+        )
+        if numeric_columns == 2:
+            self._snapshot_select_sql = db.SNAPSHOT_SELECT_SQL
+        self.http = httpx.AsyncClient(
+            base_url=f"{db.url.rstrip('/')}/rest/v1",
+            headers={
+                "apikey": db.key,
+                "Authorization": f"Bearer {db.key}",
+                "Content-Type": "application/json",
+            },
+            timeout=float(os.getenv("SUPABASE_HTTP_TIMEOUT", "10")),
+        )
+        if db.UPSTASH_URL and db.UPSTASH_TOKEN:
+            self.redis = AsyncRedis(url=db.UPSTASH_URL, token=db.UPSTASH_TOKEN)
+            self.item_cache = RedisItemCache(self.redis, hash_key=db.ITEMS_TABLE.cache_key,
+                                             version_key=f"{db.ITEMS_TABLE.cache_key}:version")
+        else:
+            log.warning("Upstash Redis URL or Token not configured. Redis caching will be disabled.")
+
+        await self.initial_data_load()
+
+        self._spawn(self._listen_loop())
+        self._spawn(self._cache_flush_loop())
+
+    async def run_forever(self):
+        await self.start()
+        try:
+            await self._stopped.wait()
+        finally:
+            await self.close()
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self._listen_conn is not None:
+            await self._listen_conn.close()
+        if self.http is not None:
+            await self.http.aclose()
+        if self.redis is not None:
+            await self.redis.close()
+        if self.pool is not None:
+            await self.pool.close()
+        log.info("Async listener: Stopped.")
+
+    def stop(self):
+        if self._stopped is not None:
+            self._stopped.set()
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    # Reads (asyncpg)
+    async def load_snapshot(self):
+        """Reload the shared in-memory snapshot (db.inventory_snapshot) from PostgreSQL"""
+        # Changes consumed while the SELECT is awaited are replayed onto its rows
+        db.inventory_snapshot.begin_load()
+        try:
+            with metrics.span("postgres", "select"):
+                rows = await self.pool.fetch(self._snapshot_select_sql + ";")
+        except BaseException:
+            db.inventory_snapshot.abort_load()
+            raise
+        # Building the columns is CPU-bound: keep it off the event loop
+        count = await asyncio.to_thread(db.inventory_snapshot.load, (db.snapshot_row(row) for row in rows))
+        log.info("Loaded %s items into the in-memory snapshot.", count)
+        return count
+
+    async def get_item_by_id(self, item_id):
+        with metrics.span("postgres", "select"):
+            row = await self.pool.fetchrow(SELECT_ITEMS_SQL + " WHERE item_id = $1;", int(item_id))
+        return db.row_to_item(row) if row else None
+
+    async def resolve_item(self, event):
+        """The new row from the notification payload, falling back to a query for payloads without it"""
+        item = db.payload_row_to_item((event.payload or {}).get('new'))
+        if item is None:
+            item = await self.get_item_by_id(event.item_id)
+        return item
+
+    # Supabase (PostgREST)
+    async def supabase_upsert(self, rows):
+        rows = [{k: v for k, v in row.items() if k != 'TG_OP'} for row in rows]
+        with metrics.span("supabase", "upsert"):
+            response = await self.http.post(
+                f"/{db.ITEMS_TABLE.supabase_table}",
+                params={"on_conflict": "item_id"},
+                headers={"Prefer": "resolution=merge-duplicates,return=minimal"},
+                content=serialization.dumps_bytes(rows),
+            )
+            response.raise_for_status()
+        self._stats["supabase_calls"] += 1
+
+    async def supabase_delete(self, item_ids):
+        ids = ",".join(str(item_id) for item_id in item_ids)
+        with metrics.span("supabase", "delete"):
+            response = await self.http.delete(f"/{db.ITEMS_TABLE.supabase_table}", params={"item_id": f"in.({ids})"}, headers={"Prefer": "return=minimal"})
+            response.raise_for_status()
+        self._stats["supabase_calls"] += 1
+
+    async def supabase_count(self):
+        with metrics.span("supabase", "count"):
+            response = await self.http.head(f"/{db.ITEMS_TABLE.supabase_table}", params={"select": "item_id"}, headers={"Prefer": "count=exact"})
+            response.raise_for_status()
+        # Content-Range looks like "0-24/3573" or "*/0"
+        return int(response.headers.get("content-range", "*/0").split("/")[-1])
+
+    # Redis
+    async def rebuild_cache(self, reload_snapshot=True):
+        """Full rebuild of the Redis item hash and stats (async counterpart of update_redis_cache_and_stats)"""
+        if reload_snapshot:
+            await self.load_snapshot()
+        if not self.item_cache:
+            return
+        self.item_cache.discard_pending()
+        # Encoding (and compressing) every row runs in a worker thread so notifications keep flowing meanwhile
+        encoded_items = await asyncio.to_thread(encode_snapshot)
+        blob = await asyncio.to_thread(db.legacy_cache_blob, encoded_items) if db.WRITE_LEGACY_CACHE_BLOB else None
+        tx = self.item_cache.queue_replace(self.redis.multi(), encoded_items)
+        if blob is not None:
+            tx.set(ALL_ITEMS_BLOB_KEY, blob)
+        with metrics.span("redis", "replace_all"):
+            version = (await tx.exec())[-2 if db.WRITE_LEGACY_CACHE_BLOB else -1]
+        log.debug("Cached %d items to '%s' (version %s).", len(encoded_items), self.item_cache.hash_key, version)
+        db.inventory_stats.reconcile(*db.inventory_snapshot.totals())
+        await self.publish_stats()
+
+    async def publish_stats(self):
+        stats_data = db.inventory_stats.snapshot()
+        stats_data["cacheLastUpdated"] = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime()) + "Z"
+        with metrics.span("redis", "set"):
+            await self.redis.set("cache:inventory_stats", serialization.dumps(stats_data), ex=3600)
+
+    async def _cache_flush_loop(self):
+        window = float(os.getenv("REDIS_REBUILD_WINDOW", "0.5"))
+        min_interval = float(os.getenv("REDIS_REBUILD_MIN_INTERVAL", "2"))
+        while True:
+            await self._cache_dirty.wait()
+            await asyncio.sleep(window)
+            self._cache_dirty.clear()
+            folded, self._pending_cache_events = self._pending_cache_events, 0
+            try:
+                if db.inventory_stats.reconcile_due():
+                    await self.rebuild_cache()
+                else:
+                    upserts, deletes = self.item_cache.drain_pending()
+                    if upserts or deletes:
+                        try:
+                            blob = None
+                            if db.WRITE_LEGACY_CACHE_BLOB:
+                                # The blob has no partial updates: rewrite it from the snapshot (off the loop)
+                                blob = await asyncio.to_thread(db.legacy_cache_blob)
+                            tx = self.item_cache.queue_writes(self.redis.multi(), upserts, deletes)
+                            if blob is not None:
+                                tx.set(ALL_ITEMS_BLOB_KEY, blob)
+                            with metrics.span("redis", "flush"):
+                                await tx.exec()
+                        except Exception:
+                            self.item_cache.restore_pending(upserts, deletes)
+                            raise
+                    await self.publish_stats()
+                self._stats["cache_flushes"] += 1
+                log.debug("Async cache flush folded %d event(s).", folded)
+            except Exception as e:
+                log.error("Error flushing Redis cache: %s", e)
+            await asyncio.sleep(min_interval)
+
+    # Initial load
+    async def initial_data_load(self):
+        log.info("Checking if initial data load to Supabase & Redis is needed...")
+        await self.load_snapshot()
+        if await self.supabase_count() == 0:
+            items_pg = [db.row_to_parsed_item((row[0], row[1], row[2], row[6], row[7], row[5]))
+                        for row in db.inventory_snapshot.rows()]
+            log.info("Supabase is empty. Performing initial data load to Supabase...")
+            batch_size = db.supabase_syncer.batch_size
+            batches = [items_pg[i:i + batch_size] for i in range(0, len(items_pg), batch_size)]
+            await asyncio.gather(*(self._bounded(self.supabase_upsert(batch)) for batch in batches))
+            log.info("Initial data load to Supabase complete (%s items).", len(items_pg))
+        else:
+            log.info("Data already exists in Supabase. Skipping initial Supabase load.")
+        log.info("Performing initial/startup update of Redis cache...")
+        await self.rebuild_cache(reload_snapshot=False)
+
+    async def _bounded(self, coro):
+        async with self._sem:
+            return await coro
+
+    # Listener
+    async def _listen_loop(self):
+        """LISTEN on the items channel, reconnecting with backoff and resyncing whatever was missed meanwhile"""
+        backoff = 1.0
+        reconnecting = False
+        while True:
+            started_at = time.monotonic()
+            lost = asyncio.Event()
+            conn = None
+            try:
+                conn = await asyncpg.connect(**db.PG_CONNECTION_PARAMS)
+                conn.add_termination_listener(lambda _conn: lost.set())
+                await conn.add_listener(db.ITEMS_TABLE.channel, self._on_notify)
+                self._listen_conn = conn
+                log.info("Async listener: Listening for changes on PostgreSQL items...")
+                if reconnecting:
+                    # Notifications sent while nobody was listening are gone
+                    await self.resync()
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), LISTEN_HEALTH_CHECK_INTERVAL)
+                    except asyncio.TimeoutError:
+                        # A silently dropped connection never terminates on its own
+                        await conn.fetchval("SELECT 1;", timeout=LISTEN_HEALTH_CHECK_INTERVAL)
+                log.warning("Async listener: connection lost.")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error("Error in async listener: %s", e)
+            finally:
+                self._listen_conn = None
+                if conn is not None and not conn.is_closed():
+                    conn.terminate()
+            reconnecting = True
+            self._stats["listener_restarts"] += 1
+            if time.monotonic() - started_at > 60:
+                backoff = 1.0
+            log.info("Async listener: Reconnecting in %.0fs...", backoff)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    async def resync(self):
+        """Catch up after a listener outage: rebuild the snapshot and Redis now, and reconcile Supabase in the background"""
+        self._stats["resyncs"] += 1
+        await self.rebuild_cache()
+        self._spawn(asyncio.to_thread(reconcile_supabase))
+
+    def _on_notify(self, connection, pid, channel, payload):
+        received_at = time.monotonic()
+        try:
+            payload_data = serialization.loads(payload)
+        except ValueError as e:
+            log.error("Error decoding notification payload: %s", e)
+            return
+        db.invalidate_cached_item(payload_data.get('item_id'))
+        event = ChangeEvent(payload_data.get('TG_OP'), payload_data.get('item_id'), payload=payload_data, received_at=received_at)
+        self._stats["events"] += 1
+
+        # Chain tasks per item so changes to one item are applied in order
+        previous = self._tails.get(event.item_id)
+        task = self._spawn(self._handle(event, previous))
+        self._tails[event.item_id] = task
+        task.add_done_callback(lambda t, key=event.item_id: self._tails.get(key) is t and self._tails.pop(key))
+
+    async def _handle(self, event, previous=None):
+        if previous is not None:
+            try:
+                await previous
+            except Exception:
+                pass
+
+        async with self._sem:
+            self._stats["in_flight"] += 1
+            self._stats["max_in_flight"] = max(self._stats["max_in_flight"], self._stats["in_flight"])
+            try:
+                await self._process(event)
+                self._stats["processed"] += 1
+                metrics.inc("bridge_events_total", pipeline=db.ITEMS_TABLE.name, stage="async", outcome="processed")
+                metrics.observe("bridge_event_lag_seconds", time.monotonic() - event.received_at, pipeline=db.ITEMS_TABLE.name)
+                lag_ms = (time.monotonic() - event.received_at) * 1000
+                self._stats["lag_total_ms"] += lag_ms
+                self._stats["max_lag_ms"] = max(self._stats["max_lag_ms"], lag_ms)
+            except Exception as e:
+                self._stats["errors"] += 1
+                metrics.inc("bridge_events_total", pipeline=db.ITEMS_TABLE.name, stage="async", outcome="error")
+                log.error("Error processing change for item_id %s: %s", event.item_id, e)
+            finally:
+                self._stats["in_flight"] -= 1
+
+    async def _process(self, event):
+        if event.tg_op == 'DELETE':
+            if event.item_id is not None:
+                await self.supabase_delete([event.item_id])
+            db.apply_change_to_snapshot('DELETE', event.item_id)
+            if self.item_cache:
+                self.item_cache.stage_delete(event.item_id)
+            self._broadcast(event)
+        elif event.tg_op and event.item_id:
+            event.item = await self.resolve_item(event)
+            if event.item:
+                await self.supabase_upsert([event.item])
+                db.apply_change_to_snapshot(event.tg_op, event.item_id, event.item)
+                if self.item_cache:
+                    self.item_cache.stage_upsert(db.process_item_for_cache(event.item))
+                self._broadcast(event)
+
+        # Schedule a (coalesced) Redis cache flush regardless of operation type
+        if self.item_cache:
+            self._pending_cache_events += 1
+            self._cache_dirty.set()
+
+    def _broadcast(self, event):
+        if self.socketio:
+            # Only buffers; the broadcaster's own thread does the (blocking) emits
+            old_item = db.payload_row_to_item((event.payload or {}).get('old'))
+            db.get_item_broadcaster(self.socketio).publish(event.tg_op, event.item_id, item=event.item,
+                                                           old_item=old_item, seq=event.seq)
+
+    def stats(self):
+        stats = dict(self._stats)
+        lag_total_ms = stats.pop("lag_total_ms")
+        stats["avg_lag_ms"] = lag_total_ms / stats["processed"] if stats["processed"] else 0.0
+        stats["pending_tasks"] = len(self._tasks)
+        return stats
+
+
+def run_async_engine(socketio_instance=None):
+    """Start the asyncio engine on its own event loop in a daemon thread"""
+    global current_engine
+    engine = AsyncBridgeEngine(
+        socketio_instance,
+        concurrency=int(os.getenv("ASYNC_ENGINE_CONCURRENCY", "50")),
+        pool_min=int(os.getenv("PG_POOL_MIN", "1")),
+        pool_max=int(os.getenv("PG_POOL_MAX", "10")),
+    )
+    current_engine = engine
+    # The engine only LISTENs; the trigger still writes the change log, so keep it pruned
+    if db.change_log_available():
+        db.start_change_log_checkpointer(db.release_change_log)
+
+    def _run():
+        try:
+            asyncio.run(engine.run_forever())
+        except Exception as e:
+            log.error("Error in async bridge engine: %s", e)
+
+    thread = threading.Thread(target=_run, name="async-bridge-engine", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,61 @@
+import time
+import argparse
+
+import database_operations as db
+
+BACKFILL_BATCH_SQL = '''
+WITH batch AS (
+    SELECT "item_id" FROM "public"."items" WHERE "item_id" > %s ORDER BY "item_id" LIMIT %s
+)
+UPDATE "public"."items" AS i
+SET "rate_numeric" = bridge_parse_currency(i."rate"::text),
+    "purchase_rate_numeric" = bridge_parse_currency(i."purchase rate"::text)
+FROM batch
+WHERE i."item_id" = batch."item_id"
+RETURNING i."item_id", i."rate", i."rate_numeric", i."purchase rate", i."purchase_rate_numeric";
+'''
+
+
+def _failed(raw, parsed):
+    """A value failed to parse if it had content but produced no number"""
+    return parsed is None and raw is not None and str(raw).strip() != ""
+
+
+def backfill(batch_size=1000):
+    """Fill rate_numeric / purchase_rate_numeric for every row, one committed batch at a time.
+
+    Returns a list of ``(item_id, column, raw_value)`` for values that could not be parsed.
+    """
+    failures = []
+    last_id = -1
+    total = 0
+    start = time.monotonic()
+    while True:
+        with db.pg_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(BACKFILL_BATCH_SQL, (last_id, batch_size))
+                rows = cur.fetchall()
+        if not rows:
+            break
+        for item_id, rate, rate_numeric, purchase_rate, purchase_rate_numeric in rows:
+            if _failed(rate, rate_numeric):
+                failures.append((item_id, "rate", rate))
+            if _failed(purchase_rate, purchase_rate_numeric):
+                failures.append((item_id, "purchase rate", purchase_rate))
+        total += len(rows)
+        last_id = max(row[0] for row in rows)
+        print(f"Backfilled {total} rows (up to item_id {last_id})...")
+
+    elapsed = time.monotonic() - start
+    print(f"Backfill complete: {total} rows in {elapsed:.1f}s, {len(failures)} value(s) failed to parse.")
+    for item_id, column, raw in failures:
+        print(f"  item_id {item_id}: could not parse {column} {raw!r}")
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Re-run the numeric rate backfill in committed batches and report "
+                                                 "values that do not parse (migration 008 backfills once)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    backfill(batch_size=args.batch_size)
@@ -0,0 +1,246 @@
+import json
+import time
+import base64
+import threading
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class ArrivalTracker:
+    """Records the first time each benchmark key reaches a sink (monotonic clock)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._arrivals = {}  # sink -> {key: monotonic time}
+
+    def arrived(self, sink, key):
+        now = time.monotonic()
+        with self._lock:
+            self._arrivals.setdefault(sink, {}).setdefault(key, now)
+
+    def arrival(self, sink, key):
+        with self._lock:
+            return self._arrivals.get(sink, {}).get(key)
+
+
+def row_keys(row):
+    """Tracker keys for a written row: its name (every benchmark write sets a unique one)"""
+    name = row.get("name") if isinstance(row, dict) else None
+    return [("upsert", name)] if name else []
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "bench-standin"
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("content-length", 0))
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, code, obj=None, headers=None):
+        body = b"" if obj is None else json.dumps(obj).encode()
+        self.send_response(code)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+
+class SupabaseStandIn:
+    """In-memory subset of PostgREST: upsert (POST), delete and select with ``eq``/``in`` filters, counts.
+
+    Rows live per table, keyed by the ``on_conflict`` column. Every upserted
+    or deleted row is reported to the ``tracker`` as it arrives.
+    """
+
+    def __init__(self, tracker, key="item_id"):
+        self.tracker = tracker
+        self.key = key
+        self.tables = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.server = None
+
+    def start(self, host="127.0.0.1", port=0):
+        standin = self
+
+        class Handler(_Handler):
+            def do_POST(self):
+                standin.requests += 1
+                url = urlsplit(self.path)
+                table = url.path.rsplit("/", 1)[-1]
+                if "/rpc/" in url.path:
+                    return self._send(404, {"message": f"function {table} does not exist"})
+                rows = json.loads(self._body() or b"[]")
+                rows = rows if isinstance(rows, list) else [rows]
+                key = parse_qs(url.query).get("on_conflict", [standin.key])[0]
+                standin.upsert(table, key, rows)
+                return self._send(201, [])
+
+            def do_DELETE(self):
+                standin.requests += 1
+                self._body()  # keep-alive: consume any body before answering
+                url = urlsplit(self.path)
+                table = url.path.rsplit("/", 1)[-1]
+                standin.delete(table, standin.filter_keys(parse_qs(url.query)))
+                return self._send(200, [])
+
+            def do_GET(self):
+                standin.requests += 1
+                self._body()
+                url = urlsplit(self.path)
+                rows = standin.select(url.path.rsplit("/", 1)[-1], parse_qs(url.query))
+                return self._send(200, rows, {"content-range": f"0-{max(len(rows) - 1, 0)}/{len(rows)}"})
+
+            def do_HEAD(self):
+                self.do_GET()
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, name="supabase-standin", daemon=True).start()
+        return self
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def upsert(self, table, key, rows):
+        with self._lock:
+            stored = self.tables.setdefault(table, {})
+            for row in rows:
+                stored[str(row.get(key))] = row
+        for row in rows:
+            for tracker_key in row_keys(row):
+                self.tracker.arrived("supabase", tracker_key)
+
+    def delete(self, table, keys):
+        with self._lock:
+            stored = self.tables.setdefault(table, {})
+            for key in keys:
+                stored.pop(key, None)
+        for key in keys:
+            self.tracker.arrived("supabase", ("delete", key))
+
+    def filter_keys(self, query):
+        value = query.get(self.key, [""])[0]
+        if value.startswith("in.("):
+            return [key.strip('"') for key in value[4:-1].split(",") if key]
+        if value.startswith("eq."):
+            return [value[3:]]
+        return []
+
+    def select(self, table, query):
+        with self._lock:
+            rows = list(self.tables.get(table, {}).values())
+        if self.key in query:
+            keys = set(self.filter_keys(query))
+            rows = [row for row in rows if str(row.get(self.key)) in keys]
+        return rows
+
+    def stop(self):
+        self.server.shutdown()
+
+
+class UpstashStandIn:
+    """In-memory Redis behind the Upstash REST protocol (single commands, /pipeline and /multi-exec).
+
+    Only the commands the bridge uses are implemented. Writes to ``hash_key``
+    are reported to the ``tracker``.
+    """
+
+    def __init__(self, tracker, hash_key="cache:inventory_items"):
+        self.tracker = tracker
+        self.hash_key = hash_key
+        self.data = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.server = None
+
+    def start(self, host="127.0.0.1", port=0):
+        standin = self
+
+        class Handler(_Handler):
+            def do_POST(self):
+                standin.requests += 1
+                command = json.loads(self._body() or b"null")
+                encode = self.headers.get("Upstash-Encoding") == "base64"
+                if self.path in ("/pipeline", "/multi-exec"):
+                    return self._send(200, [standin.reply(c, encode) for c in command])
+                return self._send(200, standin.reply(command, encode))
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, name="upstash-standin", daemon=True).start()
+        return self
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def reply(self, command, encode):
+        try:
+            result = self.execute(command)
+        except Exception as e:
+            return {"error": f"ERR {e}"}
+        return {"result": self._encode(result) if encode else result}
+
+    def _encode(self, value):
+        if isinstance(value, str):
+            return value if value == "OK" else base64.b64encode(value.encode()).decode()
+        if isinstance(value, list):
+            return [self._encode(v) for v in value]
+        return value
+
+    def execute(self, command):
+        name, args = str(command[0]).upper(), [str(arg) for arg in command[1:]]
+        with self._lock:
+            if name == "PING":
+                return "PONG"
+            if name == "GET":
+                return self.data.get(args[0])
+            if name == "SET":
+                self.data[args[0]] = args[1]
+                return "OK"
+            if name == "DEL":
+                return sum(self.data.pop(key, None) is not None for key in args)
+            if name == "INCR":
+                self.data[args[0]] = str(int(self.data.get(args[0], 0)) + 1)
+                return int(self.data[args[0]])
+            if name in ("EXPIRE", "EXISTS"):
+                return 1 if args[0] in self.data else 0
+            if name == "HSET":
+                mapping = self.data.setdefault(args[0], {})
+                pairs = list(zip(args[1::2], args[2::2]))
+                mapping.update(pairs)
+                tracked = args[0] == self.hash_key
+            elif name == "HDEL":
+                mapping = self.data.get(args[0], {})
+                removed = [field for field in args[1:] if mapping.pop(field, None) is not None]
+                if args[0] == self.hash_key:
+                    for field in args[1:]:
+                        self.tracker.arrived("redis", ("delete", field))
+                return len(removed)
+            elif name == "HGET":
+                return self.data.get(args[0], {}).get(args[1])
+            elif name == "HMGET":
+                mapping = self.data.get(args[0], {})
+                return [mapping.get(field) for field in args[1:]]
+            elif name == "HGETALL":
+                return [part for pair in self.data.get(args[0], {}).items() for part in pair]
+            else:
+                raise ValueError(f"unsupported command '{name}'")
+        # HSET: report outside the lock
+        if tracked:
+            for _, value in pairs:
+                for tracker_key in row_keys(json.loads(value)):
+                    self.tracker.arrived("redis", tracker_key)
+        return len(pairs)
+
+    def stop(self):
+        self.server.shutdown()
@@ -0,0 +1,340 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import threading
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_standins import ArrivalTracker, SupabaseStandIn, UpstashStandIn
+
+SINKS = ("supabase", "redis", "websocket")
+
+
+def percentiles(values):
+    """p50/p90/p99/max summary of a list of milliseconds"""
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+
+    def pick(q):
+        return round(values[min(len(values) - 1, int(q * len(values)))], 3)
+
+    return {"count": len(values), "p50": pick(0.50), "p90": pick(0.90), "p99": pick(0.99),
+            "max": round(values[-1], 3), "mean": round(sum(values) / len(values), 3)}
+
+
+def parse_mix(text):
+    """"insert=0.4,update=0.5,delete=0.1" -> cumulative [(op, threshold)]"""
+    weights = {}
+    for part in text.split(","):
+        op, _, weight = part.partition("=")
+        if op not in ("insert", "update", "delete"):
+            raise argparse.ArgumentTypeError(f"unknown operation '{op}'")
+        weights[op] = float(weight)
+    total = sum(weights.values())
+    cumulative, mix = 0.0, []
+    for op, weight in weights.items():
+        cumulative += weight / total
+        mix.append((op, cumulative))
+    return mix
+
+
+class Workload:
+    """Issues inserts/updates/deletes of benchmark rows at a fixed rate through the API or direct SQL.
+
+    Every insert and update writes a unique name, and every delete is keyed by
+    item_id, so each write can be found again in the sinks. ``writes`` holds
+    ``(tracker key, completed_at)`` per write, taken when the commit returned.
+    """
+
+    def __init__(self, db, mode, rate, duration, mix, concurrency, api_url=None, seed=0):
+        self.db = db
+        self.mode = mode
+        self.rate = rate
+        self.duration = duration
+        self.mix = mix
+        self.concurrency = concurrency
+        self.api_url = api_url
+        self.run_id = f"{int(time.time())}-{os.getpid()}"
+        self.random = random.Random(seed)
+
+        self._lock = threading.Lock()
+        self._counter = 0
+        self._live_ids = []
+        self.writes = []
+        self.write_latency_ms = {"insert": [], "update": [], "delete": []}
+        self.errors = 0
+        self.behind_schedule = 0
+        self._local = threading.local()
+
+    # Rows
+    def _next_row(self):
+        with self._lock:
+            self._counter += 1
+            n = self._counter
+            rate = self.random.uniform(100, 10000)
+            stock = self.random.randint(0, 60)
+        return {
+            "name": f"bench {self.run_id} {n}",
+            "sku": f"BENCH{n:07d}",
+            "rate": f"Rs.{rate:,.2f}",
+            "purchase rate": f"Rs.{rate * 0.7:,.2f}",
+            "stock on hand": stock,
+        }
+
+    def _pick(self):
+        with self._lock:
+            roll = self.random.random()
+            op = next(op for op, threshold in self.mix if roll <= threshold)
+            if op != "insert" and not self._live_ids:
+                return "insert", None
+            if op == "update":
+                return op, self.random.choice(self._live_ids)
+            if op == "delete":
+                return op, self._live_ids.pop(self.random.randrange(len(self._live_ids)))
+        return op, None
+
+    # Writers
+    def _http(self):
+        if not hasattr(self._local, "client"):
+            import httpx
+            self._local.client = httpx.Client(base_url=self.api_url, timeout=30)
+        return self._local.client
+
+    def _write_api(self, op, item_id, row):
+        client = self._http()
+        if op == "insert":
+            response = client.post("/api/items", json=row)
+            response.raise_for_status()
+            return response.json()["item_id"]
+        if op == "update":
+            client.put(f"/api/items/{item_id}", json=row).raise_for_status()
+        else:
+            client.delete(f"/api/items/{item_id}").raise_for_status()
+        return item_id
+
+    def _write_sql(self, op, item_id, row):
+        values = (row["name"], row["sku"], row["rate"], row["purchase rate"], row["stock on hand"]) if row else None
+        with self.db.pg_pool.connection() as conn:
+            with conn.cursor() as cur:
+                if op == "insert":
+                    cur.execute('INSERT INTO "public"."items" ("name", "sku", "rate", "purchase rate", "stock on hand") '
+                                'VALUES (%s, %s, %s, %s, %s) RETURNING "item_id";', values)
+                    item_id = cur.fetchone()[0]
+                elif op == "update":
+                    cur.execute('UPDATE "public"."items" SET "name" = %s, "sku" = %s, "rate" = %s, "purchase rate" = %s, '
+                                '"stock on hand" = %s WHERE "item_id" = %s;', values + (item_id,))
+                else:
+                    cur.execute('DELETE FROM "public"."items" WHERE "item_id" = %s;', (item_id,))
+        return item_id
+
+    def _one(self, scheduled_at):
+        delay = scheduled_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        elif delay < -0.1:
+            with self._lock:
+                self.behind_schedule += 1
+        op, item_id = self._pick()
+        row = self._next_row() if op != "delete" else None
+        start = time.monotonic()
+        try:
+            if self.mode == "api":
+                item_id = self._write_api(op, item_id, row)
+            else:
+                item_id = self._write_sql(op, item_id, row)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            print(f"Benchmark {op} failed: {e}")
+            return
+        done = time.monotonic()
+        key = ("delete", str(item_id)) if op == "delete" else ("upsert", row["name"])
+        with self._lock:
+            self.writes.append((key, done))
+            self.write_latency_ms[op].append((done - start) * 1000)
+            if op == "insert":
+                self._live_ids.append(item_id)
+
+    def run(self):
+        """Issue ``rate * duration`` writes on schedule. Returns the achieved writes per second"""
+        total = int(self.rate * self.duration)
+        start = time.monotonic() + 0.1
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="bench-writer") as executor:
+            for i in range(total):
+                executor.submit(self._one, start + i / self.rate)
+        elapsed = time.monotonic() - start
+        return len(self.writes) / elapsed if elapsed > 0 else 0.0
+
+    def cleanup(self):
+        """Delete every row this run created"""
+        with self.db.pg_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute('DELETE FROM "public"."items" WHERE "name" LIKE %s;', (f"bench {self.run_id} %",))
+                return cur.rowcount
+
+
+class WebsocketProbe:
+    """In-process Socket.IO client that timestamps item_updates frames as they are queued for it"""
+
+    def __init__(self, socketio, app, tracker, poll_interval=0.002):
+        self.client = socketio.test_client(app)
+        self.tracker = tracker
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="bench-websocket", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            for message in self.client.get_received():
+                if message["name"] != "item_updates":
+                    continue
+                for update in message["args"][0]["updates"]:
+                    if update["op"] == "DELETE":
+                        self.tracker.arrived("websocket", ("delete", str(update["item_id"])))
+                    else:
+                        name = (update.get("item") or update.get("changes") or {}).get("name")
+                        if name:
+                            self.tracker.arrived("websocket", ("upsert", name))
+            time.sleep(self.poll_interval)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def collect(workload, tracker, drain_timeout):
+    """Wait for the writes to reach every sink, then compute the per-sink lag"""
+    deadline = time.monotonic() + drain_timeout
+    while time.monotonic() < deadline:
+        if all(tracker.arrival(sink, key) is not None for key, _ in workload.writes for sink in SINKS):
+            break
+        time.sleep(0.1)
+
+    results = {}
+    for sink in SINKS:
+        lags, missing = [], 0
+        for key, done in workload.writes:
+            arrival = tracker.arrival(sink, key)
+            if arrival is None:
+                missing += 1
+            else:
+                # Sinks can see a change before the API response returns; that counts as no lag
+                lags.append(max(0.0, (arrival - done) * 1000))
+        results[f"{sink}_lag_ms"] = dict(percentiles(lags), missing=missing)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Metrics whose p50/p99 got worse than the baseline by more than ``tolerance``"""
+    regressions = []
+    for group in ("write_latency_ms", "lag"):
+        ours = results.get(group, {})
+        theirs = baseline.get(group, {})
+        for name, stats in ours.items():
+            before = theirs.get(name, {})
+            for q in ("p50", "p99"):
+                if q in stats and before.get(q):
+                    change = stats[q] / before[q] - 1
+                    if change > tolerance:
+                        regressions.append(f"{group}.{name}.{q}: {before[q]} -> {stats[q]} ms (+{change:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end bridge benchmark against local Postgres and "
+                                                 "in-process Supabase/Upstash stand-ins")
+    parser.add_argument("--mode", choices=["api", "sql"], default="api",
+                        help="Write through the Flask API or directly with SQL")
+    parser.add_argument("--rate", type=float, default=50, help="Writes per second")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of load")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("insert=0.4,update=0.5,delete=0.1"))
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent writers")
+    parser.add_argument("--change-source", default=os.getenv("CHANGE_SOURCE", "listen"))
+    parser.add_argument("--drain-timeout", type=float, default=30, help="Seconds to wait for sinks to catch up")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p50/p99 regression vs the baseline")
+    parser.add_argument("--keep-rows", action="store_true", help="Do not delete the benchmark rows afterwards")
+    args = parser.parse_args()
+
+    tracker = ArrivalTracker()
+    supabase_standin = SupabaseStandIn(tracker).start()
+    upstash_standin = UpstashStandIn(tracker).start()
+    # The bridge reads its endpoints at import time
+    os.environ.update(
+        SUPABASE_URL=supabase_standin.url,
+        SUPABASE_KEY="bench",
+        UPSTASH_REDIS_REST_URL=upstash_standin.url,
+        UPSTASH_REDIS_REST_TOKEN="bench",
+    )
+    import database_operations as db
+    import api
+    from werkzeug.serving import make_server
+
+    db.initial_data_load()
+    db.start_db_listener(api.socketio, args.change_source)
+    server = make_server("127.0.0.1", 0, api.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-api", daemon=True).start()
+    probe = WebsocketProbe(api.socketio, api.app, tracker)
+    time.sleep(1.0)  # let the listener connect
+
+    workload = Workload(db, args.mode, args.rate, args.duration, args.mix, args.concurrency,
+                        api_url=f"http://127.0.0.1:{server.server_port}")
+    print(f"Benchmark: {args.mode} writes at {args.rate:g}/s for {args.duration:g}s ({args.concurrency} writers)...")
+    achieved = workload.run()
+    lag = collect(workload, tracker, args.drain_timeout)
+    probe.stop()
+
+    results = {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "config": {"mode": args.mode, "rate": args.rate, "duration": args.duration, "concurrency": args.concurrency,
+                   "mix": {op: round(t, 3) for op, t in args.mix}, "change_source": args.change_source},
+        "writes": len(workload.writes),
+        "achieved_rate": round(achieved, 2),
+        "errors": workload.errors,
+        "behind_schedule": workload.behind_schedule,
+        "write_latency_ms": {op: percentiles(values) for op, values in workload.write_latency_ms.items()},
+        "lag": lag,
+        "standin_requests": {"supabase": supabase_standin.requests, "upstash": upstash_standin.requests},
+        "bridge": {"pipeline": db.get_pipeline_stats(), "sync": db.get_sync_stats(),
+                   "broadcast": db.get_broadcast_stats()},
+    }
+
+    if not args.keep_rows:
+        print(f"Benchmark: removed {workload.cleanup()} benchmark row(s).")
+    server.shutdown()
+
+    print(json.dumps({k: results[k] for k in ("writes", "achieved_rate", "errors", "write_latency_ms", "lag")}, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, default=str)
+        print(f"Benchmark: results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
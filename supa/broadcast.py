@@ -0,0 +1,212 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+import metrics
+import serialization
+
+log = logging.getLogger(__name__)
+
+ALL_ITEMS_ROOM = "items:all"
+
+
+def stock_room(level):
+    return f"items:stock:{level}"
+
+
+class ItemBroadcaster:
+    """Batches item changes into ``item_updates`` Socket.IO frames.
+
+    ``publish()`` is cheap and thread-safe; changes are buffered per item and
+    sent every ``window`` seconds (or once ``max_batch`` items are pending) as
+    one frame, so a bulk change reaches clients as a handful of frames rather
+    than one event per row. Within a window, changes to the same item are
+    folded into one update. A change whose resulting row version (a digest
+    of the normalized row, or "deleted") was already broadcast is dropped,
+    which removes the echo of API writes coming back through NOTIFY. The
+    versions are per process: with separate API workers, only the bridge
+    leader broadcasts (``broadcasts_api_writes()`` in api.py).
+
+    Each update in a frame is one of::
+
+        {"op": "INSERT", "item": {...}}
+        {"op": "UPDATE", "item_id": 1, "changes": {"rate": ...}}  # only the changed fields
+        {"op": "UPDATE", "item": {...}}                            # previous row unknown
+        {"op": "DELETE", "item_id": 1}
+
+    Every frame goes to the ``items:all`` room; clients that subscribed to
+    stock levels instead get frames with only the updates of items that are
+    (or were) at those levels.
+    """
+
+    def __init__(self, socketio, normalize=None, stock_level=None, key="item_id", window=0.05, max_batch=500,
+                 version_cache_size=100000, event="item_updates"):
+        self.socketio = socketio
+        self.normalize = normalize or (lambda item: item)
+        self.stock_level = stock_level
+        self.key = key
+        self.window = window
+        self.max_batch = max_batch
+        self.version_cache_size = version_cache_size
+        self.event = event
+
+        self._cond = threading.Condition()
+        self._pending = OrderedDict()  # item_id -> [op, old_item, item, seq]
+        self._first_pending_at = None
+        self._sent = OrderedDict()  # item_id -> (version, stock level) last broadcast
+        self._thread = None
+
+        self._stats = {
+            "published": 0,
+            "duplicates": 0,
+            "folded": 0,
+            "frames": 0,
+            "updates_sent": 0,
+            "deltas": 0,
+            "full_rows": 0,
+            "room_frames": 0,
+            "emit_errors": 0,
+            "last_flush_ms": 0.0,
+        }
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="item-broadcast", daemon=True)
+            self._thread.start()
+
+    @staticmethod
+    def _version(item):
+        if item is None:
+            return "deleted"
+        return serialization.dumps_sorted(item)
+
+    # Publishing
+    def publish(self, op, item_id=None, item=None, old_item=None, seq=None):
+        """Queue one change (``item``/``old_item`` are the row after/before it, when known)"""
+        item = self.normalize(item) if item else None
+        old_item = self.normalize(old_item) if old_item else None
+        if item_id is None:
+            item_id = (item or old_item or {}).get(self.key)
+        if item_id is None or (op != 'DELETE' and item is None):
+            return
+        if op == 'DELETE':
+            item = None
+        with self._cond:
+            self._stats["published"] += 1
+            pending = self._pending.get(item_id)
+            if pending is None:
+                self._pending[item_id] = [op, old_item, item, seq]
+            else:
+                # Keep the first change's previous row so the delta spans the whole window
+                self._stats["folded"] += 1
+                first_op = pending[0]
+                if first_op == 'INSERT' and op == 'UPDATE':
+                    op = 'INSERT'
+                pending[0], pending[2], pending[3] = op, item, seq if seq is not None else pending[3]
+            if self._first_pending_at is None:
+                self._first_pending_at = time.monotonic()
+            self._ensure_thread()
+            self._cond.notify()
+
+    def publish_many(self, op, items=None, item_ids=None):
+        for item in items or ():
+            self.publish(op, item=item)
+        for item_id in item_ids or ():
+            self.publish(op, item_id=item_id)
+
+    # Sending
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if len(self._pending) >= self.max_batch:
+                        break
+                    if self._first_pending_at is not None:
+                        remaining = self._first_pending_at + self.window - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+            self.flush()
+
+    def flush(self):
+        """Send everything pending now. Returns the number of updates sent"""
+        start = time.monotonic()
+        with self._cond:
+            pending = self._pending
+            self._pending = OrderedDict()
+            self._first_pending_at = None
+            updates = []
+            for item_id, (op, old_item, item, seq) in pending.items():
+                version = self._version(item)
+                previous = self._sent.get(item_id)
+                if (previous is not None and previous[0] == version) or (op == 'UPDATE' and old_item == item):
+                    self._stats["duplicates"] += 1
+                    continue
+                levels = set()
+                if previous is not None and previous[1] is not None:
+                    levels.add(previous[1])
+                if self.stock_level:
+                    for row in (old_item, item):
+                        if row is not None:
+                            levels.add(self.stock_level(row.get("stock on hand")))
+                # A delta is only safe against the row clients last saw
+                if old_item is not None and previous is not None and previous[0] != self._version(old_item):
+                    old_item = None
+                self._remember(item_id, version, self.stock_level(item.get("stock on hand")) if item and self.stock_level else None)
+                updates.append((self._update(op, item_id, old_item, item, seq), levels))
+            self._stats["updates_sent"] += len(updates)
+
+        if updates:
+            self._emit([update for update, _ in updates], ALL_ITEMS_ROOM)
+            if self.stock_level:
+                by_level = {}
+                for update, levels in updates:
+                    for level in levels:
+                        by_level.setdefault(level, []).append(update)
+                for level, level_updates in by_level.items():
+                    self._emit(level_updates, stock_room(level), room_frame=True)
+        with self._cond:
+            self._stats["last_flush_ms"] = (time.monotonic() - start) * 1000
+        return len(updates)
+
+    def _update(self, op, item_id, old_item, item, seq):
+        if op == 'DELETE':
+            update = {"op": "DELETE", self.key: item_id}
+        elif op == 'UPDATE' and old_item is not None:
+            changes = {field: value for field, value in item.items() if old_item.get(field) != value}
+            update = {"op": "UPDATE", self.key: item_id, "changes": changes}
+            self._stats["deltas"] += 1
+        else:
+            update = {"op": op, "item": item}
+            self._stats["full_rows"] += 1
+        if seq is not None:
+            update["seq"] = seq
+        return update
+
+    def _remember(self, item_id, version, level):
+        self._sent[item_id] = (version, level)
+        self._sent.move_to_end(item_id)
+        while len(self._sent) > self.version_cache_size:
+            self._sent.popitem(last=False)
+
+    def _emit(self, updates, room, room_frame=False):
+        try:
+            with metrics.span("socketio", "emit"):
+                self.socketio.emit(self.event, {"updates": updates}, to=room)
+        except Exception as e:
+            with self._cond:
+                self._stats["emit_errors"] += 1
+            log.error("Error broadcasting %s item update(s) to '%s': %s", len(updates), room, e)
+            return
+        with self._cond:
+            self._stats["room_frames" if room_frame else "frames"] += 1
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._pending)
+            stats["tracked_versions"] = len(self._sent)
+            return stats
@@ -0,0 +1,177 @@
+import threading
+
+import metrics
+import serialization
+import logging
+
+log = logging.getLogger(__name__)
+
+ITEMS_HASH_KEY = "cache:inventory_items"
+ITEMS_VERSION_KEY = "cache:inventory_items:version"
+# Legacy single-blob layout: every item in one versioned, possibly compressed payload (cache_payload.py)
+ALL_ITEMS_BLOB_KEY = "cache:all_inventory_items"
+
+# Upper bound on fields per HSET/HMGET command so a single REST request stays small
+CHUNK_SIZE = 500
+
+
+def _chunks(seq, size):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+class RedisItemCache:
+    """Per-item inventory cache stored in a single Redis hash.
+
+    Items live under ``hash_key`` as ``<key_field> -> JSON`` fields, next to a
+    version counter that is bumped by every write. Changes are staged with
+    ``stage_upsert``/``stage_delete`` and written in one MULTI/EXEC by
+    ``flush()``, so only rows that actually changed are sent to Redis.
+    """
+
+    def __init__(self, client, hash_key=ITEMS_HASH_KEY, version_key=ITEMS_VERSION_KEY, key_field="item_id"):
+        self.client = client
+        self.hash_key = hash_key
+        self.version_key = version_key
+        self.key_field = key_field
+
+        self._lock = threading.Lock()
+        self._pending_upserts = {}
+        self._pending_deletes = set()
+
+    # Staging
+    def stage_upsert(self, item):
+        """Queue an item to be written on the next flush"""
+        field = str(item[self.key_field])
+        with self._lock:
+            self._pending_deletes.discard(field)
+            self._pending_upserts[field] = item
+
+    def stage_delete(self, item_id):
+        """Queue an item to be removed on the next flush"""
+        field = str(item_id)
+        with self._lock:
+            self._pending_upserts.pop(field, None)
+            self._pending_deletes.add(field)
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending_upserts) + len(self._pending_deletes)
+
+    def discard_pending(self):
+        """Drop staged changes, e.g. because a full replace supersedes them"""
+        with self._lock:
+            self._pending_upserts = {}
+            self._pending_deletes = set()
+
+    def drain_pending(self):
+        """Take all staged changes, leaving the staging area empty. Returns ``(upserts, deletes)``"""
+        with self._lock:
+            upserts = self._pending_upserts
+            deletes = list(self._pending_deletes)
+            self._pending_upserts = {}
+            self._pending_deletes = set()
+        return upserts, deletes
+
+    def restore_pending(self, upserts, deletes):
+        """Put drained changes back after a failed write, without overwriting newer ones"""
+        with self._lock:
+            for field, item in upserts.items():
+                if field not in self._pending_deletes:
+                    self._pending_upserts.setdefault(field, item)
+            for field in deletes:
+                if field not in self._pending_upserts:
+                    self._pending_deletes.add(field)
+
+    # Writes
+    def queue_writes(self, tx, upserts, deletes):
+        """Add the commands for ``upserts``/``deletes`` plus the version bump to a pipeline or transaction.
+
+        Upserted items may be given already encoded as JSON strings.
+        """
+        fields = list(upserts.items())
+        for chunk in _chunks(fields, CHUNK_SIZE):
+            tx.hset(self.hash_key, values={field: item if isinstance(item, str) else serialization.dumps(item)
+                                           for field, item in chunk})
+        for chunk in _chunks(deletes, CHUNK_SIZE):
+            tx.hdel(self.hash_key, *chunk)
+        tx.incr(self.version_key)
+        return tx
+
+    def flush(self):
+        """Write staged changes in one transaction. Returns the new version, or None if nothing was pending"""
+        upserts, deletes = self.drain_pending()
+        if not upserts and not deletes:
+            return None
+
+        try:
+            with metrics.span("redis", "flush"):
+                version = self.queue_writes(self.client.multi(), upserts, deletes).exec()[-1]
+        except Exception:
+            # Put the changes back so the next flush retries them
+            self.restore_pending(upserts, deletes)
+            raise
+
+        log.debug("Redis item cache: wrote %d item(s), removed %d item(s), version %s.", len(upserts), len(deletes), version)
+        return version
+
+    def queue_replace(self, tx, items):
+        """Add the commands that replace the whole hash with ``items`` to a pipeline or transaction.
+
+        ``items`` is a list of items, or a ``{key: encoded JSON}`` dict of already encoded ones.
+        """
+        tx.delete(self.hash_key)
+        if not isinstance(items, dict):
+            items = {str(item[self.key_field]): item for item in items}
+        return self.queue_writes(tx, items, [])
+
+    def replace_all(self, items):
+        """Atomically replace the whole hash with ``items``. Returns the new version.
+
+        Staged changes are kept: callers call ``discard_pending()`` *before*
+        reading ``items``, so changes staged after that read are still flushed.
+        """
+        with metrics.span("redis", "replace_all"):
+            return self.queue_replace(self.client.multi(), items).exec()[-1]
+
+    # Reads
+    @staticmethod
+    def _decode(value):
+        if value is None:
+            return None
+        return serialization.loads(value) if isinstance(value, (str, bytes)) else value
+
+    def get_item(self, item_id):
+        """Fetch a single cached item, or None"""
+        with metrics.span("redis", "hget"):
+            value = self.client.hget(self.hash_key, str(item_id))
+        return self._decode(value)
+
+    def get_items(self, item_ids):
+        """Fetch several cached items with pipelined HMGETs, preserving order (None for misses)"""
+        fields = [str(item_id) for item_id in item_ids]
+        if not fields:
+            return []
+        pipe = self.client.pipeline()
+        for chunk in _chunks(fields, CHUNK_SIZE):
+            pipe.hmget(self.hash_key, *chunk)
+        with metrics.span("redis", "hmget"):
+            chunks = pipe.exec()
+        values = [value for chunk in chunks for value in (chunk or [])]
+        return [self._decode(value) for value in values]
+
+    def get_all(self):
+        """Fetch every cached item together with the cache version, in one pipelined round trip"""
+        pipe = self.client.pipeline()
+        pipe.hgetall(self.hash_key)
+        pipe.get(self.version_key)
+        with metrics.span("redis", "hgetall"):
+            mapping, version = pipe.exec()
+        items = [self._decode(value) for value in (mapping or {}).values()]
+        return items, int(version) if version is not None else None
+
+    def get_version(self):
+        """Current cache version, or None if the cache was never written"""
+        with metrics.span("redis", "get"):
+            version = self.client.get(self.version_key)
+        return int(version) if version is not None else None
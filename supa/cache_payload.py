@@ -0,0 +1,80 @@
+import os
+import gzip
+import base64
+import hashlib
+import logging
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency, gzip is used instead
+    zstandard = None
+
+import serialization
+
+log = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+# Payloads whose JSON is at least this many bytes are stored compressed
+COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", "65536"))
+
+
+def _pick_compression(name):
+    if name == "zstd" and zstandard is None:
+        log.warning("CACHE_COMPRESSION 'zstd' needs the zstandard package; using gzip.")
+        return "gzip"
+    if name not in ("gzip", "zstd", "none"):
+        log.warning("Unknown CACHE_COMPRESSION '%s'; using gzip.", name)
+        return "gzip"
+    return name
+
+
+# gzip (readable everywhere), zstd (needs zstandard here and Node 22.15+ in the Nuxt reader) or none
+COMPRESSION = _pick_compression(os.getenv("CACHE_COMPRESSION", "gzip").lower())
+
+
+def content_hash(text):
+    """Short stable hash of a JSON payload, used as its ETag"""
+    return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+
+def _compress(data):
+    if COMPRESSION == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=5)
+
+
+def encode_payload(text, count=None):
+    """Wrap already encoded JSON in a versioned cache envelope.
+
+    The envelope is a JSON object ``{"format", "etag", "count", "encoding",
+    "data"}``: ``etag`` is the content hash of the uncompressed JSON, and
+    ``data`` is the JSON itself (``encoding`` "identity") or, at and above
+    ``COMPRESS_MIN_BYTES``, its gzip/zstd compression in base64 (Upstash
+    stores strings only).
+    """
+    etag = content_hash(text)
+    head = f'{{"format":{FORMAT_VERSION},"etag":"{etag}","count":{"null" if count is None else count},'
+    if COMPRESSION == "none" or len(text) < COMPRESS_MIN_BYTES:
+        return head + '"encoding":"identity","data":' + text + '}'
+    data = base64.b64encode(_compress(text.encode())).decode()
+    return head + f'"encoding":"{COMPRESSION}","data":"{data}"}}'
+
+
+def decode_payload(value):
+    """Read a cache envelope back. Returns ``(data, etag)``; values written before the envelope have no etag"""
+    if value is None:
+        return None, None
+    envelope = serialization.loads(value) if isinstance(value, (str, bytes)) else value
+    if not isinstance(envelope, dict) or "format" not in envelope:
+        return envelope, None
+    encoding = envelope.get("encoding", "identity")
+    data = envelope["data"]
+    if encoding == "gzip":
+        data = serialization.loads(gzip.decompress(base64.b64decode(data)))
+    elif encoding == "zstd":
+        if zstandard is None:
+            raise ValueError("cache payload is zstd-compressed but zstandard is not installed")
+        data = serialization.loads(zstandard.ZstdDecompressor().decompress(base64.b64decode(data)))
+    elif encoding != "identity":
+        raise ValueError(f"unknown cache payload encoding '{encoding}'")
+    return data, envelope.get("etag")
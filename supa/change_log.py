@@ -0,0 +1,175 @@
+import time
+import threading
+from collections import deque
+
+import metrics
+
+CHANGE_LOG_TABLE = '"public"."bridge_change_log"'
+CHECKPOINTS_TABLE = '"public"."bridge_checkpoints"'
+
+
+class ChangeLogReader:
+    """Reads the durable change log (migrations/004_items_change_log.sql) in sequence order.
+
+    ``read()`` returns rows after a position, stopping early at a gap in the
+    sequence while the transaction that may still fill it could be running,
+    so changes are never applied out of order.
+
+    A missing seq was allocated by a transaction that already had its id
+    before the read that first saw the gap, so it is below that read's
+    ``txid_snapshot_xmax``. Once a later read's oldest running transaction
+    is past that horizon, the writer has finished; if the seq is still
+    missing it was rolled back and the gap is skipped.
+    """
+
+    def __init__(self, pool, consumer="bridge"):
+        self.pool = pool
+        self.consumer = consumer
+        self._gap = None  # (first missing seq, txid horizon) of the gap being waited on
+
+    def checkpoint(self):
+        """Last seq saved for this consumer, or None on first run"""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f'SELECT "seq" FROM {CHECKPOINTS_TABLE} WHERE "consumer" = %s;', (self.consumer,))
+                row = cur.fetchone()
+        return row[0] if row else None
+
+    def head(self):
+        """Highest seq in the log (0 when empty)"""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f'SELECT coalesce(max("seq"), 0) FROM {CHANGE_LOG_TABLE};')
+                return cur.fetchone()[0]
+
+    def read(self, after, limit):
+        """Up to ``limit`` rows with seq > ``after`` that are safe to apply now.
+
+        Returns ``(rows, waiting)``; each row is ``(seq, tg_op, item_id,
+        new_row, old_row, created_at)``, and ``waiting`` is True when reading
+        stopped at a gap that may still be filled.
+        """
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    'SELECT "seq", "tg_op", "item_id", "new_row", "old_row", "created_at", '
+                    'txid_snapshot_xmin(txid_current_snapshot()), txid_snapshot_xmax(txid_current_snapshot()) '
+                    f'FROM {CHANGE_LOG_TABLE} WHERE "seq" > %s ORDER BY "seq" LIMIT %s;',
+                    (after, limit),
+                )
+                fetched = cur.fetchall()
+
+        rows = []
+        expected = after + 1
+        for row in fetched:
+            seq, oldest_running, horizon = row[0], row[6], row[7]
+            if seq != expected:
+                if self._gap is None or self._gap[0] != expected:
+                    self._gap = (expected, horizon)
+                if oldest_running < self._gap[1]:
+                    # The transaction holding a lower seq may still commit: wait for it
+                    return rows, True
+            self._gap = None
+            rows.append(row[:6])
+            expected = seq + 1
+        return rows, False
+
+    def save_checkpoint(self, seq):
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f'INSERT INTO {CHECKPOINTS_TABLE} ("consumer", "seq", "updated_at") VALUES (%s, %s, now()) '
+                    'ON CONFLICT ("consumer") DO UPDATE SET "seq" = EXCLUDED."seq", "updated_at" = now();',
+                    (self.consumer, seq),
+                )
+
+    def prune(self, retention_seconds):
+        """Delete rows every consumer has checkpointed past and that are older than the retention. Returns rows deleted"""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f'DELETE FROM {CHANGE_LOG_TABLE} '
+                    f'WHERE "seq" <= (SELECT coalesce(min("seq"), 0) FROM {CHECKPOINTS_TABLE}) '
+                    "AND \"created_at\" < now() - make_interval(secs => %s);",
+                    (retention_seconds,),
+                )
+                return cur.rowcount
+
+
+class ChangeLogProgress:
+    """Tracks which change-log seqs are in flight and the highest contiguous finished one.
+
+    Seqs must be ``started()`` in increasing order; ``finished()`` may arrive
+    in any order. ``position`` only advances past a seq once it and every
+    seq started before it have finished, so it is always safe to checkpoint.
+    """
+
+    def __init__(self, position=0, rate_window=60.0):
+        self._lock = threading.Condition()
+        self._in_flight = deque()
+        self._finished = set()
+        self.position = position
+        self.last_started = position
+
+        self.rate_window = rate_window
+        self._completions = deque()  # monotonic completion times within rate_window
+        self._stats = {
+            "applied": 0,
+            "last_lag_ms": 0.0,
+            "max_lag_ms": 0.0,
+        }
+
+    def reset(self, position):
+        with self._lock:
+            self._in_flight.clear()
+            self._finished.clear()
+            self.position = self.last_started = position
+            self._lock.notify_all()
+
+    def started(self, seq):
+        with self._lock:
+            self._in_flight.append(seq)
+            self.last_started = seq
+
+    def finished(self, seq, created_at=None):
+        """Mark ``seq`` applied; ``created_at`` (epoch seconds of the change) feeds the lag stats"""
+        now = time.monotonic()
+        lag = None
+        with self._lock:
+            if seq <= self.position:
+                return  # from before a reset()
+            self._finished.add(seq)
+            while self._in_flight and self._in_flight[0] in self._finished:
+                self.position = self._in_flight.popleft()
+                self._finished.discard(self.position)
+            self._lock.notify_all()
+            self._stats["applied"] += 1
+            self._completions.append(now)
+            while self._completions and self._completions[0] < now - self.rate_window:
+                self._completions.popleft()
+            if created_at is not None:
+                lag = max(0.0, time.time() - created_at)
+                lag_ms = lag * 1000
+                self._stats["last_lag_ms"] = lag_ms
+                self._stats["max_lag_ms"] = max(self._stats["max_lag_ms"], lag_ms)
+        if lag is not None:
+            metrics.observe("bridge_listener_lag_seconds", lag)
+
+    def wait_below(self, limit, timeout=None):
+        """Block until fewer than ``limit`` seqs are in flight. Returns False if ``timeout`` passed first"""
+        with self._lock:
+            return self._lock.wait_for(lambda: len(self._in_flight) < limit, timeout)
+
+    @property
+    def in_flight(self):
+        with self._lock:
+            return len(self._in_flight)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["position"] = self.position
+            stats["last_started"] = self.last_started
+            stats["in_flight"] = len(self._in_flight)
+            stats["applied_per_sec"] = len(self._completions) / self.rate_window
+            return stats
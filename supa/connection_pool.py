@@ -0,0 +1,297 @@
+import re
+import time
+import threading
+from collections import deque
+import logging
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+
+_FIRST_WORD = re.compile(r"\s*(\w+)")
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """Cursor that times every statement into the ``postgres`` spans, labelled by its first keyword.
+
+    Use it as the connection's ``cursor_factory`` so every query is covered,
+    including named cursors and ``execute_values`` pages.
+    """
+
+    def _op(self, query):
+        if hasattr(query, "as_string"):  # psycopg2.sql.Composable
+            query = query.as_string(self)
+        if isinstance(query, bytes):
+            query = query[:64].decode("utf-8", "replace")
+        match = _FIRST_WORD.match(query)
+        return match.group(1).lower() if match else "unknown"
+
+    def execute(self, query, vars=None):
+        with metrics.span("postgres", self._op(query)):
+            return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        with metrics.span("postgres", self._op(query)):
+            return super().executemany(query, vars_list)
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection could be checked out within the timeout"""
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of psycopg2 connections.
+
+    Connections are created lazily up to ``maxconn``. Idle connections are
+    health-checked on checkout and closed by a background reaper once they
+    have been idle longer than ``idle_timeout`` (never going below ``minconn``).
+    """
+
+    def __init__(self, connect, minconn=1, maxconn=10, checkout_timeout=30.0,
+                 idle_timeout=300.0, ping_after=5.0, reap_interval=30.0):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError(f"Invalid pool bounds: minconn={minconn}, maxconn={maxconn}")
+        self._connect = connect
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.checkout_timeout = checkout_timeout
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+        self.reap_interval = reap_interval
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (conn, returned_at), most recently used on the right
+        self._in_use = set()
+        self._pending = 0  # connections being opened outside the lock
+        self._closed = False
+        self._reaper = None
+
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "created": 0,
+            "closed": 0,
+            "failed_health_checks": 0,
+            "reaped": 0,
+            "checkout_time_total": 0.0,
+            "checkout_time_max": 0.0,
+        }
+
+    # Internal helpers
+    def _total(self):
+        return len(self._idle) + len(self._in_use) + self._pending
+
+    def _close_conn(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._stats["closed"] += 1
+
+    def _is_healthy(self, conn, idle_for):
+        if conn.closed:
+            return False
+        if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if idle_for < self.ping_after:
+            return True
+        try:
+            cur = conn.cursor()
+            try:
+                cur.execute("SELECT 1;")
+            finally:
+                cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _ensure_reaper(self):
+        if self._reaper is None and self.reap_interval:
+            self._reaper = threading.Thread(target=self._reap_loop, name="pg-pool-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(self.reap_interval)
+            with self._cond:
+                if self._closed:
+                    return
+            self.reap()
+            self._fill_to_min()
+
+    def _fill_to_min(self):
+        while True:
+            with self._cond:
+                if self._closed or self._total() >= self.minconn:
+                    return
+                self._pending += 1
+            try:
+                conn = self._connect()
+            except Exception as e:
+                log.warning("Connection pool: failed to open connection: %s", e)
+                with self._cond:
+                    self._pending -= 1
+                    self._cond.notify()
+                return
+            with self._cond:
+                self._pending -= 1
+                self._stats["created"] += 1
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    # Public API
+    def getconn(self, timeout=None):
+        """Check out a healthy connection, waiting up to ``timeout`` seconds"""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        waited = False
+
+        with self._cond:
+            if self._closed:
+                raise psycopg2.InterfaceError("connection pool is closed")
+            self._ensure_reaper()
+
+        while True:
+            conn = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise psycopg2.InterfaceError("connection pool is closed")
+                    if self._idle:
+                        conn, returned_at = self._idle.pop()
+                        self._in_use.add(conn)
+                        break
+                    if self._total() < self.maxconn:
+                        self._pending += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeoutError(
+                            f"Timed out after {timeout:.1f}s waiting for a connection "
+                            f"({len(self._in_use)}/{self.maxconn} in use)"
+                        )
+                    if not waited:
+                        waited = True
+                        self._stats["waits"] += 1
+                    self._cond.wait(remaining)
+
+            if conn is None:
+                # Open a new connection outside the lock so other threads are not blocked.
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._pending -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._pending -= 1
+                    self._stats["created"] += 1
+                    self._in_use.add(conn)
+            elif not self._is_healthy(conn, time.monotonic() - returned_at):
+                with self._cond:
+                    self._in_use.discard(conn)
+                    self._stats["failed_health_checks"] += 1
+                    self._close_conn(conn)
+                    self._cond.notify()
+                continue
+
+            elapsed = time.monotonic() - start
+            with self._cond:
+                self._stats["checkouts"] += 1
+                self._stats["checkout_time_total"] += elapsed
+                self._stats["checkout_time_max"] = max(self._stats["checkout_time_max"], elapsed)
+            return conn
+
+    def putconn(self, conn, discard=False):
+        """Return a connection to the pool, closing it if broken or ``discard`` is set"""
+        if not conn.closed and not discard:
+            try:
+                if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            self._in_use.discard(conn)
+            if self._closed or discard or conn.closed:
+                self._close_conn(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Check out a connection for the duration of the block.
+
+        The transaction is committed when the block exits cleanly and rolled
+        back otherwise; the connection always goes back to the pool.
+        """
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            self.putconn(conn, discard=bool(conn.closed))
+
+    def reap(self):
+        """Close connections idle for longer than ``idle_timeout``, keeping ``minconn`` open"""
+        now = time.monotonic()
+        to_close = []
+        with self._cond:
+            # Oldest connections sit on the left of the deque.
+            while self._idle and self._total() > self.minconn:
+                conn, returned_at = self._idle[0]
+                if now - returned_at < self.idle_timeout:
+                    break
+                self._idle.popleft()
+                to_close.append(conn)
+            for conn in to_close:
+                self._close_conn(conn)
+            self._stats["reaped"] += len(to_close)
+        return len(to_close)
+
+    def closeall(self):
+        """Close every idle connection and refuse further checkouts"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                self._close_conn(conn)
+            self._cond.notify_all()
+
+    def stats(self):
+        """Snapshot of pool counters for monitoring"""
+        with self._cond:
+            checkouts = self._stats["checkouts"]
+            return {
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "total": self._total(),
+                "checkouts": checkouts,
+                "waits": self._stats["waits"],
+                "timeouts": self._stats["timeouts"],
+                "created": self._stats["created"],
+                "closed": self._stats["closed"],
+                "failed_health_checks": self._stats["failed_health_checks"],
+                "reaped": self._stats["reaped"],
+                "avg_checkout_ms": (self._stats["checkout_time_total"] / checkouts * 1000) if checkouts else 0.0,
+                "max_checkout_ms": self._stats["checkout_time_max"] * 1000,
+            }
@@ -1,22 +1,60 @@
 import psycopg2
+import psycopg2.extras
 import os
 import re
-import json
+import uuid
+import logging
+import time
 import select
 import threading
 from supabase import create_client, Client
+from supabase.lib.client_options import SyncClientOptions
 from dotenv import load_dotenv
 from flask_socketio import SocketIO
 from upstash_redis import Redis  # Added for Redis cache
 from datetime import datetime  # Added for timestamping
+from decimal import Decimal
+import metrics
+import serialization
+from connection_pool import ConnectionPool, TimedCursor
+from http_transport import HttpTransport
+from rebuild_scheduler import RebuildScheduler
+from inventory_stats import InventoryStatsAggregator
+from inventory_snapshot import InventorySnapshot
+from read_cache import ReadThroughCache
+from cache_backend import RedisItemCache, ALL_ITEMS_BLOB_KEY
+from cache_payload import encode_payload
+from supabase_sync import SupabaseBatchSyncer
+from pipeline import ChangeEvent, ChangePipeline, SinkResync, RESYNC
+from change_log import ChangeLogReader, ChangeLogProgress
+from replication_source import LogicalReplicationSource
+from broadcast import ItemBroadcaster
+from leader import LeaderLock
+from table_bridge import TableConfig, TableBridge, MultiTableListener, load_table_configs, register_transform
+
+log = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
+metrics.configure_logging()
+
+# Shared keep-alive HTTP transport for the Supabase and Upstash REST clients
+http_transport = HttpTransport(
+    timeout=float(os.getenv("HTTP_TIMEOUT", "10")),
+    connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", "5")),
+    max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "20")),
+    max_keepalive=int(os.getenv("HTTP_MAX_KEEPALIVE", "10")),
+    http2=os.getenv("HTTP_HTTP2", "true").lower() == "true",
+)
+
+def get_http_stats():
+    """Return per-endpoint HTTP latency histograms"""
+    return http_transport.stats()
 
 # Supabase Credentials
 url: str = os.getenv("SUPABASE_URL")
 key: str = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(url, key)
+supabase: Client = create_client(url, key, options=SyncClientOptions(httpx_client=http_transport.client))
 
 # Upstash Redis Credentials
 UPSTASH_URL: str = os.getenv("UPSTASH_REDIS_REST_URL")
@@ -27,14 +65,15 @@ redis_client = None
 if UPSTASH_URL and UPSTASH_TOKEN:
     try:
         redis_client = Redis(url=UPSTASH_URL, token=UPSTASH_TOKEN)
+        http_transport.attach_to_upstash(redis_client)
         # Test connection
         redis_client.ping()
-        print("Successfully connected to Upstash Redis.")
+        log.info("Successfully connected to Upstash Redis.")
     except Exception as e:
-        print(f"WARNING: Failed to connect to Upstash Redis: {e}. Redis caching will be disabled.")
+        log.warning("Failed to connect to Upstash Redis: %s. Redis caching will be disabled.", e)
         redis_client = None
 else:
-    print("WARNING: Upstash Redis URL or Token not configured. Redis caching will be disabled.")
+    log.warning("Upstash Redis URL or Token not configured. Redis caching will be disabled.")
 
 # Helper functions for data processing
 def get_stock_level_py(stock_quantity_str):
@@ -49,6 +88,8 @@ def get_stock_level_py(stock_quantity_str):
 
 def parse_currency_value_py(value_str):
     if value_str is None: return 0.0
+    # Already numeric (precomputed columns, or an item that was parsed before): nothing to strip
+    if isinstance(value_str, (int, float, Decimal)): return float(value_str)
     s = str(value_str).strip()
 
     # Use regex to find and remove "Rs." or "Rs " prefix, including optional space and dot
@@ -61,162 +102,551 @@ def parse_currency_value_py(value_str):
     try:
         return float(s)
     except ValueError:
-        print(f"Warning: Could not parse currency value from original '{value_str}' (processed as '{s}')")
+        log.warning("Could not parse currency value from original '%s' (processed as '%s')", value_str, s)
         return 0.0
 
+# Mirrored tables (bridge_tables.json, see table_bridge.py). The items table is served by the
+# dedicated inventory path below; every other configured table runs through a generic TableBridge.
+register_transform("currency", parse_currency_value_py)
+BRIDGE_TABLES_CONFIG = os.getenv("BRIDGE_TABLES_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "bridge_tables.json"))
+BRIDGE_TABLE_WORKERS = int(os.getenv("BRIDGE_TABLE_WORKERS", "2"))
+table_configs = load_table_configs(BRIDGE_TABLES_CONFIG, default_workers=BRIDGE_TABLE_WORKERS)
+ITEMS_TABLE = next((config for config in table_configs if config.handler == "inventory"), None) or TableConfig({
+    "table": "public.items", "primary_key": "item_id", "handler": "inventory",
+    "supabase_table": "items", "cache_key": "cache:inventory_items", "channel": "items_channel",
+})
+
+# Per-item hash cache (see cache_backend.py)
+item_cache = RedisItemCache(redis_client, hash_key=ITEMS_TABLE.cache_key,
+                            version_key=f"{ITEMS_TABLE.cache_key}:version") if redis_client else None
+WRITE_LEGACY_CACHE_BLOB = os.getenv("REDIS_WRITE_LEGACY_BLOB", "true").lower() == "true"
+
 # PostgreSQL Connection
+PG_CONNECTION_PARAMS = {
+    "host": os.getenv("PG_HOST", "localhost"),
+    "database": os.getenv("PG_DATABASE", "post-supa"),
+    "user": os.getenv("PG_USER", "postgres"),
+    "password": os.getenv("PG_PASSWORD", ""),
+}
+
 def get_postgres_connection():
-    """Get a connection to PostgreSQL database"""
-    return psycopg2.connect(
-        host="localhost",
-        database="post-supa",
-        user="postgres",
-        password=""
-    )
+    """Get a connection to PostgreSQL database (every statement is timed, see connection_pool.TimedCursor)"""
+    return psycopg2.connect(cursor_factory=TimedCursor, **PG_CONNECTION_PARAMS)
+
+# Shared connection pool used by all CRUD paths (the listener keeps its own dedicated connection)
+pg_pool = ConnectionPool(
+    get_postgres_connection,
+    minconn=int(os.getenv("PG_POOL_MIN", "1")),
+    maxconn=int(os.getenv("PG_POOL_MAX", "10")),
+    checkout_timeout=float(os.getenv("PG_POOL_CHECKOUT_TIMEOUT", "30")),
+    idle_timeout=float(os.getenv("PG_POOL_IDLE_TIMEOUT", "300")),
+)
+
+def get_pool_stats():
+    """Return connection pool statistics"""
+    return pg_pool.stats()
 
 # Core CRUD operations
+def row_to_item(row):
+    """Convert an items row (in select order) into the API item dict"""
+    return {
+        "item_id": int(row[0]) if row[0] is not None else 0,
+        "name": row[1] if row[1] is not None else "",
+        "sku": row[2] if row[2] is not None else "",
+        "rate": row[3] if row[3] is not None else "",
+        "purchase rate": row[4] if row[4] is not None else "",
+        "stock on hand": int(row[5]) if row[5] is not None else 0
+    }
+
+def row_to_parsed_item(row):
+    """Convert an items row into a dict with parsed currency values"""
+    return {
+        "item_id": str(row[0]) if row[0] is not None else "0",  # Treat item_id as a string
+        "name": row[1] if row[1] is not None else "",
+        "sku": row[2] if row[2] is not None else "",
+        "rate": parse_currency_value_py(row[3]),
+        "purchase rate": parse_currency_value_py(row[4]),
+        "stock on hand": int(row[5]) if row[5] is not None else 0
+    }
+
+def snapshot_row(row):
+    """Convert an items row (optionally followed by the numeric rate columns) into a snapshot row"""
+    rate_value = row[6] if len(row) > 6 and row[6] is not None else row[3]
+    purchase_rate_value = row[7] if len(row) > 7 and row[7] is not None else row[4]
+    return (
+        int(row[0]) if row[0] is not None else 0,
+        row[1] if row[1] is not None else "",
+        row[2] if row[2] is not None else "",
+        row[3] if row[3] is not None else "",
+        row[4] if row[4] is not None else "",
+        int(row[5]) if row[5] is not None else 0,
+        parse_currency_value_py(rate_value),
+        parse_currency_value_py(purchase_rate_value),
+    )
+
 def get_all_items():
-    """Get all items from the local PostgreSQL database"""
-    conn = get_postgres_connection()
-    cur = conn.cursor()
+    """Get all items (from the in-memory snapshot once it is loaded)"""
+    if inventory_snapshot.loaded:
+        return [row_to_item(row) for row in inventory_snapshot.select()]
     try:
-        cur.execute('SELECT "item_id", "name", "sku", "rate", "purchase rate", "stock on hand" FROM "public"."items";')
-        rows = cur.fetchall()
-        items = []
-        for row in rows:
-            item = {
-                "item_id": int(row[0]) if row[0] is not None else 0,
-                "name": row[1] if row[1] is not None else "",
-                "sku": row[2] if row[2] is not None else "",
-                "rate": row[3] if row[3] is not None else "",
-                "purchase rate": row[4] if row[4] is not None else "",
-                "stock on hand": int(row[5]) if row[5] is not None else 0
-            }
-            items.append(item)
-        return items
+        with pg_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute('SELECT "item_id", "name", "sku", "rate", "purchase rate", "stock on hand" FROM "public"."items";')
+                rows = cur.fetchall()
+        return [row_to_item(row) for row in rows]
     except Exception as e:
-        print(f"Error getting items: {e}")
+        log.error("Error getting items: %s", e)
         return []
-    finally:
-        cur.close()
-        conn.close()
+
+# Server-side filtering (the SQL helpers and indexes are created by migrations/001_items_search_indexes.sql)
+ITEM_SELECT_SQL = 'SELECT "item_id", "name", "sku", "rate", "purchase rate", "stock on hand" FROM "public"."items"'
+# Stored numeric rates, falling back to parsing the string for rows migration 008 has not backfilled yet
+PARSED_ITEM_SELECT_SQL = ('SELECT "item_id", "name", "sku", coalesce("rate_numeric", bridge_parse_currency("rate"), 0), '
+                          'coalesce("purchase_rate_numeric", bridge_parse_currency("purchase rate"), 0), "stock on hand" '
+                          'FROM "public"."items"')
+RATE_NUMERIC_SQL = 'bridge_parse_currency("rate")'
+RATE_SQL = 'coalesce("rate_numeric", bridge_parse_currency("rate"))'  # indexed by items_rate_effective_idx (migration 008)
+STOCK_LEVEL_SQL = 'bridge_stock_level("stock on hand"::integer)'  # also the predicate of items_low_stock_idx (migration 007)
+STOCK_LEVELS = ('low', 'medium', 'high')
+SORT_COLUMNS = {
+    "item_id": '"item_id"',
+    "name": '"name"',
+    "sku": '"sku"',
+    "rate": RATE_NUMERIC_SQL,
+    "stock": '"stock on hand"',
+}
+
+def build_items_query(q=None, stock_level=None, min_rate=None, max_rate=None, sort=None, after=None):
+    """Build the SQL and parameters for a filtered, sorted items query.
+
+    Raises ValueError for an unknown stock level or sort key, or when keyset
+    pagination (``after``) is combined with a sort other than item_id.
+    """
+    clauses, params = [], []
+    if q:
+        pattern = '%' + q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        clauses.append('("name" ILIKE %s OR "sku" ILIKE %s)')
+        params += [pattern, pattern]
+    if stock_level:
+        if stock_level not in STOCK_LEVELS:
+            raise ValueError(f"Invalid stock_level '{stock_level}', expected one of {', '.join(STOCK_LEVELS)}")
+        clauses.append(f'{STOCK_LEVEL_SQL} = %s')
+        params.append(stock_level)
+    rate_sql = RATE_SQL if numeric_rate_columns_available() else RATE_NUMERIC_SQL
+    if min_rate is not None:
+        clauses.append(f'{rate_sql} >= %s')
+        params.append(min_rate)
+    if max_rate is not None:
+        clauses.append(f'{rate_sql} <= %s')
+        params.append(max_rate)
+
+    sort = sort or "item_id"
+    descending = sort.startswith('-')
+    column = SORT_COLUMNS.get(sort.lstrip('-'))
+    if column == RATE_NUMERIC_SQL:
+        column = rate_sql
+    if column is None:
+        raise ValueError(f"Invalid sort '{sort}', expected one of {', '.join(SORT_COLUMNS)} (prefix with '-' for descending)")
+    if after is not None:
+        if column != '"item_id"':
+            raise ValueError("'after' can only be used when sorting by item_id")
+        clauses.append('"item_id" < %s' if descending else '"item_id" > %s')
+        params.append(after)
+
+    direction = "DESC" if descending else "ASC"
+    order = f'{column} {direction}'
+    if column != '"item_id"':
+        order += ', "item_id" ASC'
+
+    sql = ITEM_SELECT_SQL
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    sql += f' ORDER BY {order}'
+    return sql, params
+
+def get_items_page(after=None, limit=100, **filters):
+    """Get one page of items, starting after the given item_id (keyset pagination).
+
+    Query errors (e.g. a missing migration) are re-raised rather than returned as an empty page.
+    """
+    sql, params = build_items_query(after=after, **filters)
+    if inventory_snapshot.loaded:
+        return [row_to_item(row) for row in inventory_snapshot.select(after=after, limit=limit, **filters)]
+    try:
+        with pg_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql + ' LIMIT %s;', params + [limit])
+                rows = cur.fetchall()
+        return [row_to_item(row) for row in rows]
+    except Exception as e:
+        log.error("Error getting items page: %s", e)
+        raise
+
+def iter_items(batch_size=1000, **filters):
+    """Return a generator of item batches for all (matching) items.
+
+    The query is validated up front so a bad filter raises ValueError here
+    rather than halfway through a streamed response.
+    """
+    sql, params = build_items_query(**filters)
+    if inventory_snapshot.loaded:
+        return _iter_snapshot_batches(inventory_snapshot.select(**filters), batch_size)
+    return _iter_item_batches(sql, params, batch_size)
+
+def _iter_snapshot_batches(rows, batch_size):
+    """Yield item batches from snapshot rows, building the dicts one batch at a time"""
+    for i in range(0, len(rows), batch_size):
+        yield [row_to_item(row) for row in rows[i:i + batch_size]]
+
+def _iter_item_batches(sql, params, batch_size):
+    """Yield item batches through a server-side cursor, keeping memory flat.
+
+    Errors are re-raised so a streamed response is cut off instead of ending
+    as a well-formed but partial result.
+    """
+    try:
+        with pg_pool.connection() as conn:
+            # Named cursors live on the server; only batch_size rows are held in Python at a time
+            with conn.cursor(name="items_stream") as cur:
+                cur.itersize = batch_size
+                cur.execute(sql + ';', params)
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield [row_to_item(row) for row in rows]
+    except Exception as e:
+        log.error("Error streaming items: %s", e)
+        raise
+
+# Precomputed numeric rate columns (migrations/002_items_numeric_rates.sql)
+_numeric_rate_columns = None
+
+def numeric_rate_columns_available():
+    """Whether items has the rate_numeric / purchase_rate_numeric columns (checked once)"""
+    global _numeric_rate_columns
+    if _numeric_rate_columns is None:
+        try:
+            with pg_pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "SELECT count(*) FROM information_schema.columns "
+                        "WHERE table_schema = 'public' AND table_name = 'items' "
+                        "AND column_name IN ('rate_numeric', 'purchase_rate_numeric');"
+                    )
+                    _numeric_rate_columns = cur.fetchone()[0] == 2
+        except Exception as e:
+            log.error("Error checking for numeric rate columns: %s", e)
+            return False
+        if not _numeric_rate_columns:
+            log.info("Numeric rate columns not found; currency strings will be parsed on read (run migrate.py).")
+    return _numeric_rate_columns
+
+def parsed_items_select_sql():
+    """SELECT for parsed items, reading the stored numeric rates when they exist"""
+    return PARSED_ITEM_SELECT_SQL if numeric_rate_columns_available() else ITEM_SELECT_SQL
 
 def get_all_items_from_pg():
     """Get all items from the local PostgreSQL database with column names"""
-    conn = get_postgres_connection()
-    cur = conn.cursor()
     items_list = []
+    sql = parsed_items_select_sql()
     try:
-        cur.execute('SELECT "item_id", "name", "sku", "rate", "purchase rate", "stock on hand" FROM "public"."items";')
-        rows = cur.fetchall()
-        columns = [desc[0] for desc in cur.description]
-        for row in rows:
-            items_list.append({
-                "item_id": str(row[0]) if row[0] is not None else "0",  # Treat item_id as a string
-                "name": row[1] if row[1] is not None else "",
-                "sku": row[2] if row[2] is not None else "",
-                "rate": parse_currency_value_py(row[3]),
-                "purchase rate": parse_currency_value_py(row[4]),
-                "stock on hand": int(row[5]) if row[5] is not None else 0
-            })
+        with pg_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql + ';')
+                rows = cur.fetchall()
+        items_list = [row_to_parsed_item(row) for row in rows]
     except Exception as e:
-        print(f"Error getting all items from PG: {e}")
-    finally:
-        cur.close()
-        conn.close()
+        log.error("Error getting all items from PG: %s", e)
     return items_list
 
 def get_item_by_id(item_id):
     """Get a specific item by ID from the local PostgreSQL database"""
-    conn = get_postgres_connection()
-    cur = conn.cursor()
     try:
-        cur.execute('SELECT "item_id", "name", "sku", "rate", "purchase rate", "stock on hand" FROM "public"."items" WHERE item_id = %s;', (item_id,))
-        row = cur.fetchone()
+        with pg_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute('SELECT "item_id", "name", "sku", "rate", "purchase rate", "stock on hand" FROM "public"."items" WHERE item_id = %s;', (item_id,))
+                row = cur.fetchone()
         if row:
-            item = {
-                "item_id": int(row[0]) if row[0] is not None else 0,
-                "name": row[1] if row[1] is not None else "",
-                "sku": row[2] if row[2] is not None else "",
-                "rate": row[3] if row[3] is not None else "",
-                "purchase rate": row[4] if row[4] is not None else "",
-                "stock on hand": int(row[5]) if row[5] is not None else 0
-            }
-            return item
+            return row_to_item(row)
         return None
     except Exception as e:
-        print(f"Error getting item by ID: {e}")
+        log.error("Error getting item by ID: %s", e)
         return None
+
+def get_item(item_id):
+    """Get a specific item for the API: in-memory snapshot once it is loaded, else the local read-through cache"""
+    if inventory_snapshot.loaded:
+        row = inventory_snapshot.get(item_id)
+        return row_to_item(row) if row else None
+    if not read_cache_invalidation_active():
+        # Nothing would tell this process about changes made elsewhere
+        return get_item_by_id(item_id)
+    item = item_read_cache.get(int(item_id))
+    if item is None:
+        stamp = item_read_cache.stamp()
+        item = get_item_by_id(item_id)
+        if item is None:
+            return None
+        item_read_cache.put(int(item_id), item, stamp)
+    return dict(item)
+
+# Local read-through cache for single-item reads, invalidated by items_channel notifications and local writes
+item_read_cache = ReadThroughCache(
+    maxsize=int(os.getenv("ITEM_READ_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("ITEM_READ_CACHE_TTL", "60")),
+)
+
+def invalidate_cached_item(item_id):
+    """Drop one item from the local read-through cache"""
+    try:
+        item_read_cache.invalidate(int(item_id))
+    except (TypeError, ValueError):
+        pass
+
+def disable_read_cache(reason):
+    """Turn the read-through cache off for this process (reads go straight to Postgres)"""
+    if item_read_cache.enabled:
+        item_read_cache.maxsize = 0
+        item_read_cache.clear()
+        log.info("Item read cache disabled: %s", reason)
+
+# Invalidation relies on items_channel notifications, which the replication change source does without
+if os.getenv("CHANGE_SOURCE", "listen") == "replication":
+    disable_read_cache("CHANGE_SOURCE=replication sends no items_channel notifications")
+
+# API reads use item_read_cache only while this process LISTENs for changes (API workers run no bridge listener)
+_read_cache_listening = threading.Event()
+_read_cache_invalidator = None
+
+def read_cache_invalidation_active():
+    """Start the invalidation listener on first use; True once it is listening"""
+    global _read_cache_invalidator
+    if not item_read_cache.enabled:
+        return False
+    if _read_cache_invalidator is None:
+        _read_cache_invalidator = threading.Thread(target=read_cache_invalidator_thread, name="read-cache-invalidator",
+                                                   daemon=True)
+        _read_cache_invalidator.start()
+    return _read_cache_listening.is_set()
+
+def read_cache_invalidator_thread():
+    """Thread that drops changed items from the read-through cache, reconnecting after errors"""
+    backoff = 1.0
+    while True:
+        started_at = time.monotonic()
+        try:
+            listen_for_invalidations()
+        except Exception as e:
+            log.error("Error in read cache invalidator: %s", e)
+        if time.monotonic() - started_at > 60:
+            backoff = 1.0
+        time.sleep(backoff)
+        backoff = min(backoff * 2, 30.0)
+
+def listen_for_invalidations():
+    """LISTEN on the items channel and invalidate each changed item until the connection fails"""
+    conn = get_postgres_connection()
+    try:
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cur:
+            cur.execute(f'LISTEN "{ITEMS_TABLE.channel}";')
+        # Entries cached while nobody was listening may have missed their invalidation
+        item_read_cache.clear()
+        _read_cache_listening.set()
+        while True:
+            if select.select([conn], [], [], 5) == ([], [], []):
+                continue
+            conn.poll()
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                if notify.channel == ITEMS_TABLE.channel:
+                    invalidate_cached_item(serialization.loads(notify.payload).get('item_id'))
     finally:
-        cur.close()
+        _read_cache_listening.clear()
+        item_read_cache.clear()
         conn.close()
 
+def get_read_cache_stats():
+    """Return local read-through cache hit/miss/eviction counters"""
+    stats = item_read_cache.stats()
+    stats["listening"] = _read_cache_listening.is_set()
+    return stats
+
+# In-memory inventory snapshot: loaded by full rebuilds, kept current by the change listener
+inventory_snapshot = InventorySnapshot()
+
+SNAPSHOT_SELECT_SQL = 'SELECT "item_id", "name", "sku", "rate", "purchase rate", "stock on hand", "rate_numeric", "purchase_rate_numeric" FROM "public"."items"'
+
+def snapshot_select_sql():
+    """SELECT for snapshot rows, including the stored numeric rates when they exist"""
+    return SNAPSHOT_SELECT_SQL if numeric_rate_columns_available() else ITEM_SELECT_SQL
+
+def load_inventory_snapshot(batch_size=5000):
+    """Reload the in-memory snapshot from PostgreSQL. Returns the item count, or None on error"""
+    sql = snapshot_select_sql()
+    inventory_snapshot.begin_load()
+    try:
+        with pg_pool.connection() as conn:
+            # Stream rows straight into the columns instead of materializing every row first
+            with conn.cursor(name="items_snapshot") as cur:
+                cur.itersize = batch_size
+                cur.execute(sql + ';')
+                count = inventory_snapshot.load(snapshot_row(row) for row in cur)
+        log.info("Loaded %s items into the in-memory snapshot.", count)
+        return count
+    except Exception as e:
+        inventory_snapshot.abort_load()
+        log.error("Error loading inventory snapshot: %s", e)
+        return None
+
+def apply_change_to_snapshot(tg_op, item_id, item=None):
+    """Apply one change to the in-memory snapshot and the incremental stats"""
+    if tg_op == 'DELETE':
+        if item_id is not None:
+            inventory_stats.apply(old=inventory_snapshot.remove(item_id))
+    elif item:
+        row = snapshot_row((item.get("item_id"), item.get("name"), item.get("sku"), item.get("rate"),
+                            item.get("purchase rate"), item.get("stock on hand")))
+        inventory_stats.apply(old=inventory_snapshot.upsert(row), new=(row[6], row[5]))
+
+def apply_write_to_snapshot(tg_op, item_id, item=None):
+    """Apply an API write to the snapshot right away so the next read sees it (its NOTIFY echo is then a no-op)"""
+    if inventory_snapshot.loaded:
+        apply_change_to_snapshot(tg_op, item_id, item)
+
+def get_snapshot_stats():
+    """Return in-memory snapshot size and counters"""
+    return inventory_snapshot.stats()
+
 def insert_item(item):
     """Insert a new item into the PostgreSQL database"""
-    conn = get_postgres_connection()
-    conn.autocommit = True
-    cur = conn.cursor()
     try:
-        cur.execute(
-            'INSERT INTO "public"."items" ("name", "sku", "rate", "purchase rate", "stock on hand") VALUES (%s, %s, %s, %s, %s) RETURNING item_id;',
-            (item["name"], item["sku"], item["rate"], item["purchase rate"], item["stock on hand"])
-        )
-        
-        item_id = cur.fetchone()[0]
+        with pg_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    'INSERT INTO "public"."items" ("name", "sku", "rate", "purchase rate", "stock on hand") VALUES (%s, %s, %s, %s, %s) RETURNING item_id;',
+                    (item["name"], item["sku"], item["rate"], item["purchase rate"], item["stock on hand"])
+                )
+                item_id = cur.fetchone()[0]
+
         item["item_id"] = item_id
+        apply_write_to_snapshot('INSERT', item_id, item)
         return item
     except Exception as e:
-        print(f"Error inserting item: {e}")
+        log.error("Error inserting item: %s", e)
         return None
-    finally:
-        cur.close()
-        conn.close()
 
 def update_item(item_id, item):
     """Update an existing item in the PostgreSQL database"""
-    conn = get_postgres_connection()
-    conn.autocommit = True
-    cur = conn.cursor()
     try:
-        cur.execute(
-            'UPDATE "public"."items" SET "name" = %s, "sku" = %s, "rate" = %s, "purchase rate" = %s, "stock on hand" = %s WHERE item_id = %s RETURNING item_id;',
-            (item["name"], item["sku"], item["rate"], item["purchase rate"], item["stock on hand"], item_id)
-        )
-        
-        updated_id = cur.fetchone()
+        with pg_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    'UPDATE "public"."items" SET "name" = %s, "sku" = %s, "rate" = %s, "purchase rate" = %s, "stock on hand" = %s WHERE item_id = %s RETURNING item_id;',
+                    (item["name"], item["sku"], item["rate"], item["purchase rate"], item["stock on hand"], item_id)
+                )
+                updated_id = cur.fetchone()
+
+        invalidate_cached_item(item_id)
         if updated_id:
             item["item_id"] = item_id
+            apply_write_to_snapshot('UPDATE', item_id, item)
             return item
         return None
     except Exception as e:
-        print(f"Error updating item: {e}")
+        log.error("Error updating item: %s", e)
         return None
-    finally:
-        cur.close()
-        conn.close()
 
 def delete_item(item_id):
     """Delete an item from the PostgreSQL database"""
-    conn = get_postgres_connection()
-    conn.autocommit = True
-    cur = conn.cursor()
     try:
-        cur.execute('DELETE FROM "public"."items" WHERE item_id = %s RETURNING item_id;', (item_id,))
-        deleted_id = cur.fetchone()
+        with pg_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute('DELETE FROM "public"."items" WHERE item_id = %s RETURNING item_id;', (item_id,))
+                deleted_id = cur.fetchone()
+        invalidate_cached_item(item_id)
+        if deleted_id is not None:
+            apply_write_to_snapshot('DELETE', item_id)
         return deleted_id is not None
     except Exception as e:
-        print(f"Error deleting item: {e}")
+        log.error("Error deleting item: %s", e)
         return False
-    finally:
-        cur.close()
-        conn.close()
+
+# Bulk operations (one transaction and one statement per page of rows)
+ITEM_FIELDS = ("name", "sku", "rate", "purchase rate", "stock on hand")
+
+def bulk_insert_items(items, page_size=1000):
+    """Insert many items in one transaction with multi-row INSERTs. Returns the items with their new IDs"""
+    rows = [tuple(item[field] for field in ITEM_FIELDS) for item in items]
+    try:
+        with pg_pool.connection() as conn:
+            with conn.cursor() as cur:
+                returned = psycopg2.extras.execute_values(
+                    cur,
+                    'INSERT INTO "public"."items" ("name", "sku", "rate", "purchase rate", "stock on hand") VALUES %s RETURNING item_id;',
+                    rows,
+                    page_size=page_size,
+                    fetch=True,
+                )
+        for item, (item_id,) in zip(items, returned):
+            item["item_id"] = item_id
+            apply_write_to_snapshot('INSERT', item_id, item)
+        return items
+    except Exception as e:
+        log.error("Error bulk inserting items: %s", e)
+        return None
+
+def bulk_update_items(items, page_size=1000):
+    """Update many items in one transaction with UPDATE ... FROM (VALUES ...). Returns the updated items"""
+    rows = [(item["item_id"],) + tuple(item[field] for field in ITEM_FIELDS) for item in items]
+    try:
+        with pg_pool.connection() as conn:
+            with conn.cursor() as cur:
+                returned = psycopg2.extras.execute_values(
+                    cur,
+                    'UPDATE "public"."items" AS i SET "name" = v.name, "sku" = v.sku, "rate" = v.rate, '
+                    '"purchase rate" = v.purchase_rate, "stock on hand" = v.stock '
+                    'FROM (VALUES %s) AS v (item_id, name, sku, rate, purchase_rate, stock) '
+                    'WHERE i.item_id = v.item_id RETURNING i.item_id;',
+                    rows,
+                    # VALUES columns are otherwise typed from the literals (a JSON string id would be text)
+                    template='(%s::bigint, %s, %s, %s, %s, %s::integer)',
+                    page_size=page_size,
+                    fetch=True,
+                )
+        updated_ids = {str(row[0]) for row in returned}
+        for item_id in updated_ids:
+            invalidate_cached_item(item_id)
+        updated = [item for item in items if str(item["item_id"]) in updated_ids]
+        for item in updated:
+            apply_write_to_snapshot('UPDATE', item["item_id"], item)
+        return updated
+    except Exception as e:
+        log.error("Error bulk updating items: %s", e)
+        return None
+
+def bulk_delete_items(item_ids):
+    """Delete many items in one statement. Returns the IDs that were deleted"""
+    try:
+        with pg_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute('DELETE FROM "public"."items" WHERE item_id = ANY(%s::bigint[]) RETURNING item_id;', (list(item_ids),))
+                rows = cur.fetchall()
+        for row in rows:
+            invalidate_cached_item(row[0])
+            apply_write_to_snapshot('DELETE', row[0])
+        return [row[0] for row in rows]
+    except Exception as e:
+        log.error("Error bulk deleting items: %s", e)
+        return None
 
 # Supabase synchronization
 def sync_to_supabase(data):
     """Sync data with Supabase"""
     try:
         if "item_id" not in data:
-            print("Invalid data, skipping...")
+            log.warning("Invalid data, skipping...")
             return
 
         # Create a copy of the data dictionary and remove TG_OP
@@ -224,118 +654,548 @@ def sync_to_supabase(data):
         if 'TG_OP' in data_to_send:
             del data_to_send['TG_OP']
 
-        response = supabase.table("items").select("*").eq("item_id", data_to_send["item_id"]).execute()
-
-        if response.data:
-            supabase.table("items").update(data_to_send).eq("item_id", data_to_send["item_id"]).execute()
-            print(f"Updated item_id: {data_to_send['item_id']} in Supabase")
-        else:
-            supabase.table("items").insert(data_to_send).execute()
-            print(f"Inserted item_id: {data_to_send['item_id']} into Supabase")
+        with metrics.span("supabase", "upsert"):
+            supabase.table(ITEMS_TABLE.supabase_table).upsert(data_to_send, on_conflict="item_id").execute()
+        log.debug("Upserted item_id: %s in Supabase", data_to_send['item_id'])
 
     except Exception as e:
-        print(f"Error syncing to Supabase: {e}")
+        log.error("Error syncing to Supabase: %s", e)
 
 def sync_delete_to_supabase(data):
     """Sync delete operations to Supabase"""
     try:
         if "item_id" not in data:
-            print("Invalid data, skipping delete...")
+            log.warning("Invalid data, skipping delete...")
             return
 
-        supabase.table("items").delete().eq("item_id", data["item_id"]).execute()
-        print(f"Deleted item_id: {data['item_id']} from Supabase")
+        with metrics.span("supabase", "delete"):
+            supabase.table(ITEMS_TABLE.supabase_table).delete().eq("item_id", data["item_id"]).execute()
+        log.debug("Deleted item_id: %s from Supabase", data['item_id'])
 
     except Exception as e:
-        print(f"Error syncing delete to Supabase: {e}")
+        log.error("Error syncing delete to Supabase: %s", e)
+
+# Batched sync stage used by the listener and the initial load
+supabase_syncer = SupabaseBatchSyncer(
+    supabase,
+    table=ITEMS_TABLE.supabase_table,
+    key="item_id",
+    batch_size=int(os.getenv("SUPABASE_SYNC_BATCH_SIZE", "500")),
+    flush_interval=float(os.getenv("SUPABASE_SYNC_FLUSH_INTERVAL", "1")),
+)
+
+# Parallel batches for bulk loads and reconciliation repairs (reconcile.py)
+SUPABASE_SYNC_WORKERS = int(os.getenv("SUPABASE_SYNC_WORKERS", "4"))
+
+def get_sync_stats():
+    """Return Supabase batch sync statistics"""
+    return supabase_syncer.stats()
 
 # Redis caching functionality
-def update_redis_cache_and_stats():
-    """Fetches all items from PG, processes them, and updates Redis cache."""
+def process_item_for_cache(item_pg):
+    """Normalize a PostgreSQL item into the shape stored in the Redis cache."""
+    return {
+        "item_id": int(item_pg.get("item_id")) if item_pg.get("item_id") is not None else None,
+        "name": str(item_pg.get("name", 'Unknown Item')),
+        "sku": str(item_pg.get("sku", 'N/A')).replace("(", "").replace(")", ""),
+        "rate": parse_currency_value_py(item_pg.get("rate")),
+        "purchase rate": parse_currency_value_py(item_pg.get("purchase rate")),
+        "stock on hand": int(item_pg.get("stock on hand", 0))
+    }
+
+def snapshot_rows_to_cache_json(rows):
+    """Encode snapshot rows (already parsed) in the Redis cache shape, once each: ``{item_id: JSON}``"""
+    return {
+        str(row[0]): serialization.encode_item(row[0], row[1], row[2].replace("(", "").replace(")", ""), row[6], row[7], row[5])
+        for row in rows
+    }
+
+def reconcile_inventory_stats():
+    """Recompute the stats over the whole snapshot if the periodic reconciliation is due"""
+    if inventory_stats.reconcile_due():
+        inventory_stats.reconcile(*inventory_snapshot.totals())
+
+def update_redis_cache_and_stats(reload_snapshot=True):
+    """Reloads the snapshot from PG and fully rebuilds the Redis cache from it."""
+    if item_cache:
+        # Before the snapshot is read: changes staged from now on are newer than it and still get flushed
+        item_cache.discard_pending()
+    if reload_snapshot:
+        load_inventory_snapshot()  # Fetch fresh from PostgreSQL
+
     if not redis_client:
-        print("Redis client not available. Skipping cache update.")
+        log.info("Redis client not available. Skipping cache update.")
+        reconcile_inventory_stats()
         return
 
-    print("Updating Redis cache...")
-    all_pg_items = get_all_items_from_pg()  # Fetch fresh from PostgreSQL
-
-    # Process items for consistency
-    processed_items_for_cache = []
-    for item_pg in all_pg_items:
-        processed_items_for_cache.append({
-            "item_id": int(item_pg.get("item_id")) if item_pg.get("item_id") is not None else None,
-            "name": str(item_pg.get("name", 'Unknown Item')),
-            "sku": str(item_pg.get("sku", 'N/A')).replace("(", "").replace(")", ""),
-            "rate": parse_currency_value_py(item_pg.get("rate")),
-            "purchase rate": parse_currency_value_py(item_pg.get("purchase rate")),
-            "stock on hand": int(item_pg.get("stock on hand", 0))
-        })
-    
-    # Cache the full list of processed items
-    ALL_ITEMS_CACHE_KEY = "cache:all_inventory_items"
+    log.debug("Updating Redis cache...")
+    # Each item is encoded once and reused by the hash and the legacy blob
+    encoded_items = snapshot_rows_to_cache_json(inventory_snapshot.rows())
+
+    # Replace the per-item hash
     try:
-        redis_client.set(ALL_ITEMS_CACHE_KEY, json.dumps(processed_items_for_cache))  # Add TTL of 1 hour
-        print(f"Cached {len(processed_items_for_cache)} items to '{ALL_ITEMS_CACHE_KEY}'.")
+        version = item_cache.replace_all(encoded_items)
+        log.debug("Cached %d items to '%s' (version %s).", len(encoded_items), item_cache.hash_key, version)
     except Exception as e:
-        print(f"Error caching items to Redis: {e}")
-
-    # Calculate and cache stats
-    total_products = len(processed_items_for_cache)
-    total_value = 0
-    low_stock_count = 0
-
-    for item in processed_items_for_cache:
-        rate = item.get("rate", 0.0)
-        stock = item.get("stock on hand", 0)
-        total_value += rate * stock
-        if get_stock_level_py(str(stock)) == 'low':
-            low_stock_count += 1
-    
+        log.error("Error caching items to Redis hash: %s", e)
+
+    # Legacy single-blob layout for older readers
+    if WRITE_LEGACY_CACHE_BLOB:
+        write_legacy_cache_blob(encoded_items)
+
+    # Stats are maintained incrementally by the listener; a full rebuild only
+    # recomputes them when the periodic reconciliation is due.
+    reconcile_inventory_stats()
+    publish_inventory_stats()
+
+def legacy_cache_blob(encoded_items=None):
+    """The versioned cache:all_inventory_items payload of the snapshot (or of already encoded items)"""
+    if encoded_items is None:
+        encoded_items = snapshot_rows_to_cache_json(inventory_snapshot.rows())
+    return encode_payload(serialization.join_array(encoded_items.values()), count=len(encoded_items))
+
+def write_legacy_cache_blob(encoded_items=None):
+    """Rewrite the legacy single-blob cache so it follows the per-item hash"""
+    try:
+        payload = legacy_cache_blob(encoded_items)
+        with metrics.span("redis", "set"):
+            redis_client.set(ALL_ITEMS_BLOB_KEY, payload)
+        log.debug("Cached %d bytes to '%s'.", len(payload), ALL_ITEMS_BLOB_KEY)
+    except Exception as e:
+        log.error("Error caching items to Redis: %s", e)
+
+def flush_redis_cache_changes():
+    """Write only the changed items to Redis, falling back to a full rebuild when reconciliation is due."""
+    if not redis_client:
+        return
+
+    if inventory_stats.reconcile_due():
+        update_redis_cache_and_stats()
+        return
+
+    try:
+        version = item_cache.flush()
+    except Exception as e:
+        log.error("Error writing item changes to Redis: %s", e)
+        return
+    # The blob has no partial updates: rewrite it (from the snapshot) whenever the hash changed
+    if version is not None and WRITE_LEGACY_CACHE_BLOB and inventory_snapshot.loaded:
+        write_legacy_cache_blob()
+
+def get_cached_items():
+    """Get all items and the cache version from the Redis item cache"""
+    if not item_cache:
+        return None, None
+    try:
+        return item_cache.get_all()
+    except Exception as e:
+        log.error("Error reading items from Redis cache: %s", e)
+        return None, None
+
+def get_cached_items_version():
+    """Current Redis item cache version, or None"""
+    if not item_cache:
+        return None
+    try:
+        return item_cache.get_version()
+    except Exception as e:
+        log.error("Error reading the Redis cache version: %s", e)
+        return None
+
+# Snapshot versions are per process, so ETags built from them carry this process's id too
+SNAPSHOT_INSTANCE = uuid.uuid4().hex[:8]
+
+def get_items_version():
+    """Content version of the items for ETags, read before the items themselves.
+
+    The snapshot version when this process has the snapshot loaded. Without
+    it (API workers, standbys) the items are read from Postgres, which has no
+    version that follows every commit, so None: those responses carry no ETag.
+    """
+    if inventory_snapshot.loaded:
+        return f"s{SNAPSHOT_INSTANCE}.{inventory_snapshot.version}"
+    return None
+
+def get_cached_item(item_id):
+    """Get a single item from the Redis item cache"""
+    if not item_cache:
+        return None
+    try:
+        return item_cache.get_item(item_id)
+    except Exception as e:
+        log.error("Error reading item from Redis cache: %s", e)
+        return None
+
+def stage_cache_change(tg_op, item_id, item=None):
+    """Stage a single changed row for the next partial Redis cache flush."""
+    if not item_cache:
+        return
+    if tg_op == 'DELETE':
+        item_cache.stage_delete(item_id)
+    elif item:
+        item_cache.stage_upsert(process_item_for_cache(item))
+
+def publish_inventory_stats():
+    """Publish the incrementally maintained inventory stats to Redis."""
+    if not redis_client:
+        return
+
     current_timestamp_iso = datetime.utcnow().isoformat() + "Z"  # ISO 8601 format, UTC
 
-    stats_data = {
-        "totalProducts": total_products,
-        "totalValue": total_value,
-        "lowStockCount": low_stock_count,
-        "cacheLastUpdated": current_timestamp_iso 
-    }
+    stats_data = inventory_stats.snapshot()
+    stats_data["cacheLastUpdated"] = current_timestamp_iso
     STATS_CACHE_KEY = "cache:inventory_stats"
     try:
-        redis_client.set(STATS_CACHE_KEY, json.dumps(stats_data), ex=3600)  # Add TTL of 1 hour
-        print(f"Redis stats cache updated at {current_timestamp_iso}. Stats: {stats_data}")
+        with metrics.span("redis", "set"):
+            redis_client.set(STATS_CACHE_KEY, serialization.dumps(stats_data), ex=3600)  # Add TTL of 1 hour
+        log.debug("Redis stats cache updated at %s. Stats: %s", current_timestamp_iso, stats_data)
     except Exception as e:
-        print(f"Error caching stats to Redis: {e}")
+        log.error("Error caching stats to Redis: %s", e)
+
+# Incremental inventory stats (O(1) per change, periodically reconciled against a full read)
+inventory_stats = InventoryStatsAggregator(
+    reconcile_interval=float(os.getenv("STATS_RECONCILE_INTERVAL", "300")),
+)
+
+# Stats are tiny, so they are published on a much shorter window than the full cache
+stats_publish_scheduler = RebuildScheduler(
+    publish_inventory_stats,
+    window=float(os.getenv("STATS_PUBLISH_WINDOW", "0.1")),
+    min_interval=float(os.getenv("STATS_PUBLISH_MIN_INTERVAL", "0.5")),
+    max_delay=float(os.getenv("STATS_PUBLISH_MAX_DELAY", "2")),
+    name="redis-stats-publish",
+)
+
+def get_inventory_stats_info():
+    """Return incremental stats aggregator counters"""
+    return inventory_stats.stats()
+
+# Coalesces bursts of change notifications into a bounded number of (partial) cache flushes
+redis_rebuild_scheduler = RebuildScheduler(
+    flush_redis_cache_changes,
+    window=float(os.getenv("REDIS_REBUILD_WINDOW", "0.5")),
+    min_interval=float(os.getenv("REDIS_REBUILD_MIN_INTERVAL", "2")),
+    max_delay=float(os.getenv("REDIS_REBUILD_MAX_DELAY", "10")),
+    name="redis-cache-rebuild",
+)
+
+def get_rebuild_stats():
+    """Return Redis cache rebuild scheduler statistics"""
+    return redis_rebuild_scheduler.stats()
 
 # Initial Data Load
 def initial_data_load_to_redis_and_supabase():
     """Perform initial data load to Supabase and Redis if needed."""
-    print("Checking if initial data load to Supabase & Redis is needed...")
-    
+    log.info("Checking if initial data load to Supabase & Redis is needed...")
+    load_inventory_snapshot()
+
     # Check Supabase
-    response_supabase = supabase.table("items").select("item_id", count='exact').execute()
+    with metrics.span("supabase", "count"):
+        response_supabase = supabase.table(ITEMS_TABLE.supabase_table).select("item_id", count='exact').execute()
     if response_supabase.count == 0:
-        print("Supabase is empty. Performing initial data load to Supabase...")
-        items_pg = get_all_items_from_pg()
-        for item in items_pg:
-            sync_to_supabase(item)
-        print("Initial data load to Supabase complete.")
+        log.info("Supabase is empty. Performing initial data load to Supabase...")
+        items_pg = [row_to_parsed_item((row[0], row[1], row[2], row[6], row[7], row[5])) for row in inventory_snapshot.rows()]
+        sent = supabase_syncer.sync_all(items_pg, workers=SUPABASE_SYNC_WORKERS)
+        log.info("Initial data load to Supabase complete (%s/%s items).", sent, len(items_pg))
     else:
-        print("Data already exists in Supabase. Skipping initial Supabase load.")
+        log.info("Data already exists in Supabase. Skipping initial Supabase load (run reconcile.py to repair drift).")
 
     # Always update Redis cache on startup to ensure it's fresh
-    print("Performing initial/startup update of Redis cache...")
-    update_redis_cache_and_stats()
+    log.info("Performing initial/startup update of Redis cache...")
+    update_redis_cache_and_stats(reload_snapshot=False)
 
 # For backward compatibility
 def initial_data_load():
     """Legacy function that calls the updated version"""
     initial_data_load_to_redis_and_supabase()
 
+# Change pipeline: the listener only decodes and enqueues, sinks run on their own workers
+change_pipeline = None
+
+# Full-row notification payloads (migrations/003_items_notify_full_row.sql, 004_items_change_log.sql)
+def payload_row_to_item(row):
+    """Convert a row image from a notification payload into the API item dict"""
+    if not row:
+        return None
+    return row_to_item((row.get("item_id"), row.get("name"), row.get("sku"), row.get("rate"),
+                        row.get("purchase rate"), row.get("stock on hand")))
+
+def resolve_change_event(event):
+    """Complete INSERT/UPDATE events with the full row so every sink sees the same data.
+
+    The row comes from the notification payload or change-log entry; older
+    item_id-only payloads (and oversized ones when the log is not in use)
+    fall back to a query. The in-memory snapshot and stats are updated here,
+    on the single resolve worker, so they apply changes in order.
+    """
+    payload = event.payload or {}
+    event.old_item = payload_row_to_item(payload.get('old'))
+    if event.tg_op in ('INSERT', 'UPDATE') and event.item_id:
+        event.item = payload_row_to_item(payload.get('new'))
+        if event.item is None:
+            event.item = get_item_by_id(event.item_id)
+    apply_change_to_snapshot(event.tg_op, event.item_id, event.item)
+    stats_publish_scheduler.notify()
+    return event
+
+def resolve_overflow(event):
+    """The listener dropped a change before it was resolved: reload everything on the next flush"""
+    inventory_stats.invalidate()
+    redis_rebuild_scheduler.notify()
+
+def supabase_sink(event):
+    """Hand a change to the batched Supabase syncer"""
+    if event.tg_op == RESYNC:
+        resync_supabase_item(event)
+    elif event.tg_op == 'DELETE':
+        if event.item_id is not None:
+            supabase_syncer.enqueue_delete(event.item_id, received_at=event.received_at)
+    elif event.item:
+        supabase_syncer.enqueue_upsert(event.item, received_at=event.received_at)
+
+def resync_supabase_item(event):
+    """Send an item's current state to Supabase after the sink dropped one of its changes"""
+    try:
+        if inventory_snapshot.loaded:
+            # The snapshot is updated before fan-out, so it is never behind the sink
+            row = inventory_snapshot.get(event.item_id)
+        else:
+            with pg_pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(ITEM_SELECT_SQL + ' WHERE item_id = %s;', (event.item_id,))
+                    row = cur.fetchone()
+    except Exception:
+        supabase_resync.mark(event)  # try again later rather than guessing the row is gone
+        raise
+    if row:
+        supabase_syncer.enqueue_upsert(row_to_item(row), received_at=event.received_at)
+    else:
+        supabase_syncer.enqueue_delete(event.item_id, received_at=event.received_at)
+
+# Supabase changes dropped by a full sink queue are resent once there is room again
+supabase_resync = SinkResync("supabase", lambda item_id: change_pipeline, name="supabase-resync")
+
+def redis_sink(event):
+    """Stage a change for the per-item Redis cache"""
+    if event.tg_op == 'DELETE':
+        stage_cache_change(event.tg_op, event.item_id)
+    elif event.tg_op and event.item:
+        stage_cache_change(event.tg_op, event.item_id, event.item)
+    # Schedule a (coalesced) Redis cache flush regardless of operation type
+    redis_rebuild_scheduler.notify()
+
+def redis_sink_overflow(event):
+    """The Redis sink fell behind and dropped a change: force a full rebuild"""
+    inventory_stats.invalidate()
+    redis_rebuild_scheduler.notify()
+
+def build_change_pipeline(socketio_instance=None):
+    """Create the staged change pipeline with Supabase, Redis and websocket sinks"""
+    maxsize = int(os.getenv("PIPELINE_QUEUE_SIZE", "10000"))
+    put_timeout = float(os.getenv("PIPELINE_PUT_TIMEOUT", "0.1"))
+    pipeline = ChangePipeline(resolve_change_event, maxsize=maxsize, put_timeout=put_timeout,
+                              on_overflow=resolve_overflow, on_complete=change_log_event_done, name=ITEMS_TABLE.name)
+    pipeline.add_sink("supabase", supabase_sink, on_overflow=supabase_resync.mark)
+    pipeline.add_sink("redis", redis_sink, on_overflow=redis_sink_overflow)
+    if socketio_instance:
+        broadcaster = get_item_broadcaster(socketio_instance)
+        def websocket_sink(event):
+            if event.tg_op == 'DELETE' or (event.tg_op and event.item):
+                broadcaster.publish(event.tg_op, event.item_id, item=event.item, old_item=event.old_item, seq=event.seq)
+        pipeline.add_sink("websocket", websocket_sink)
+    return pipeline.start()
+
+# Batched, de-duplicated item_updates frames for websocket clients (see broadcast.py)
+item_broadcaster = None
+
+def get_item_broadcaster(socketio_instance):
+    """The shared broadcaster for ``socketio_instance`` (created on first use)"""
+    global item_broadcaster
+    if item_broadcaster is None:
+        item_broadcaster = ItemBroadcaster(
+            socketio_instance,
+            normalize=payload_row_to_item,
+            stock_level=get_stock_level_py,
+            window=float(os.getenv("BROADCAST_WINDOW", "0.05")),
+            max_batch=int(os.getenv("BROADCAST_MAX_BATCH", "500")),
+        )
+    return item_broadcaster
+
+def get_broadcast_stats():
+    """Return websocket broadcast batching and de-duplication counters"""
+    if not item_broadcaster:
+        return {}
+    return item_broadcaster.stats()
+
+def get_pipeline_stats():
+    """Return per-stage queue depth, throughput and lag statistics"""
+    if not change_pipeline:
+        return {}
+    return change_pipeline.stats()
+
+# Durable change log (migrations/004_items_change_log.sql): the listener consumes it by seq and checkpoints its position
+CHANGE_LOG_BATCH_SIZE = int(os.getenv("CHANGE_LOG_BATCH_SIZE", "5000"))
+# Never more in flight than a pipeline queue holds, so logged changes are not dropped
+CHANGE_LOG_MAX_IN_FLIGHT = min(int(os.getenv("CHANGE_LOG_MAX_IN_FLIGHT", "5000")), int(os.getenv("PIPELINE_QUEUE_SIZE", "10000")))
+CHANGE_LOG_POLL_INTERVAL = float(os.getenv("CHANGE_LOG_POLL_INTERVAL", "5"))
+CHANGE_LOG_CHECKPOINT_INTERVAL = float(os.getenv("CHANGE_LOG_CHECKPOINT_INTERVAL", "5"))
+CHANGE_LOG_RETENTION = float(os.getenv("CHANGE_LOG_RETENTION", "86400"))
+CHANGE_LOG_PRUNE_INTERVAL = 300.0
+
+change_log = ChangeLogReader(pg_pool, consumer=os.getenv("CHANGE_LOG_CONSUMER", "bridge"))
+change_log_progress = ChangeLogProgress()
+# Progress tracker of whichever change source is running (the change log or a replication slot)
+change_progress = change_log_progress
+_change_log_available = None
+_change_log_state = {
+    "enabled": False,
+    "checkpoint": None,
+    "checkpoints_saved": 0,
+    "checkpoint_skipped": 0,
+    "last_checkpoint_at": None,
+    "last_prune_at": None,
+    "rows_pruned": 0,
+    "catch_up_reads": 0,
+    "rows_read": 0,
+    "notify_fast_path": 0,
+    "gap_waits": 0,
+    "listener_restarts": 0,
+}
+
+def change_log_available():
+    """Whether the bridge_change_log table exists (checked once)"""
+    global _change_log_available
+    if _change_log_available is None:
+        try:
+            with pg_pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT to_regclass('public.bridge_change_log') IS NOT NULL;")
+                    _change_log_available = cur.fetchone()[0]
+        except Exception as e:
+            log.error("Error checking for the change log table: %s", e)
+            return False
+        if not _change_log_available:
+            log.info("Change log table not found; changes made while the bridge is down will be missed (run migrate.py).")
+    return _change_log_available
+
+def start_change_log():
+    """Resume from the saved checkpoint, or start at the head of the log on first run"""
+    checkpoint = change_log.checkpoint()
+    if checkpoint is None:
+        checkpoint = change_log.head()
+        change_log.save_checkpoint(checkpoint)
+        log.info("Change log: no checkpoint yet, starting at seq %s.", checkpoint)
+    else:
+        log.info("Change log: resuming after checkpoint seq %s.", checkpoint)
+    change_log_progress.reset(checkpoint)
+    _change_log_state.update(enabled=True, checkpoint=checkpoint, last_checkpoint_at=time.monotonic())
+    start_change_log_checkpointer(checkpoint_change_log)
+
+def change_log_event(row, received_at=None):
+    """Build a pipeline event from a change-log row"""
+    seq, tg_op, item_id, new_row, old_row, created_at = row
+    payload = {"TG_OP": tg_op, "item_id": item_id, "seq": seq, "new": new_row, "old": old_row,
+               "created_at": created_at.timestamp() if created_at else None}
+    return ChangeEvent(tg_op, item_id, payload=payload, received_at=received_at, seq=seq)
+
+def change_log_event_done(event):
+    """Pipeline completion hook: every sink is done with the event"""
+    if event.seq is not None:
+        change_progress.finished(event.seq, (event.payload or {}).get("created_at"))
+
+def submit_change(event):
+    """Hand an event to the pipeline, tracking its seq when it came from the change log"""
+    if event.seq is not None:
+        change_log_progress.started(event.seq)
+    change_pipeline.submit(event)
+
+def drain_change_log():
+    """Submit the next batch of logged changes. Returns True if more can be read right away"""
+    room = CHANGE_LOG_MAX_IN_FLIGHT - change_log_progress.in_flight
+    if room <= 0:
+        return True
+    limit = min(CHANGE_LOG_BATCH_SIZE, room)
+    rows, waiting = change_log.read(change_log_progress.last_started, limit)
+    received_at = time.monotonic()
+    for row in rows:
+        submit_change(change_log_event(row, received_at))
+    _change_log_state["catch_up_reads"] += 1
+    _change_log_state["rows_read"] += len(rows)
+    if waiting:
+        _change_log_state["gap_waits"] += 1
+        return False
+    if rows:
+        log.debug("Change log: submitted %d logged change(s) up to seq %s.", len(rows), rows[-1][0])
+    return len(rows) == limit
+
+def checkpoint_change_log():
+    """Save the position once everything up to it has been applied and sent to Supabase"""
+    _change_log_state["last_checkpoint_at"] = time.monotonic()
+    position = change_log_progress.position
+    if _change_log_state["checkpoint"] is not None and position <= _change_log_state["checkpoint"]:
+        return
+    # The Supabase sink only buffers; flush so nothing up to position is still in memory
+    if not supabase_syncer.drain():
+        _change_log_state["checkpoint_skipped"] += 1
+        return
+    change_log.save_checkpoint(position)
+    _change_log_state["checkpoint"] = position
+    _change_log_state["checkpoints_saved"] += 1
+    prune_change_log()
+
+def release_change_log():
+    """Checkpoint at the head for change sources that do not read the log (asyncio engine, replication slot)"""
+    _change_log_state["last_checkpoint_at"] = time.monotonic()
+    head = change_log.head()
+    if head != _change_log_state["checkpoint"]:
+        change_log.save_checkpoint(head)
+        _change_log_state["checkpoint"] = head
+        _change_log_state["checkpoints_saved"] += 1
+    prune_change_log()
+
+def prune_change_log():
+    """Delete checkpointed rows past the retention, at most every CHANGE_LOG_PRUNE_INTERVAL"""
+    last_prune_at = _change_log_state["last_prune_at"]
+    if last_prune_at is None or time.monotonic() - last_prune_at >= CHANGE_LOG_PRUNE_INTERVAL:
+        _change_log_state["last_prune_at"] = time.monotonic()
+        _change_log_state["rows_pruned"] += change_log.prune(CHANGE_LOG_RETENTION)
+
+_change_log_checkpointer = None
+
+def start_change_log_checkpointer(checkpoint_fn):
+    """Run ``checkpoint_fn`` every CHANGE_LOG_CHECKPOINT_INTERVAL on its own thread (it may block on Supabase)"""
+    global _change_log_checkpointer
+    if _change_log_checkpointer is not None:
+        return
+
+    def run():
+        while True:
+            time.sleep(CHANGE_LOG_CHECKPOINT_INTERVAL)
+            try:
+                checkpoint_fn()
+            except Exception as e:
+                log.error("Error checkpointing the change log: %s", e)
+
+    _change_log_checkpointer = threading.Thread(target=run, name="change-log-checkpoint", daemon=True)
+    _change_log_checkpointer.start()
+
+def get_change_log_stats():
+    """Return change-log position, checkpoint, backlog, throughput and lag"""
+    stats = {k: v for k, v in _change_log_state.items() if not k.endswith("_at")}
+    stats.update(change_log_progress.stats())
+    if stats["enabled"]:
+        try:
+            stats["head"] = change_log.head()
+            stats["backlog"] = max(0, stats["head"] - stats["position"])
+        except Exception as e:
+            log.error("Error reading change log head: %s", e)
+    return stats
+
 # Database Change Listener
-def start_db_listener(socketio):
-    """Start a thread to listen for PostgreSQL notifications"""
+def start_db_listener(socketio, source="listen"):
+    """Start a thread that feeds changes from the chosen change source into the pipeline"""
     listener_thread = threading.Thread(
-        target=db_listener_thread, 
+        target=CHANGE_SOURCES[source],
         args=(socketio,), 
         daemon=True
     )
@@ -343,52 +1203,232 @@ def start_db_listener(socketio):
     return listener_thread
 
 def db_listener_thread(socketio_instance=None):
-    """Thread to listen for PostgreSQL notifications"""
+    """Thread to listen for PostgreSQL notifications, reconnecting after errors"""
+    global change_pipeline
+    if change_pipeline is None:
+        change_pipeline = build_change_pipeline(socketio_instance)
+
+    backoff = 1.0
+    while True:
+        started_at = time.monotonic()
+        try:
+            use_log = change_log_available()
+            if use_log and not _change_log_state["enabled"]:
+                start_change_log()
+            listen_for_changes(use_log)
+        except Exception as e:
+            log.error("Error in Python listener thread: %s", e)
+        _change_log_state["listener_restarts"] += 1
+        if time.monotonic() - started_at > 60:
+            backoff = 1.0
+        # Changes committed meanwhile are read back from the change log after reconnecting
+        log.info("Python listener: Reconnecting in %.0fs...", backoff)
+        time.sleep(backoff)
+        backoff = min(backoff * 2, 30.0)
+
+def listen_for_changes(use_log=False):
+    """LISTEN on the items channel and feed changes into the pipeline until the connection fails"""
     listen_conn = get_postgres_connection()
     listen_conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
     listen_cur = listen_conn.cursor()
-    listen_cur.execute("LISTEN items_channel;")
-    print("Python listener: Listening for changes on PostgreSQL items...")
-    
+    listen_cur.execute(f'LISTEN "{ITEMS_TABLE.channel}";')
+    log.info("Python listener: Listening for changes on PostgreSQL items...")
+
+    # Anything logged while nobody was listening is read back first
+    catch_up = use_log
     try:
         while True:
-            if select.select([listen_conn], [], [], 5) == ([], [], []):
-                # Timeout occurred, just continue
-                continue
-                
-            listen_conn.poll()
-            while listen_conn.notifies:
-                notify = listen_conn.notifies.pop(0)
-                print(f"🔔 Python listener: PG Change detected: {notify.payload}")
-                payload_data = json.loads(notify.payload)
-                tg_op = payload_data.get('TG_OP')
-                item_id_from_payload = payload_data.get('item_id')
-
-                if notify.channel == 'items_channel':
-                    if 'TG_OP' in payload_data:
-                        # Process for Supabase sync
-                        if tg_op == 'DELETE':
-                            sync_delete_to_supabase(payload_data)
-                            # Notify WebSocket clients if socketio_instance is available
-                            if socketio_instance:
-                                socketio_instance.emit('item_update', {'operation': 'DELETE', 'item_id': item_id_from_payload})
-                        else:  # INSERT or UPDATE
-                            if item_id_from_payload:
-                                # Get the full item and sync to Supabase
-                                full_item_data = get_item_by_id(item_id_from_payload)
-                                if full_item_data:
-                                    sync_to_supabase(full_item_data)
-                                    # Notify WebSocket clients if socketio_instance is available
-                                    if socketio_instance:
-                                        socketio_instance.emit('item_update', {'operation': tg_op, 'item': full_item_data})
-                    
-                    # After Supabase sync, update Redis cache regardless of operation type
-                    update_redis_cache_and_stats()
-    except Exception as e:
-        print(f"Error in Python listener thread: {e}")
+            if catch_up:
+                catch_up = drain_change_log()
+
+            timeout = 0.05 if catch_up else (CHANGE_LOG_POLL_INTERVAL if use_log else 5)
+            if select.select([listen_conn], [], [], timeout) == ([], [], []):
+                # Timeout: re-check the log for missed notifications and closed gaps
+                catch_up = use_log
+            else:
+                listen_conn.poll()
+                while listen_conn.notifies:
+                    notify = listen_conn.notifies.pop(0)
+                    received_at = time.monotonic()
+                    log.debug("Python listener: PG change detected: %s", notify.payload)
+                    if notify.channel != ITEMS_TABLE.channel:
+                        continue
+                    payload_data = serialization.loads(notify.payload)
+                    # Invalidate right away so API reads stop serving the old row before the pipeline catches up
+                    invalidate_cached_item(payload_data.get('item_id'))
+                    seq = payload_data.get('seq')
+                    event = ChangeEvent(
+                        payload_data.get('TG_OP'),
+                        payload_data.get('item_id'),
+                        payload=payload_data,
+                        received_at=received_at,
+                        seq=seq,
+                    )
+                    if not use_log or seq is None:
+                        change_pipeline.submit(event)
+                    elif (not catch_up and 'new' in payload_data and seq == change_log_progress.last_started + 1
+                          and change_log_progress.in_flight < CHANGE_LOG_MAX_IN_FLIGHT):
+                        # Next change in order and the row is in the payload: no need to read the log
+                        _change_log_state["notify_fast_path"] += 1
+                        submit_change(event)
+                    elif seq > change_log_progress.last_started:
+                        catch_up = True
+
     finally:
-        if listen_cur:
-            listen_cur.close()
-        if listen_conn:
-            listen_conn.close()
-        print("Python listener: Stopped.")
\ No newline at end of file
+        listen_cur.close()
+        listen_conn.close()
+        log.info("Python listener: Stopped.")
+
+# Logical replication change source: no trigger or NOTIFY needed (requires wal_level = logical)
+replication_source = None
+
+def replication_submit(event):
+    """Feed a decoded replication change into the pipeline"""
+    invalidate_cached_item(event.item_id)
+    change_pipeline.submit(event)
+
+def replication_listener_thread(socketio_instance=None):
+    """Thread that streams changes from a logical replication slot, reconnecting after errors"""
+    global change_pipeline, change_progress, replication_source
+    # The items_notify_change triggers are optional with a slot (the change log is only pruned, never consumed)
+    disable_read_cache("the replication change source sends no items_channel notifications")
+    if change_pipeline is None:
+        change_pipeline = build_change_pipeline(socketio_instance)
+
+    replication_source = LogicalReplicationSource(
+        PG_CONNECTION_PARAMS,
+        replication_submit,
+        slot_name=os.getenv("REPLICATION_SLOT", "bridge_items"),
+        plugin=os.getenv("REPLICATION_PLUGIN", "pgoutput"),
+        publication=os.getenv("REPLICATION_PUBLICATION", "bridge_items"),
+        feedback_interval=float(os.getenv("REPLICATION_FEEDBACK_INTERVAL", "5")),
+        max_in_flight=CHANGE_LOG_MAX_IN_FLIGHT,
+        # The Supabase sink only buffers; only acknowledge WAL once it has been sent (checked without blocking)
+        sink=supabase_syncer,
+    )
+    change_progress = replication_source.progress
+    # The slot is the durable position; the trigger still writes the log, so keep it pruned
+    if change_log_available():
+        start_change_log_checkpointer(release_change_log)
+
+    backoff = 1.0
+    while True:
+        started_at = time.monotonic()
+        try:
+            replication_source.run()
+        except Exception as e:
+            log.error("Error in replication listener: %s", e)
+        if time.monotonic() - started_at > 60:
+            backoff = 1.0
+        log.info("Replication: Reconnecting in %.0fs...", backoff)
+        time.sleep(backoff)
+        backoff = min(backoff * 2, 30.0)
+
+def get_replication_stats():
+    """Return replication slot consumer statistics"""
+    if not replication_source:
+        return {}
+    return replication_source.stats()
+
+CHANGE_SOURCES = {
+    "listen": db_listener_thread,
+    "replication": replication_listener_thread,
+}
+
+# Single bridge leader across workers (leader.py): only the process holding the lock runs listeners and sinks.
+# TCP keepalives on the lock connection let a partitioned leader notice the lost session quickly.
+BRIDGE_LEADER_LOCK_KEY = int(os.getenv("BRIDGE_LEADER_LOCK_KEY", "7236878"))
+
+def get_leader_connection():
+    """Dedicated connection holding the leader lock"""
+    return psycopg2.connect(keepalives=1, keepalives_idle=5, keepalives_interval=2, keepalives_count=3,
+                            **PG_CONNECTION_PARAMS)
+
+bridge_leader = LeaderLock(
+    get_leader_connection,
+    BRIDGE_LEADER_LOCK_KEY,
+    retry_interval=float(os.getenv("BRIDGE_LEADER_RETRY_INTERVAL", "1")),
+    heartbeat_interval=float(os.getenv("BRIDGE_LEADER_HEARTBEAT_INTERVAL", "2")),
+)
+
+def get_leader_stats():
+    """Return bridge leader lock state and counters"""
+    return bridge_leader.stats()
+
+# Config-driven bridges for the other tables in bridge_tables.json
+table_bridges = {}
+table_listener = None
+
+def start_table_bridges():
+    """Start a TableBridge per configured (non-inventory) table, sharing one LISTEN connection"""
+    global table_listener
+    configs = [config for config in table_configs if config.handler is None]
+    if not configs or table_listener is not None:
+        return None
+    queue_size = int(os.getenv("PIPELINE_QUEUE_SIZE", "10000"))
+    put_timeout = float(os.getenv("PIPELINE_PUT_TIMEOUT", "0.1"))
+    for config in configs:
+        table_bridges[config.name] = TableBridge(config, pg_pool, supabase_client=supabase, redis_client=redis_client,
+                                                 queue_size=queue_size, put_timeout=put_timeout)
+        if config.install_trigger:
+            try:
+                table_bridges[config.name].ensure_trigger()
+            except Exception as e:
+                log.error("Error installing the notify trigger on %s (run migrate.py): %s", config.name, e)
+
+    # Listen before the initial loads so changes made during them are queued and replayed afterwards
+    table_listener = MultiTableListener(get_postgres_connection, table_bridges.values())
+    threading.Thread(target=table_listener.run_forever, name="table-bridge-listener", daemon=True).start()
+    table_listener.listening.wait(timeout=10)
+
+    def start_bridge(bridge):
+        try:
+            bridge.start()
+            log.info("Bridge %s: started with %s worker(s).", bridge.config.name, bridge.config.workers)
+        except Exception as e:
+            log.error("Error starting bridge for %s: %s", bridge.config.name, e)
+
+    # Tables load and run concurrently
+    for bridge in table_bridges.values():
+        threading.Thread(target=start_bridge, args=(bridge,), name=f"bridge-start-{bridge.config.table}", daemon=True).start()
+    return table_listener
+
+def get_table_bridge_stats():
+    """Return per-table event counts, worker queues, Supabase batches and cache flushes"""
+    return {
+        "inventory": ITEMS_TABLE.summary(),
+        "listener": table_listener.stats() if table_listener else None,
+        "tables": {name: bridge.stats() for name, bridge in table_bridges.items()},
+    }
+
+# Prometheus metrics: counters and histograms are fed by the hot paths, these gauges are read at scrape time
+def _pipeline_depths():
+    pipelines = [change_pipeline] if change_pipeline else []
+    for bridge in table_bridges.values():
+        pipelines.extend(bridge.pipelines)
+    depths = {}
+    for pipeline in pipelines:
+        for stage, stats in pipeline.stats().items():
+            key = (pipeline.name, stage)
+            depths[key] = depths.get(key, 0) + stats["depth"]
+    return list(depths.items())
+
+def _supabase_buffered():
+    syncers = [supabase_syncer] + [bridge.syncer for bridge in table_bridges.values() if bridge.syncer]
+    return [((syncer.table,), syncer.stats()["buffered"]) for syncer in syncers]
+
+metrics.gauge("bridge_pg_pool_connections", "PostgreSQL pool connections by state",
+              lambda: [((state,), pg_pool.stats()[state]) for state in ("in_use", "idle")], labelnames=("state",))
+metrics.gauge("bridge_pipeline_queue_depth", "Events waiting in each pipeline stage", _pipeline_depths,
+              labelnames=("pipeline", "stage"))
+metrics.gauge("bridge_supabase_buffered_rows", "Changes buffered for the next Supabase batch", _supabase_buffered,
+              labelnames=("table",))
+metrics.gauge("bridge_change_log_position", "Last change-log seq applied by every sink", lambda: change_progress.position or 0)
+metrics.gauge("bridge_broadcast_pending", "Item updates waiting for the next websocket frame",
+              lambda: item_broadcaster.stats()["pending"] if item_broadcaster else 0)
+metrics.gauge("bridge_leader", "1 while this process holds the bridge leader lock", lambda: int(bridge_leader.is_leader))
+metrics.gauge("bridge_snapshot_items", "Items in the in-memory snapshot", lambda: inventory_snapshot.stats()["items"])
+
+def get_metrics():
+    """Return every metric in the Prometheus text format"""
+    return metrics.render()
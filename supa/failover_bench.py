@@ -0,0 +1,134 @@
+import sys
+import json
+import time
+import argparse
+import platform
+import threading
+from datetime import datetime
+
+import database_operations as db
+from leader import LeaderLock
+from benchmark import percentiles, git_revision
+
+
+class Candidate:
+    """A bridge worker stand-in: stands by for the lock, leads until it loses it, then stands by again"""
+
+    def __init__(self, index, key, retry_interval, heartbeat_interval, changed):
+        self.index = index
+        self.changed = changed  # Condition notified on every acquire/loss
+        self.acquired_at = None
+        self.lost_at = None
+        self.lock = LeaderLock(db.get_leader_connection, key, retry_interval=retry_interval,
+                               heartbeat_interval=heartbeat_interval, on_lost=self._lost, name=f"candidate-{index}")
+        self._thread = threading.Thread(target=self._run, name=f"failover-candidate-{index}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while self.lock.acquire():
+            with self.changed:
+                self.acquired_at = time.monotonic()
+                self.changed.notify_all()
+            with self.changed:
+                self.changed.wait_for(lambda: not self.lock.is_leader)
+
+    def _lost(self):
+        with self.changed:
+            self.lost_at = time.monotonic()
+            self.changed.notify_all()
+
+
+def leader_of(candidates):
+    leaders = [c for c in candidates if c.lock.is_leader]
+    return leaders[0] if len(leaders) == 1 else None
+
+
+def run_round(candidates, changed, mode, admin, timeout):
+    """Take the current leader down and time the takeover. Returns this round's measurements"""
+    with changed:
+        if not changed.wait_for(lambda: leader_of(candidates) is not None, timeout):
+            raise RuntimeError("no single leader was elected")
+        old = leader_of(candidates)
+    pid = old.lock.backend_pid()
+
+    start = time.monotonic()
+    if mode == "terminate":
+        # Crash or network loss: the session disappears under the leader
+        with admin.cursor() as cur:
+            cur.execute("SELECT pg_terminate_backend(%s);", (pid,))
+    else:
+        # Graceful shutdown of the leader process; a fresh standby replaces it
+        old.lock.release()
+        candidates[candidates.index(old)] = Candidate(old.index, old.lock.key, old.lock.retry_interval,
+                                                      old.lock.heartbeat_interval, changed).start()
+
+    with changed:
+        took_over = changed.wait_for(
+            lambda: any(c is not old and c.lock.is_leader and c.acquired_at and c.acquired_at >= start
+                        for c in candidates), timeout)
+        if mode == "terminate":
+            changed.wait_for(lambda: old.lost_at is not None and old.lost_at >= start, timeout)
+    if not took_over:
+        raise RuntimeError(f"no standby took over within {timeout}s")
+
+    new = next(c for c in candidates if c is not old and c.lock.is_leader)
+    result = {"takeover_ms": (new.acquired_at - start) * 1000}
+    if mode == "terminate" and old.lost_at is not None and old.lost_at >= start:
+        result["detection_ms"] = (old.lost_at - start) * 1000
+        # Both believed they were leading between the takeover and the old leader noticing
+        result["overlap_ms"] = max(0.0, (old.lost_at - new.acquired_at) * 1000)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure bridge leader failover: time until a standby holds the "
+                                                 "advisory lock after the leader goes away")
+    parser.add_argument("--candidates", type=int, default=3, help="Competing bridge workers")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--mode", choices=["terminate", "release"], default="terminate",
+                        help="terminate: kill the leader's session (crash); release: graceful shutdown")
+    parser.add_argument("--retry-interval", type=float, default=db.bridge_leader.retry_interval)
+    parser.add_argument("--heartbeat-interval", type=float, default=db.bridge_leader.heartbeat_interval)
+    parser.add_argument("--key", type=int, default=db.BRIDGE_LEADER_LOCK_KEY + 1,
+                        help="Advisory lock key (not the live bridge's)")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    changed = threading.Condition()
+    candidates = [Candidate(i, args.key, args.retry_interval, args.heartbeat_interval, changed).start()
+                  for i in range(args.candidates)]
+    admin = db.get_postgres_connection()
+    admin.autocommit = True
+
+    print(f"Failover: {args.rounds} round(s), {args.candidates} candidates, mode {args.mode}, "
+          f"retry {args.retry_interval:g}s, heartbeat {args.heartbeat_interval:g}s...")
+    rounds = []
+    for number in range(1, args.rounds + 1):
+        rounds.append(run_round(candidates, changed, args.mode, admin, args.timeout))
+        print(f"Failover round {number}: takeover in {rounds[-1]['takeover_ms']:.0f} ms")
+        time.sleep(args.heartbeat_interval)  # let the old leader settle back into standby
+    admin.close()
+
+    results = {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "config": {"candidates": args.candidates, "rounds": args.rounds, "mode": args.mode,
+                   "retry_interval": args.retry_interval, "heartbeat_interval": args.heartbeat_interval},
+        "failover": {name: percentiles([r[name] for r in rounds if name in r])
+                     for name in ("takeover_ms", "detection_ms", "overlap_ms")},
+    }
+    print(json.dumps(results["failover"], indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Failover: results written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+import re
+import time
+import threading
+import weakref
+import logging
+
+import httpx
+
+try:
+    import h2  # noqa: F401  (HTTP/2 support for httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+log = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is +Inf
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (milliseconds)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, value_ms):
+        for i, bound in enumerate(self.buckets):
+            if value_ms <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum_ms += value_ms
+        self.max_ms = max(self.max_ms, value_ms)
+
+    def snapshot(self):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            "count": self.count,
+            "sum_ms": self.sum_ms,
+            "avg_ms": self.sum_ms / self.count if self.count else 0.0,
+            "max_ms": self.max_ms,
+            "buckets": buckets,
+        }
+
+
+class HttpTransport:
+    """Shared keep-alive HTTP client for the Supabase and Upstash REST sinks.
+
+    One ``httpx.Client`` (HTTP/2 when the ``h2`` package is installed) keeps
+    connections to each host open across calls, so TLS setup is paid once per
+    connection instead of once per operation. Every response is timed (up to
+    its headers) into a per-endpoint latency histogram keyed by method, host
+    and path.
+    """
+
+    def __init__(self, timeout=10.0, connect_timeout=5.0, max_connections=20, max_keepalive=10,
+                 keepalive_expiry=60.0, http2=None):
+        self.http2 = HTTP2_AVAILABLE if http2 is None else (http2 and HTTP2_AVAILABLE)
+        self._lock = threading.Lock()
+        self._started = weakref.WeakKeyDictionary()
+        self._histograms = {}
+        self._errors = {}
+
+        self.client = httpx.Client(
+            http2=self.http2,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            event_hooks={"request": [self._on_request], "response": [self._on_response]},
+        )
+
+    @staticmethod
+    def endpoint_label(request):
+        """Low-cardinality label for a request, e.g. ``POST abc.upstash.io/pipeline``"""
+        path = _ID_SEGMENT.sub("/:id", request.url.path) or "/"
+        return f"{request.method} {request.url.host}{path}"
+
+    def _on_request(self, request):
+        self._started[request] = time.perf_counter()
+
+    def _on_response(self, response):
+        started = self._started.pop(response.request, None)
+        if started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        label = self.endpoint_label(response.request)
+        with self._lock:
+            histogram = self._histograms.get(label)
+            if histogram is None:
+                histogram = self._histograms[label] = LatencyHistogram()
+            histogram.observe(elapsed_ms)
+            if response.status_code >= 400:
+                self._errors[label] = self._errors.get(label, 0) + 1
+
+    def attach_to_upstash(self, redis):
+        """Route an ``upstash_redis.Redis`` client through this transport.
+
+        upstash-redis does not accept an external HTTP client, so this swaps
+        the httpx client inside its (private) HTTP wrapper when present.
+        """
+        http = getattr(redis, "_http", None)
+        if http is None or not hasattr(http, "_client"):
+            log.warning("Could not attach shared HTTP transport to the Upstash client; it keeps its own connections.")
+            return False
+        old_client = http._client
+        http._client = self.client
+        if old_client is not self.client:
+            old_client.close()
+        return True
+
+    def stats(self):
+        """Per-endpoint latency histograms and error counts"""
+        with self._lock:
+            return {
+                "http2": self.http2,
+                "endpoints": {
+                    label: dict(histogram.snapshot(), errors=self._errors.get(label, 0))
+                    for label, histogram in self._histograms.items()
+                },
+            }
+
+    def close(self):
+        self.client.close()
@@ -0,0 +1,257 @@
+import sys
+import math
+import operator
+import threading
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # Aggregates fall back to pure Python over the same columns
+    np = None
+
+from inventory_stats import LOW_STOCK_THRESHOLD
+
+# Inclusive stock bounds per level, matching get_stock_level_py and bridge_stock_level()
+STOCK_LEVEL_RANGES = {
+    "low": (None, 10),
+    "medium": (11, 30),
+    "high": (31, None),
+}
+
+# Snapshot row layout: the six API columns followed by the parsed rates
+ROW_FIELDS = ("item_id", "name", "sku", "rate", "purchase rate", "stock on hand", "rate_value", "purchase_rate_value")
+
+
+class InventorySnapshot:
+    """Columnar in-memory copy of the items table.
+
+    Each column is one ``array`` (ids, parsed rates, stock) or list (names,
+    SKUs, raw rate text), and ``item_id -> position`` lives in a single dict,
+    so an item costs a few machine words instead of a six-key dict. Rows are
+    appended on insert and deletes move the last row into the freed slot, so
+    ``upsert()``/``remove()`` are O(1). ``totals()`` works on whole columns
+    (vectorized with NumPy when it is installed).
+
+    A reload reads Postgres while changes keep arriving: ``begin_load()``
+    records every upsert/remove from then on, and ``load()`` replays them onto
+    the fresh rows before swapping them in, so none of them is lost.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+        self.loaded = False
+        self.version = 0
+        self._journal = None
+        self._stats = {"loads": 0, "upserts": 0, "removes": 0, "replayed": 0}
+
+    def _reset(self):
+        self._ids = array("q")
+        self._names = []
+        self._skus = []
+        self._rate_texts = []
+        self._purchase_rate_texts = []
+        self._stock = array("q")
+        self._rates = array("d")
+        self._purchase_rates = array("d")
+        self._index = {}
+
+    @property
+    def _columns(self):
+        return (self._ids, self._names, self._skus, self._rate_texts, self._purchase_rate_texts,
+                self._stock, self._rates, self._purchase_rates)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _row(self, i):
+        return tuple(column[i] for column in self._columns)
+
+    # Writes
+    def begin_load(self):
+        """Start recording changes for the next ``load()``; call it before the rows are queried"""
+        with self._lock:
+            self._journal = []
+
+    def abort_load(self):
+        """Stop recording changes after a failed reload"""
+        with self._lock:
+            self._journal = None
+
+    def load(self, rows):
+        """Replace the whole snapshot with ``rows`` (tuples in ``ROW_FIELDS`` order). Returns the row count"""
+        fresh = InventorySnapshot()
+        try:
+            for row in rows:
+                fresh._append(row)
+        except BaseException:
+            self.abort_load()
+            raise
+        with self._lock:
+            # Changes applied since begin_load() may be missing from the rows read; the row images make replay idempotent
+            journal, self._journal = self._journal or (), None
+            for op, value in journal:
+                if op == "upsert":
+                    fresh._append(value)
+                else:
+                    fresh._discard(value)
+            for name in ("_ids", "_names", "_skus", "_rate_texts", "_purchase_rate_texts",
+                         "_stock", "_rates", "_purchase_rates", "_index"):
+                setattr(self, name, getattr(fresh, name))
+            self.loaded = True
+            self.version += 1
+            self._stats["loads"] += 1
+            self._stats["replayed"] += len(journal)
+            return len(self._ids)
+
+    def _append(self, row):
+        item_id = row[0]
+        if item_id in self._index:
+            self._set(self._index[item_id], row)
+            return
+        self._index[item_id] = len(self._ids)
+        for column, value in zip(self._columns, row):
+            column.append(value)
+
+    def _set(self, i, row):
+        for column, value in zip(self._columns, row):
+            column[i] = value
+
+    def upsert(self, row):
+        """Insert or replace one row. Returns the previous ``(rate, stock)`` or None if it is new"""
+        with self._lock:
+            i = self._index.get(row[0])
+            old = None
+            if i is None:
+                self._append(row)
+            else:
+                old = (self._rates[i], self._stock[i])
+                self._set(i, row)
+            if self._journal is not None:
+                self._journal.append(("upsert", row))
+            self.version += 1
+            self._stats["upserts"] += 1
+            return old
+
+    def _discard(self, item_id):
+        i = self._index.pop(item_id, None)
+        if i is None:
+            return None
+        old = (self._rates[i], self._stock[i])
+        last = len(self._ids) - 1
+        if i != last:
+            # Move the last row into the freed slot
+            self._set(i, self._row(last))
+            self._index[self._ids[i]] = i
+        for column in self._columns:
+            column.pop()
+        return old
+
+    def remove(self, item_id):
+        """Remove one row. Returns its ``(rate, stock)`` or None if it was not present"""
+        item_id = int(item_id)
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append(("remove", item_id))
+            old = self._discard(item_id)
+            if old is None:
+                return None
+            self.version += 1
+            self._stats["removes"] += 1
+            return old
+
+    # Reads
+    def get(self, item_id):
+        """The snapshot row for ``item_id``, or None"""
+        with self._lock:
+            i = self._index.get(int(item_id))
+            return self._row(i) if i is not None else None
+
+    def rows(self, positions=None):
+        """Snapshot rows for ``positions`` (all rows, in storage order, by default)"""
+        with self._lock:
+            if positions is None:
+                positions = range(len(self._ids))
+            return [self._row(i) for i in positions]
+
+    def select(self, q=None, stock_level=None, min_rate=None, max_rate=None, sort=None, after=None, limit=None):
+        """Rows matching the same filters and ordering as ``build_items_query``.
+
+        Arguments are expected to be validated already; ``sort`` is a field
+        name optionally prefixed with '-', ties are ordered by item_id.
+        """
+        sort = sort or "item_id"
+        descending = sort.startswith("-")
+        key_column = {
+            "item_id": "_ids",
+            "name": "_names",
+            "sku": "_skus",
+            "rate": "_rates",
+            "stock": "_stock",
+        }[sort.lstrip("-")]
+
+        with self._lock:
+            positions = range(len(self._ids))
+            if q:
+                needle = q.lower()
+                names, skus = self._names, self._skus
+                positions = [i for i in positions if needle in names[i].lower() or needle in skus[i].lower()]
+            if stock_level:
+                low, high = STOCK_LEVEL_RANGES[stock_level]
+                stock = self._stock
+                positions = [i for i in positions
+                             if (low is None or stock[i] >= low) and (high is None or stock[i] <= high)]
+            if min_rate is not None:
+                rates = self._rates
+                positions = [i for i in positions if rates[i] >= min_rate]
+            if max_rate is not None:
+                rates = self._rates
+                positions = [i for i in positions if rates[i] <= max_rate]
+            if after is not None:
+                ids = self._ids
+                positions = [i for i in positions if (ids[i] < after if descending else ids[i] > after)]
+
+            ids = self._ids
+            positions = sorted(positions, key=ids.__getitem__)
+            if key_column != "_ids":
+                # Stable sort keeps the item_id ASC tie-break, even when reversed
+                positions.sort(key=getattr(self, key_column).__getitem__, reverse=descending)
+            elif descending:
+                positions.reverse()
+            if limit is not None:
+                positions = positions[:limit]
+            return [self._row(i) for i in positions]
+
+    def totals(self):
+        """``(total_products, total_value, low_stock_count)`` computed over whole columns"""
+        with self._lock:
+            count = len(self._ids)
+            if np is not None and count:
+                # Zero-copy views over the array buffers, dropped while the lock is still held (an array with live views cannot be resized)
+                rates = np.frombuffer(self._rates, dtype=np.float64)
+                stock = np.frombuffer(self._stock, dtype=np.int64)
+                total_value = float(rates @ stock)
+                low_stock_count = int(np.count_nonzero(stock <= LOW_STOCK_THRESHOLD))
+                del rates, stock
+            else:
+                total_value = math.fsum(map(operator.mul, self._rates, self._stock))
+                low_stock_count = sum(1 for stock in self._stock if stock <= LOW_STOCK_THRESHOLD)
+            return count, total_value, low_stock_count
+
+    def stats(self):
+        """Row count, version, counters and approximate memory (excluding the string objects)"""
+        with self._lock:
+            count = len(self._ids)
+            # Array columns are packed 8-byte values; list columns hold one pointer per row
+            column_bytes = sum(c.itemsize * len(c) if isinstance(c, array) else 8 * len(c) for c in self._columns)
+            stats = dict(self._stats)
+            stats.update({
+                "loaded": self.loaded,
+                "items": count,
+                "version": self.version,
+                "column_bytes": column_bytes,
+                "index_bytes": sys.getsizeof(self._index),
+                "bytes_per_item": (column_bytes + sys.getsizeof(self._index)) / count if count else 0.0,
+                "numpy": np is not None,
+            })
+            return stats
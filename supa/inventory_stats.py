@@ -0,0 +1,120 @@
+import time
+import threading
+import logging
+
+log = logging.getLogger(__name__)
+
+LOW_STOCK_THRESHOLD = 10
+
+
+class InventoryStatsAggregator:
+    """Keeps inventory stats up to date from individual change events.
+
+    Only the running totals are kept here. Each change passes the item's old
+    and new ``(rate, stock)`` (the old row image comes from the in-memory
+    snapshot), so the previous contribution can be subtracted before the new
+    one is added and every change is O(1). ``reconcile()`` replaces the totals
+    with ones recomputed over the whole snapshot and reports any drift.
+    """
+
+    def __init__(self, reconcile_interval=300.0, tolerance=0.01):
+        self.reconcile_interval = reconcile_interval
+        self.tolerance = tolerance
+
+        self._lock = threading.Lock()
+        self._total_products = 0
+        self._total_value = 0.0
+        self._low_stock_count = 0
+        self._loaded = False
+        self._last_reconciled_at = None
+
+        self._stats = {
+            "applied_events": 0,
+            "reconciliations": 0,
+            "drift_detected": 0,
+            "last_drift": None,
+        }
+
+    @staticmethod
+    def _is_low(stock):
+        return stock <= LOW_STOCK_THRESHOLD
+
+    def _add(self, rate, stock, sign):
+        self._total_products += sign
+        self._total_value += sign * rate * stock
+        if self._is_low(stock):
+            self._low_stock_count += sign
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def reconcile_due(self):
+        """True when the aggregator has never been loaded or the reconcile interval has passed"""
+        with self._lock:
+            if not self._loaded or self._last_reconciled_at is None:
+                return True
+            return time.monotonic() - self._last_reconciled_at >= self.reconcile_interval
+
+    def invalidate(self):
+        """Force a reconciliation on the next ``reconcile_due()`` check (e.g. after a dropped event)"""
+        with self._lock:
+            self._last_reconciled_at = None
+
+    def apply(self, old=None, new=None):
+        """Apply one change given the item's previous and current ``(rate, stock)`` (None when absent)"""
+        with self._lock:
+            if old is not None:
+                self._add(float(old[0]), int(old[1]), -1)
+            if new is not None:
+                self._add(float(new[0]), int(new[1]), 1)
+            self._stats["applied_events"] += 1
+
+    def reconcile(self, total_products, total_value, low_stock_count):
+        """Replace the running totals with a full recomputation.
+
+        Returns a dict describing the drift between the incremental and the
+        recomputed stats, or ``None`` if they matched (or nothing was loaded yet).
+        """
+        with self._lock:
+            drift = None
+            if self._loaded:
+                drift = {
+                    "totalProducts": total_products - self._total_products,
+                    "totalValue": total_value - self._total_value,
+                    "lowStockCount": low_stock_count - self._low_stock_count,
+                }
+                if (drift["totalProducts"] == 0 and drift["lowStockCount"] == 0
+                        and abs(drift["totalValue"]) <= self.tolerance):
+                    drift = None
+
+            self._total_products = total_products
+            self._total_value = total_value
+            self._low_stock_count = low_stock_count
+            self._loaded = True
+            self._last_reconciled_at = time.monotonic()
+            self._stats["reconciliations"] += 1
+            if drift:
+                self._stats["drift_detected"] += 1
+                self._stats["last_drift"] = drift
+
+        if drift:
+            log.warning("Inventory stats drift corrected during reconciliation: %s", drift)
+        return drift
+
+    def snapshot(self):
+        """Current stats in the shape published to ``cache:inventory_stats``"""
+        with self._lock:
+            return {
+                "totalProducts": self._total_products,
+                "totalValue": self._total_value,
+                "lowStockCount": self._low_stock_count,
+            }
+
+    def stats(self):
+        """Aggregator counters for monitoring"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["tracked_items"] = self._total_products
+            stats["loaded"] = self._loaded
+            return stats
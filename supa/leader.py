@@ -0,0 +1,148 @@
+import time
+import logging
+import threading
+
+import psycopg2
+import psycopg2.extensions
+
+log = logging.getLogger(__name__)
+
+
+class LeaderLock:
+    """Single-leader election on a session-level Postgres advisory lock.
+
+    Every bridge worker calls ``acquire()``; one of them gets
+    ``pg_try_advisory_lock(key)`` on its own dedicated connection and the
+    others keep retrying every ``retry_interval`` seconds. The lock belongs
+    to that session, so when the leader exits, crashes or loses its
+    connection, Postgres releases it and the next standby takes over.
+
+    While leading, a heartbeat checks the lock connection every
+    ``heartbeat_interval`` seconds. If the check fails the lock may already
+    belong to someone else, so leadership is given up and ``on_lost`` is
+    called (the bridge worker exits and is restarted as a standby).
+    """
+
+    def __init__(self, connect, key, retry_interval=1.0, heartbeat_interval=2.0, on_lost=None, name="bridge"):
+        self._connect = connect
+        self.key = key
+        self.retry_interval = retry_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.on_lost = on_lost
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self._stopped = threading.Event()
+        self._heartbeat = None
+        self.is_leader = False
+
+        self._stats = {
+            "attempts": 0,
+            "connect_errors": 0,
+            "acquired": 0,
+            "lost": 0,
+            "heartbeats": 0,
+            "last_wait_s": 0.0,
+            "leader_since": None,
+        }
+
+    def _open(self):
+        conn = self._connect()
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        return conn
+
+    def _close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def try_acquire(self):
+        """One attempt at taking the lock. Returns True if this process is now the leader"""
+        with self._lock:
+            if self.is_leader:
+                return True
+            self._stats["attempts"] += 1
+            try:
+                if self._conn is None or self._conn.closed:
+                    self._conn = self._open()
+                with self._conn.cursor() as cur:
+                    cur.execute("SELECT pg_try_advisory_lock(%s);", (self.key,))
+                    acquired = cur.fetchone()[0]
+            except psycopg2.Error as e:
+                self._stats["connect_errors"] += 1
+                log.warning("Leader lock '%s': %s", self.name, e)
+                self._close()
+                return False
+            if acquired:
+                self.is_leader = True
+                self._stats["acquired"] += 1
+                self._stats["leader_since"] = time.time()
+            return acquired
+
+    def acquire(self, timeout=None):
+        """Block until this process is the leader (or ``timeout`` passes). Returns True once leading"""
+        start = time.monotonic()
+        logged = False
+        while not self._stopped.is_set():
+            if self.try_acquire():
+                waited = time.monotonic() - start
+                self._stats["last_wait_s"] = waited
+                log.info("Leader lock '%s': acquired lock %s after %.1fs.", self.name, self.key, waited)
+                self._start_heartbeat()
+                return True
+            if not logged:
+                log.info("Leader lock '%s': another worker is the leader, standing by...", self.name)
+                logged = True
+            if timeout is not None and time.monotonic() - start >= timeout:
+                return False
+            self._stopped.wait(self.retry_interval)
+        return False
+
+    def _start_heartbeat(self):
+        if self._heartbeat is None or not self._heartbeat.is_alive():
+            self._heartbeat = threading.Thread(target=self._heartbeat_loop, name=f"leader-{self.name}", daemon=True)
+            self._heartbeat.start()
+
+    def _heartbeat_loop(self):
+        while not self._stopped.wait(self.heartbeat_interval):
+            with self._lock:
+                if not self.is_leader:
+                    return
+                try:
+                    with self._conn.cursor() as cur:
+                        cur.execute("SELECT 1;")
+                    self._stats["heartbeats"] += 1
+                    continue
+                except Exception as e:
+                    log.error("Leader lock '%s': lost the lock connection: %s", self.name, e)
+                    self.is_leader = False
+                    self._stats["lost"] += 1
+                    self._stats["leader_since"] = None
+                    self._close()
+            if self.on_lost:
+                self.on_lost()
+            return
+
+    def release(self):
+        """Give up leadership (closing the session releases the lock)"""
+        self._stopped.set()
+        with self._lock:
+            self.is_leader = False
+            self._stats["leader_since"] = None
+            self._close()
+
+    def backend_pid(self):
+        """Server PID of the lock session, or None"""
+        with self._lock:
+            return self._conn.get_backend_pid() if self._conn is not None and not self._conn.closed else None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["is_leader"] = self.is_leader
+            stats["key"] = self.key
+            return stats
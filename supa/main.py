@@ -1,8 +1,73 @@
+import os
+import logging
+import argparse
+import threading
+
 import database_operations as db
 from api import app, socketio
 
+log = logging.getLogger(__name__)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Postgres -> Supabase/Redis bridge")
+    parser.add_argument(
+        "--role",
+        choices=["all", "bridge", "api"],
+        default=os.getenv("BRIDGE_ROLE", "all"),
+        help="all: API plus the bridge once this process is the leader; bridge: only the leader-elected bridge "
+             "(the API port then serves metrics and stats); api: a stateless API worker",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["threaded", "asyncio"],
+        default=os.getenv("BRIDGE_ENGINE", "threaded"),
+        help="Change-processing engine: the threaded LISTEN loop or the asyncio engine",
+    )
+    parser.add_argument(
+        "--change-source",
+        choices=sorted(db.CHANGE_SOURCES),
+        default=os.getenv("CHANGE_SOURCE", "listen"),
+        help="Where the threaded engine reads changes from: trigger + LISTEN/NOTIFY, or a logical replication slot "
+             "(which turns off the trigger-dependent read cache and change-log consumer)",
+    )
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=None, help="Default: PORT, or 5000 (5001 for the bridge role)")
+    args = parser.parse_args()
+    if args.port is None:
+        args.port = int(os.getenv("PORT", "5001" if args.role == "bridge" else "5000"))
+    if args.engine == "asyncio" and args.change_source != "listen":
+        parser.error("the asyncio engine only supports --change-source listen")
+    return args
+
+
+def leadership_lost():
+    # Listeners and sinks cannot be stopped cleanly mid-flight: exit and let the supervisor restart us as a standby
+    log.error("Bridge leadership lost; exiting.")
+    os._exit(3)
+
+
+def run_bridge(engine="threaded", change_source="listen"):
+    """Wait until this process is the bridge leader, then start the change-processing engine and table bridges"""
+    db.bridge_leader.on_lost = leadership_lost
+    db.bridge_leader.acquire()
+    if engine == "asyncio":
+        import async_engine
+        # The asyncio engine performs its own initial load before listening
+        async_engine.run_async_engine(socketio)
+    else:
+        db.initial_data_load()
+        db.start_db_listener(socketio, change_source)
+    # Every other table configured in bridge_tables.json
+    db.start_table_bridges()
+
 
 if __name__ == '__main__':
-    db.initial_data_load()
-    db.start_db_listener(socketio)
-    socketio.run(app, host='0.0.0.0', port=5000)
\ No newline at end of file
+    args = parse_args()
+    if args.change_source == "replication":
+        db.disable_read_cache("--change-source replication sends no items_channel notifications")
+    if args.role != "api":
+        # Standbys keep serving while they wait for the lock
+        threading.Thread(target=run_bridge, args=(args.engine, args.change_source), name="bridge-leader",
+                         daemon=True).start()
+    socketio.run(app, host=args.host, port=args.port)
@@ -0,0 +1,155 @@
+import socket
+import logging
+import argparse
+import threading
+import socketserver
+from urllib.parse import urlsplit
+
+import socketio
+
+import serialization
+
+log = logging.getLogger(__name__)
+
+LOCAL_SCHEME = "local://"
+DEFAULT_LOCAL_PORT = 5055
+
+
+def socketio_options(url):
+    """``SocketIO(...)`` keyword arguments for the ``SOCKETIO_MESSAGE_QUEUE`` URL.
+
+    ``local://host:port`` uses the bundled LocalQueueBroker; anything else
+    (``redis://``, ``amqp://``, ``kafka://``...) is handed to Flask-SocketIO.
+    """
+    if not url:
+        return {}
+    if url.startswith(LOCAL_SCHEME):
+        return {"client_manager": LocalQueueManager(url)}
+    return {"message_queue": url}
+
+
+def _address(url):
+    parsed = urlsplit(url)
+    return parsed.hostname or "127.0.0.1", parsed.port or DEFAULT_LOCAL_PORT
+
+
+class LocalQueueBroker:
+    """Stand-in message queue for running several API workers without Redis.
+
+    A TCP server that copies every line published by any worker to every
+    subscribed worker (the publisher included). Connections start with
+    ``PUB`` or ``SUB``. Nothing is persisted: workers that are disconnected
+    miss what was published meanwhile, as with Redis pub/sub.
+    """
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_LOCAL_PORT):
+        self.host = host
+        self.port = port
+        self.server = None
+        self._lock = threading.Lock()
+        self._subscribers = {}  # connection -> lock, so lines published from several threads never interleave
+        self.messages = 0
+
+    def start(self):
+        broker = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                role = self.rfile.readline().strip()
+                if role == b"SUB":
+                    with broker._lock:
+                        broker._subscribers[self.connection] = threading.Lock()
+                    try:
+                        self.rfile.read()  # until the subscriber disconnects
+                    finally:
+                        with broker._lock:
+                            broker._subscribers.pop(self.connection, None)
+                elif role == b"PUB":
+                    for line in self.rfile:
+                        broker.publish(line)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, name="socketio-queue-broker", daemon=True).start()
+        return self
+
+    @property
+    def url(self):
+        return f"{LOCAL_SCHEME}{self.host}:{self.port}"
+
+    def publish(self, line):
+        with self._lock:
+            self.messages += 1
+            subscribers = list(self._subscribers.items())
+        for conn, send_lock in subscribers:
+            try:
+                with send_lock:
+                    conn.sendall(line)
+            except OSError:
+                with self._lock:
+                    self._subscribers.pop(conn, None)
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class LocalQueueManager(socketio.PubSubManager):
+    """Socket.IO client manager that shares emits and rooms through a LocalQueueBroker"""
+
+    name = "localqueue"
+
+    def __init__(self, url=f"{LOCAL_SCHEME}127.0.0.1:{DEFAULT_LOCAL_PORT}", channel="flask-socketio",
+                 write_only=False, logger=None, retry_interval=1.0):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.address = _address(url)
+        self.retry_interval = retry_interval
+        self._send_lock = threading.Lock()
+        self._pub = None
+
+    def _open(self, role):
+        conn = socket.create_connection(self.address, timeout=5)
+        conn.settimeout(None)
+        conn.sendall(role + b"\n")
+        return conn
+
+    def _publish(self, data):
+        line = serialization.dumps_bytes({"channel": self.channel, "data": data}) + b"\n"
+        with self._send_lock:
+            for attempt in (1, 2):
+                try:
+                    if self._pub is None:
+                        self._pub = self._open(b"PUB")
+                    self._pub.sendall(line)
+                    return
+                except OSError as e:
+                    self._pub = None
+                    if attempt == 2:
+                        log.error("Error publishing to the Socket.IO queue at %s: %s", self.address, e)
+
+    def _listen(self):
+        while True:
+            try:
+                conn = self._open(b"SUB")
+            except OSError as e:
+                log.warning("Socket.IO queue at %s unavailable (%s), retrying...", self.address, e)
+                self.server.sleep(self.retry_interval)
+                continue
+            with conn, conn.makefile("rb") as lines:
+                for line in lines:
+                    message = serialization.loads(line)
+                    if message.get("channel") == self.channel:
+                        yield message["data"]
+            log.warning("Socket.IO queue at %s closed the connection, reconnecting...", self.address)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local stand-in message queue for Socket.IO across API workers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_LOCAL_PORT)
+    args = parser.parse_args()
+    broker = LocalQueueBroker(args.host, args.port).start()
+    print(f"Socket.IO queue listening on {broker.url} (set SOCKETIO_MESSAGE_QUEUE={broker.url})")
+    threading.Event().wait()
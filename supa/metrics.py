@@ -0,0 +1,175 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the histogram buckets; the last bucket is +Inf
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LAG_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def configure_logging(level=None):
+    """Leveled logging for the bridge processes (``LOG_LEVEL``, default INFO; per-event messages are DEBUG)"""
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    logging.basicConfig(level=level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Family:
+    def __init__(self, name, kind, help_text, labelnames, buckets=None, fn=None):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self.fn = fn
+        self.samples = {}  # label values -> value, or [bucket counts, sum, count] for histograms
+
+
+class MetricsRegistry:
+    """Process-wide counters, gauges and histograms, rendered in the Prometheus text format.
+
+    Counters and histograms are declared once and updated with ``inc()`` /
+    ``observe()``; gauges are callbacks read at scrape time, so existing
+    ``stats()`` methods can be exported without touching their hot paths.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families = {}
+
+    def _declare(self, family):
+        with self._lock:
+            return self._families.setdefault(family.name, family)
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._declare(_Family(name, "counter", help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DURATION_BUCKETS):
+        return self._declare(_Family(name, "histogram", help_text, labelnames, buckets=tuple(buckets)))
+
+    def gauge(self, name, help_text, fn, labelnames=()):
+        """``fn()`` returns a number, or ``[(label values, number), ...]`` when ``labelnames`` is set"""
+        family = _Family(name, "gauge", help_text, labelnames, fn=fn)
+        with self._lock:
+            self._families[name] = family
+        return family
+
+    def inc(self, name, value=1, /, **labels):
+        family = self._families[name]
+        key = tuple(labels.get(label, "") for label in family.labelnames)
+        with self._lock:
+            family.samples[key] = family.samples.get(key, 0) + value
+
+    def observe(self, name, value, /, **labels):
+        family = self._families[name]
+        key = tuple(labels.get(label, "") for label in family.labelnames)
+        with self._lock:
+            sample = family.samples.get(key)
+            if sample is None:
+                sample = family.samples[key] = [[0] * (len(family.buckets) + 1), 0.0, 0]
+            for i, bound in enumerate(family.buckets):
+                if value <= bound:
+                    sample[0][i] += 1
+                    break
+            else:
+                sample[0][-1] += 1
+            sample[1] += value
+            sample[2] += 1
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            families = list(self._families.values())
+            snapshots = {
+                family.name: {key: ([list(value[0]), value[1], value[2]] if family.kind == "histogram" else value)
+                              for key, value in family.samples.items()}
+                for family in families if family.fn is None
+            }
+        lines = []
+        for family in families:
+            if family.fn is not None:
+                try:
+                    value = family.fn()
+                except Exception as e:
+                    log.debug("Gauge %s failed: %s", family.name, e)
+                    continue
+                samples = dict(value) if family.labelnames else {(): value}
+            else:
+                samples = snapshots[family.name]
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for key, value in samples.items():
+                if family.kind != "histogram":
+                    lines.append(f"{family.name}{_label_str(family.labelnames, key)} {_number(value)}")
+                    continue
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(family.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = f'le="{_number(float(bound))}"'
+                    lines.append(f"{family.name}_bucket{_label_str(family.labelnames, key, le)} {cumulative}")
+                lines.append(f"{family.name}_sum{_label_str(family.labelnames, key)} {_number(float(total))}")
+                lines.append(f"{family.name}_count{_label_str(family.labelnames, key)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+REGISTRY.histogram("bridge_span_duration_seconds", "Duration of DB queries, Supabase/Redis calls and socket emits",
+                   ("kind", "op"))
+REGISTRY.counter("bridge_span_errors_total", "DB queries, Supabase/Redis calls and socket emits that raised",
+                 ("kind", "op"))
+REGISTRY.counter("bridge_events_total", "Change events handled per pipeline stage", ("pipeline", "stage", "outcome"))
+REGISTRY.histogram("bridge_event_lag_seconds", "Time from receiving a change until every sink is done with it",
+                   ("pipeline",), buckets=LAG_BUCKETS)
+REGISTRY.histogram("bridge_listener_lag_seconds", "Time from a change being committed until it was applied",
+                   buckets=LAG_BUCKETS)
+REGISTRY.counter("bridge_sync_batches_total", "Supabase batches sent", ("table", "op", "outcome"))
+REGISTRY.counter("bridge_sync_rows_total", "Rows sent to Supabase", ("table", "op"))
+REGISTRY.histogram("bridge_rebuild_duration_seconds", "Duration of scheduled cache rebuilds and flushes",
+                   ("name", "outcome"))
+REGISTRY.counter("bridge_rebuild_folded_events_total", "Change events folded into scheduled rebuilds", ("name",))
+
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+gauge = REGISTRY.gauge
+render = REGISTRY.render
+
+
+@contextmanager
+def span(kind, op):
+    """Time a block into ``bridge_span_duration_seconds{kind, op}``, counting it in the error counter if it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        REGISTRY.inc("bridge_span_errors_total", kind=kind, op=op)
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        REGISTRY.observe("bridge_span_duration_seconds", duration, kind=kind, op=op)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("span kind=%s op=%s duration_ms=%.2f", kind, op, duration * 1000,
+                      extra={"span": {"kind": kind, "op": op, "duration_ms": duration * 1000}})
@@ -0,0 +1,63 @@
+import os
+import argparse
+
+import psycopg2
+
+import database_operations as db
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+
+def list_migrations():
+    """Return migration file names in the order they should be applied"""
+    return sorted(name for name in os.listdir(MIGRATIONS_DIR) if name.endswith(".sql"))
+
+
+def applied_migrations(cur):
+    cur.execute(
+        'CREATE TABLE IF NOT EXISTS "public"."bridge_migrations" ('
+        '"name" text PRIMARY KEY, "applied_at" timestamptz NOT NULL DEFAULT now());'
+    )
+    cur.execute('SELECT "name" FROM "public"."bridge_migrations";')
+    return {row[0] for row in cur.fetchall()}
+
+
+def migrate(dry_run=False):
+    """Apply every pending migration, each in its own transaction"""
+    conn = db.get_postgres_connection()
+    try:
+        with conn.cursor() as cur:
+            done = applied_migrations(cur)
+        conn.commit()
+
+        pending = [name for name in list_migrations() if name not in done]
+        if not pending:
+            print("Database is up to date.")
+            return []
+
+        for name in pending:
+            if dry_run:
+                print(f"Pending: {name}")
+                continue
+            with open(os.path.join(MIGRATIONS_DIR, name)) as f:
+                sql = f.read()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(sql)
+                    cur.execute('INSERT INTO "public"."bridge_migrations" ("name") VALUES (%s);', (name,))
+                conn.commit()
+                print(f"Applied migration {name}")
+            except psycopg2.Error as e:
+                conn.rollback()
+                print(f"Error applying migration {name}: {e}")
+                raise
+        return pending
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Apply SQL migrations in supa/migrations")
+    parser.add_argument("--dry-run", action="store_true", help="Only list pending migrations")
+    args = parser.parse_args()
+    migrate(dry_run=args.dry_run)
@@ -0,0 +1,47 @@
+-- Server-side filtering, search and sorting for GET /api/items.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Numeric value of a currency string such as 'Rs.4,800.00' (NULL if it cannot be parsed).
+-- Mirrors parse_currency_value_py() in database_operations.py.
+CREATE OR REPLACE FUNCTION bridge_parse_currency(value text)
+RETURNS numeric
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+    SELECT CASE
+        WHEN cleaned ~ '^-?[0-9]+(\.[0-9]+)?$' THEN cleaned::numeric
+    END
+    FROM (
+        SELECT replace(regexp_replace(btrim(value), '^[Rr][Ss]\.?\s*', ''), ',', '') AS cleaned
+    ) AS s;
+$$;
+
+-- Stock bucket used by the front ends: <= 10 low, <= 30 medium, otherwise high.
+-- Mirrors get_stock_level_py() in database_operations.py.
+CREATE OR REPLACE FUNCTION bridge_stock_level(stock integer)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+    SELECT CASE
+        WHEN coalesce(stock, 0) <= 10 THEN 'low'
+        WHEN stock <= 30 THEN 'medium'
+        ELSE 'high'
+    END;
+$$;
+
+-- Substring search on name / SKU (ILIKE '%term%')
+CREATE INDEX IF NOT EXISTS items_name_trgm_idx ON "public"."items" USING gin ("name" gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS items_sku_trgm_idx ON "public"."items" USING gin ("sku" gin_trgm_ops);
+
+-- Stock level filter, plus a small partial index for the common low-stock query
+CREATE INDEX IF NOT EXISTS items_stock_level_idx ON "public"."items" (bridge_stock_level("stock on hand"::integer), "item_id");
+-- (the predicate must be the same expression the API filters on, see 007_items_low_stock_index.sql)
+CREATE INDEX IF NOT EXISTS items_low_stock_idx ON "public"."items" ("item_id")
+    WHERE bridge_stock_level("stock on hand"::integer) = 'low';
+
+-- Rate range filters and sorting
+CREATE INDEX IF NOT EXISTS items_rate_numeric_idx ON "public"."items" (bridge_parse_currency("rate"), "item_id");
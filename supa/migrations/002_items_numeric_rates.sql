@@ -0,0 +1,27 @@
+-- Store parsed numeric rates next to the original currency strings so read
+-- paths no longer run parse_currency_value_py() on every row.
+-- Existing rows are filled in by migration 008 (or backfill_numeric_rates.py).
+
+ALTER TABLE "public"."items"
+    ADD COLUMN IF NOT EXISTS "rate_numeric" numeric,
+    ADD COLUMN IF NOT EXISTS "purchase_rate_numeric" numeric;
+
+CREATE OR REPLACE FUNCTION bridge_items_set_numeric_rates()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW."rate_numeric" := bridge_parse_currency(NEW."rate"::text);
+    NEW."purchase_rate_numeric" := bridge_parse_currency(NEW."purchase rate"::text);
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS items_set_numeric_rates ON "public"."items";
+CREATE TRIGGER items_set_numeric_rates
+    BEFORE INSERT OR UPDATE OF "rate", "purchase rate" ON "public"."items"
+    FOR EACH ROW EXECUTE FUNCTION bridge_items_set_numeric_rates();
+
+-- Rate filters and sorting now use the stored column instead of the expression index from 001
+CREATE INDEX IF NOT EXISTS items_rate_numeric_col_idx ON "public"."items" ("rate_numeric", "item_id");
+DROP INDEX IF EXISTS items_rate_numeric_idx;
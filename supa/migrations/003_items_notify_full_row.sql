@@ -0,0 +1,70 @@
+-- Ship the full row images with every items_channel notification so the
+-- listener no longer re-reads the row it was just told about.
+--
+-- Payload: {"TG_OP", "item_id", "new": row or null, "old": row or null}.
+-- NOTIFY payloads must stay under 8000 bytes; larger ones are parked in
+-- bridge_notify_overflow and the notification only carries "overflow_id".
+
+CREATE TABLE IF NOT EXISTS "public"."bridge_notify_overflow" (
+    "id" bigserial PRIMARY KEY,
+    "payload" jsonb NOT NULL,
+    "created_at" timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION bridge_items_notify()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    changed_id bigint;
+    message text;
+    overflow_id bigint;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed_id := OLD."item_id";
+    ELSE
+        changed_id := NEW."item_id";
+    END IF;
+
+    message := json_build_object(
+        'TG_OP', TG_OP,
+        'item_id', changed_id,
+        'new', CASE WHEN TG_OP = 'DELETE' THEN NULL ELSE row_to_json(NEW) END,
+        'old', CASE WHEN TG_OP = 'INSERT' THEN NULL ELSE row_to_json(OLD) END
+    )::text;
+
+    IF octet_length(message) >= 8000 THEN
+        INSERT INTO "public"."bridge_notify_overflow" ("payload")
+        VALUES (message::jsonb)
+        RETURNING "id" INTO overflow_id;
+        message := json_build_object('TG_OP', TG_OP, 'item_id', changed_id, 'overflow_id', overflow_id)::text;
+    END IF;
+
+    PERFORM pg_notify('items_channel', message);
+    RETURN NULL;
+END;
+$$;
+
+-- Replace whichever trigger previously notified items_channel (it only sent TG_OP and item_id)
+DO $$
+DECLARE
+    old_trigger record;
+BEGIN
+    FOR old_trigger IN
+        SELECT t.tgname
+        FROM pg_trigger t
+        JOIN pg_proc p ON p.oid = t.tgfoid
+        WHERE t.tgrelid = '"public"."items"'::regclass
+          AND NOT t.tgisinternal
+          AND p.proname <> 'bridge_items_notify'
+          AND p.prosrc LIKE '%items_channel%'
+    LOOP
+        EXECUTE format('DROP TRIGGER %I ON "public"."items"', old_trigger.tgname);
+    END LOOP;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS items_notify_change ON "public"."items";
+CREATE TRIGGER items_notify_change
+    AFTER INSERT OR UPDATE OR DELETE ON "public"."items"
+    FOR EACH ROW EXECUTE FUNCTION bridge_items_notify();
@@ -0,0 +1,68 @@
+-- Durable change log: every items change is recorded in the same transaction
+-- as the change itself, so nothing is lost while the bridge is down. The
+-- NOTIFY is kept as a low-latency wake-up that also carries the change.
+--
+-- snapshot_xmax is the next transaction id at the time of the change. Any
+-- transaction holding a lower seq already had a lower id, so once the oldest
+-- running transaction is past snapshot_xmax, a missing lower seq can no longer
+-- appear (it was rolled back) and the consumer may skip the gap.
+
+CREATE TABLE IF NOT EXISTS "public"."bridge_change_log" (
+    "seq" bigserial PRIMARY KEY,
+    "tg_op" text NOT NULL,
+    "item_id" bigint NOT NULL,
+    "new_row" jsonb,
+    "old_row" jsonb,
+    "snapshot_xmax" bigint NOT NULL DEFAULT txid_snapshot_xmax(txid_current_snapshot()),
+    "created_at" timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS bridge_change_log_created_at_idx ON "public"."bridge_change_log" ("created_at");
+
+-- Last change-log seq each consumer has fully applied
+CREATE TABLE IF NOT EXISTS "public"."bridge_checkpoints" (
+    "consumer" text PRIMARY KEY,
+    "seq" bigint NOT NULL,
+    "updated_at" timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION bridge_items_notify()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    changed_id bigint;
+    new_row jsonb;
+    old_row jsonb;
+    change_seq bigint;
+    message text;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed_id := OLD."item_id";
+    ELSE
+        changed_id := NEW."item_id";
+        new_row := to_jsonb(NEW);
+    END IF;
+    IF TG_OP <> 'INSERT' THEN
+        old_row := to_jsonb(OLD);
+    END IF;
+
+    INSERT INTO "public"."bridge_change_log" ("tg_op", "item_id", "new_row", "old_row")
+    VALUES (TG_OP, changed_id, new_row, old_row)
+    RETURNING "seq" INTO change_seq;
+
+    message := json_build_object(
+        'TG_OP', TG_OP, 'item_id', changed_id, 'seq', change_seq, 'new', new_row, 'old', old_row
+    )::text;
+    -- NOTIFY payloads must stay under 8000 bytes; the consumer reads large changes from the log
+    IF octet_length(message) >= 8000 THEN
+        message := json_build_object('TG_OP', TG_OP, 'item_id', changed_id, 'seq', change_seq)::text;
+    END IF;
+
+    PERFORM pg_notify('items_channel', message);
+    RETURN NULL;
+END;
+$$;
+
+-- Oversized payloads now live in the change log
+DROP TABLE IF EXISTS "public"."bridge_notify_overflow";
@@ -0,0 +1,45 @@
+-- Generic change notification for tables mirrored by the config-driven table
+-- bridge (table_bridge.py, bridge_tables.json). The bridge installs one
+-- trigger per configured table on startup:
+--
+--   CREATE TRIGGER bridge_notify_<table> AFTER INSERT OR UPDATE OR DELETE ON <table>
+--       FOR EACH ROW EXECUTE FUNCTION bridge_notify_table_change('<channel>', '<primary key>');
+--
+-- Payload: {"TG_OP", "table", "key", "new": row or null, "old": row or null}.
+-- NOTIFY payloads must stay under 8000 bytes; larger ones drop the row images
+-- and the bridge reads the row back by key.
+
+CREATE OR REPLACE FUNCTION bridge_notify_table_change()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    channel_name text := TG_ARGV[0];
+    key_column text := TG_ARGV[1];
+    new_row jsonb;
+    old_row jsonb;
+    changed_key jsonb;
+    message text;
+BEGIN
+    IF TG_OP <> 'DELETE' THEN
+        new_row := to_jsonb(NEW);
+    END IF;
+    IF TG_OP <> 'INSERT' THEN
+        old_row := to_jsonb(OLD);
+    END IF;
+    changed_key := coalesce(new_row, old_row) -> key_column;
+
+    message := json_build_object(
+        'TG_OP', TG_OP, 'table', TG_TABLE_SCHEMA || '.' || TG_TABLE_NAME, 'key', changed_key,
+        'new', new_row, 'old', old_row
+    )::text;
+    IF octet_length(message) >= 8000 THEN
+        message := json_build_object(
+            'TG_OP', TG_OP, 'table', TG_TABLE_SCHEMA || '.' || TG_TABLE_NAME, 'key', changed_key
+        )::text;
+    END IF;
+
+    PERFORM pg_notify(channel_name, message);
+    RETURN NULL;
+END;
+$$;
@@ -0,0 +1,44 @@
+-- Per-chunk row hashes for reconcile.py. The same file can be run in the
+-- Supabase SQL editor so both sides hash their rows server-side and only the
+-- chunks whose hashes differ are pulled; without it reconcile.py falls back to
+-- fetching and hashing the rows itself.
+--
+-- A row hashes as md5 over "item_id|name|sku|rate|purchase rate|stock on hand"
+-- lines (ordered by item_id), with the rates normalized to two decimals so
+-- text ("Rs.4,800.00") and numeric (4800) columns hash the same. This must
+-- match canonical_line() in reconcile.py.
+
+CREATE OR REPLACE FUNCTION bridge_canonical_rate(value text)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+    SELECT CASE
+        WHEN cleaned ~ '^-?[0-9]+(\.[0-9]+)?$' THEN round(cleaned::numeric, 2)::text
+        ELSE ''
+    END
+    FROM (
+        SELECT replace(regexp_replace(btrim(coalesce(value, '')), '^[Rr][Ss]\.?\s*', ''), ',', '') AS cleaned
+    ) AS s;
+$$;
+
+-- Hashes of the chunks [bounds[i], bounds[i + 1]), numbered from 0; empty chunks are omitted
+CREATE OR REPLACE FUNCTION bridge_items_chunk_hashes(bounds bigint[])
+RETURNS TABLE ("chunk" integer, "row_count" bigint, "hash" text)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        width_bucket("item_id"::bigint, bounds) - 1,
+        count(*),
+        md5(string_agg(
+            concat_ws('|', "item_id"::bigint, coalesce("name", ''), coalesce("sku", ''),
+                      bridge_canonical_rate("rate"::text), bridge_canonical_rate("purchase rate"::text),
+                      coalesce("stock on hand"::text, '')),
+            E'\n' ORDER BY "item_id"::bigint
+        ))
+    FROM "public"."items"
+    WHERE "item_id"::bigint >= bounds[1] AND "item_id"::bigint < bounds[array_length(bounds, 1)]
+    GROUP BY 1;
+$$;
@@ -0,0 +1,9 @@
+-- The low-stock partial index used to be defined with the predicate
+-- "stock on hand"::integer <= 10, which the planner cannot match to the
+-- API's filter (bridge_stock_level("stock on hand"::integer) = 'low'), so it
+-- was never used. Recreate it with the same expression as STOCK_LEVEL_SQL
+-- in database_operations.py.
+
+DROP INDEX IF EXISTS "public"."items_low_stock_idx";
+CREATE INDEX items_low_stock_idx ON "public"."items" ("item_id")
+    WHERE bridge_stock_level("stock on hand"::integer) = 'low';
@@ -0,0 +1,30 @@
+-- Migration 002 added rate_numeric / purchase_rate_numeric but left existing
+-- rows NULL until backfill_numeric_rates.py ran. Reads now use the stored
+-- value with the parsed string as fallback, and this migration backfills the
+-- remaining rows itself.
+--
+-- Updates that only touch the numeric columns are derived data: they no
+-- longer fire the notify/change-log trigger, so the backfill does not send a
+-- change through the bridge for every row.
+
+DROP TRIGGER IF EXISTS items_notify_change ON "public"."items";
+DROP TRIGGER IF EXISTS items_notify_change_update ON "public"."items";
+CREATE TRIGGER items_notify_change
+    AFTER INSERT OR DELETE ON "public"."items"
+    FOR EACH ROW EXECUTE FUNCTION bridge_items_notify();
+CREATE TRIGGER items_notify_change_update
+    AFTER UPDATE ON "public"."items"
+    FOR EACH ROW
+    WHEN ((to_jsonb(OLD) - 'rate_numeric' - 'purchase_rate_numeric')
+          IS DISTINCT FROM (to_jsonb(NEW) - 'rate_numeric' - 'purchase_rate_numeric'))
+    EXECUTE FUNCTION bridge_items_notify();
+
+UPDATE "public"."items"
+SET "rate_numeric" = bridge_parse_currency("rate"::text),
+    "purchase_rate_numeric" = bridge_parse_currency("purchase rate"::text)
+WHERE "rate_numeric" IS NULL OR "purchase_rate_numeric" IS NULL;
+
+-- Rate filters and sorting use the stored value, falling back to the string (see RATE_SQL in database_operations.py)
+CREATE INDEX IF NOT EXISTS items_rate_effective_idx
+    ON "public"."items" ((coalesce("rate_numeric", bridge_parse_currency("rate"))), "item_id");
+DROP INDEX IF EXISTS items_rate_numeric_col_idx;
@@ -0,0 +1,7 @@
+-- The change log consumer no longer uses snapshot_xmax: a statement snapshot
+-- taken before another transaction allocated a lower seq said nothing about
+-- that transaction, so gaps could be skipped while it was still running. The
+-- consumer now waits until every transaction older than its own first sight
+-- of the gap has finished (see ChangeLogReader in change_log.py).
+
+ALTER TABLE "public"."bridge_change_log" DROP COLUMN IF EXISTS "snapshot_xmax";
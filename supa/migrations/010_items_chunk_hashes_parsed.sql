@@ -0,0 +1,43 @@
+-- Chunk hashes compare rows as the bridge writes them to Supabase
+-- (row_to_parsed_item() in database_operations.py): rates parsed like
+-- parse_currency_value_py(), with 0 for missing or unparsable values, and a
+-- missing stock as 0. Migration 006 hashed the raw text, so a row stored as
+-- "4800." or "n/a" in Postgres never matched its Supabase copy.
+--
+-- Run this file in the Supabase SQL editor as well; it replaces the functions
+-- from 006 and must match canonical_line() in reconcile.py.
+
+CREATE OR REPLACE FUNCTION bridge_canonical_rate(value text)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+    SELECT round(CASE
+        -- Python's float() syntax, minus inf/nan
+        WHEN cleaned ~ '^[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]+)?$' THEN cleaned::numeric
+        ELSE 0
+    END, 2)::text
+    FROM (
+        SELECT replace(regexp_replace(btrim(coalesce(value, ''), E' \t\n\r\f\v'), '^[Rr][Ss]\.?\s*', ''), ',', '') AS cleaned
+    ) AS s;
+$$;
+
+CREATE OR REPLACE FUNCTION bridge_items_chunk_hashes(bounds bigint[])
+RETURNS TABLE ("chunk" integer, "row_count" bigint, "hash" text)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        width_bucket("item_id"::bigint, bounds) - 1,
+        count(*),
+        md5(string_agg(
+            concat_ws('|', "item_id"::bigint, coalesce("name", ''), coalesce("sku", ''),
+                      bridge_canonical_rate("rate"::text), bridge_canonical_rate("purchase rate"::text),
+                      coalesce("stock on hand"::bigint, 0)),
+            E'\n' ORDER BY "item_id"::bigint
+        ))
+    FROM "public"."items"
+    WHERE "item_id"::bigint >= bounds[1] AND "item_id"::bigint < bounds[array_length(bounds, 1)]
+    GROUP BY 1;
+$$;
@@ -0,0 +1,273 @@
+import time
+import queue
+import logging
+import threading
+
+import metrics
+from rebuild_scheduler import RebuildScheduler
+
+log = logging.getLogger(__name__)
+
+# tg_op of a marker asking a sink to re-read a key's current state (see SinkResync)
+RESYNC = "RESYNC"
+
+
+class ChangeEvent:
+    """A decoded change notification travelling through the pipeline"""
+
+    __slots__ = ("tg_op", "item_id", "payload", "item", "old_item", "received_at", "seq", "pending_sinks")
+
+    def __init__(self, tg_op, item_id, payload=None, item=None, old_item=None, received_at=None, seq=None):
+        self.tg_op = tg_op
+        self.item_id = item_id
+        self.payload = payload
+        self.item = item
+        self.old_item = old_item
+        self.received_at = received_at if received_at is not None else time.monotonic()
+        self.seq = seq  # change-log sequence number, when the event came from the log
+        self.pending_sinks = None  # set when the event is fanned out to the sinks
+
+
+class StageWorker:
+    """A bounded queue drained by one worker thread.
+
+    ``submit()`` never blocks for longer than ``put_timeout``; if the queue is
+    still full the event is dropped, counted, and handed to ``on_overflow`` so
+    the owner can schedule a resync. Lag is measured from the event's
+    ``received_at`` to the moment ``handler`` returns. ``on_done`` is called
+    once per submitted event: after the handler (even if it failed) or after
+    the event was dropped. Outcomes are counted in ``bridge_events_total``
+    under the ``pipeline`` label.
+    """
+
+    def __init__(self, name, handler, maxsize=10000, put_timeout=0.0, on_overflow=None, on_done=None,
+                 pipeline="items"):
+        self.name = name
+        self.pipeline = pipeline
+        self._handler = handler
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.put_timeout = put_timeout
+        self._on_overflow = on_overflow
+        self._on_done = on_done
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self._stats = {
+            "submitted": 0,
+            "processed": 0,
+            "errors": 0,
+            "dropped": 0,
+            "max_depth": 0,
+            "lag_total_ms": 0.0,
+            "last_lag_ms": 0.0,
+            "max_lag_ms": 0.0,
+        }
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"pipeline-{self.name}", daemon=True)
+            self._thread.start()
+
+    def submit(self, event):
+        """Enqueue ``event``; returns False if it was dropped because the queue is full"""
+        try:
+            if self.put_timeout:
+                self._queue.put(event, timeout=self.put_timeout)
+            else:
+                self._queue.put_nowait(event)
+        except queue.Full:
+            with self._lock:
+                self._stats["dropped"] += 1
+            metrics.inc("bridge_events_total", pipeline=self.pipeline, stage=self.name, outcome="dropped")
+            log.warning("Pipeline stage '%s' is full, dropped %s for item_id %s", self.name, event.tg_op, event.item_id)
+            if self._on_overflow:
+                try:
+                    self._on_overflow(event)
+                except Exception as e:
+                    log.error("Error in overflow handler of stage '%s': %s", self.name, e)
+            self._done(event)
+            return False
+
+        depth = self._queue.qsize()
+        with self._lock:
+            self._stats["submitted"] += 1
+            self._stats["max_depth"] = max(self._stats["max_depth"], depth)
+        return True
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+            try:
+                self._handler(event)
+                ok = True
+            except Exception as e:
+                log.error("Error in pipeline stage '%s' for item_id %s: %s", self.name, event.item_id, e)
+                ok = False
+            lag_ms = (time.monotonic() - event.received_at) * 1000
+            with self._lock:
+                if ok:
+                    self._stats["processed"] += 1
+                    self._stats["lag_total_ms"] += lag_ms
+                    self._stats["last_lag_ms"] = lag_ms
+                    self._stats["max_lag_ms"] = max(self._stats["max_lag_ms"], lag_ms)
+                else:
+                    self._stats["errors"] += 1
+            metrics.inc("bridge_events_total", pipeline=self.pipeline, stage=self.name,
+                        outcome="processed" if ok else "error")
+            self._done(event)
+            self._queue.task_done()
+
+    def _done(self, event):
+        if self._on_done:
+            try:
+                self._on_done(event)
+            except Exception as e:
+                log.error("Error in completion handler of stage '%s': %s", self.name, e)
+
+    def join(self):
+        """Block until everything submitted so far has been handled"""
+        self._queue.join()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["depth"] = self._queue.qsize()
+        stats["capacity"] = self._queue.maxsize
+        lag_total_ms = stats.pop("lag_total_ms")
+        stats["avg_lag_ms"] = lag_total_ms / stats["processed"] if stats["processed"] else 0.0
+        return stats
+
+
+class ChangePipeline:
+    """Staged change pipeline: listener -> resolve -> independent sink workers.
+
+    The listener only calls ``submit()``, which waits up to ``put_timeout``
+    for room in the resolve queue. A single resolve worker (so per-item order
+    is preserved) completes each event via ``resolver`` and fans it out to
+    every sink without blocking: each sink drains its own bounded queue, and
+    a full sink drops the event and calls its ``on_overflow``, so a stalled
+    sink never slows down the others. ``on_complete`` is called once for every
+    submitted event, when all sinks are done with it (or it was dropped);
+    the time since the event was received goes into ``bridge_event_lag_seconds``.
+    """
+
+    def __init__(self, resolver=None, maxsize=10000, put_timeout=0.0, on_overflow=None, on_complete=None,
+                 name="items"):
+        self.name = name
+        self._resolver = resolver
+        self._maxsize = maxsize
+        self._sinks = []
+        self._on_complete = on_complete
+        self._lock = threading.Lock()
+        self._resolve = StageWorker("resolve", self._resolve_and_dispatch, maxsize=maxsize, put_timeout=put_timeout,
+                                    on_overflow=on_overflow, on_done=self._resolve_done, pipeline=name)
+
+    def add_sink(self, name, handler, maxsize=None, on_overflow=None):
+        sink = StageWorker(
+            name,
+            handler,
+            maxsize=self._maxsize if maxsize is None else maxsize,
+            on_overflow=on_overflow,
+            on_done=self._sink_done,
+            pipeline=self.name,
+        )
+        self._sinks.append(sink)
+        return sink
+
+    def start(self):
+        for sink in self._sinks:
+            sink.start()
+        self._resolve.start()
+        return self
+
+    def submit(self, event):
+        """Hand a decoded event to the pipeline (called from the listener)"""
+        return self._resolve.submit(event)
+
+    def submit_to_sink(self, name, event):
+        """Queue ``event`` on one sink only, behind what it already holds (no completion tracking)"""
+        for sink in self._sinks:
+            if sink.name == name:
+                return sink.submit(event)
+        raise KeyError(name)
+
+    def _resolve_and_dispatch(self, event):
+        if self._resolver:
+            resolved = self._resolver(event)
+            if resolved is None:
+                return
+            event = resolved
+        with self._lock:
+            event.pending_sinks = len(self._sinks)
+        if not self._sinks:
+            self._complete(event)
+        for sink in self._sinks:
+            sink.submit(event)
+
+    def _complete(self, event):
+        metrics.observe("bridge_event_lag_seconds", time.monotonic() - event.received_at, pipeline=self.name)
+        if self._on_complete:
+            self._on_complete(event)
+
+    def _resolve_done(self, event):
+        # Not fanned out (filtered, failed or dropped before resolving): complete it here
+        if event.pending_sinks is None:
+            self._complete(event)
+
+    def _sink_done(self, event):
+        if event.pending_sinks is None:
+            return  # queued straight on this sink by submit_to_sink()
+        with self._lock:
+            event.pending_sinks -= 1
+            finished = event.pending_sinks == 0
+        if finished:
+            self._complete(event)
+
+    def join(self):
+        """Block until every stage has drained what was submitted so far"""
+        self._resolve.join()
+        for sink in self._sinks:
+            sink.join()
+
+    def stats(self):
+        stages = {"resolve": self._resolve.stats()}
+        for sink in self._sinks:
+            stages[sink.name] = sink.stats()
+        return stages
+
+
+class SinkResync:
+    """Re-sends the changes a sink dropped, without reordering them.
+
+    Use ``mark`` as the sink's ``on_overflow``: it remembers the key of the
+    dropped (newest) change. A scheduler then queues a ``RESYNC`` marker for
+    each remembered key on the same sink, behind everything it still holds
+    for that key; the sink handler reads the key's current state when it
+    reaches the marker. Markers that do not fit are remembered again.
+    """
+
+    def __init__(self, sink_name, pipeline_for, window=1.0, name="sink-resync"):
+        self.sink_name = sink_name
+        self._pipeline_for = pipeline_for  # key -> the ChangePipeline owning it
+        self._lock = threading.Lock()
+        self._keys = set()
+        self.scheduler = RebuildScheduler(self._submit_markers, window=window, min_interval=window,
+                                          max_delay=window * 5, name=name)
+
+    def mark(self, event):
+        if event.item_id is None:
+            return
+        with self._lock:
+            self._keys.add(event.item_id)
+        self.scheduler.notify()
+
+    def _submit_markers(self):
+        with self._lock:
+            keys, self._keys = self._keys, set()
+        for key in keys:
+            # A full sink calls mark() again, which schedules another attempt
+            self._pipeline_for(key).submit_to_sink(self.sink_name, ChangeEvent(RESYNC, key))
+
+    def pending(self):
+        with self._lock:
+            return len(self._keys)
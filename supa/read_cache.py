@@ -0,0 +1,92 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class ReadThroughCache:
+    """Bounded in-process LRU cache with a per-entry TTL.
+
+    Entries are dropped explicitly with ``invalidate()`` (driven by change
+    notifications and local writes), when they expire, or when the cache is
+    full and they are the least recently used. ``stamp()``/``put(..., stamp)``
+    guard against a slow read re-inserting a row that was invalidated while
+    it was being fetched.
+    """
+
+    def __init__(self, maxsize=10000, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._invalidations = 0
+
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+            "stale_puts": 0,
+        }
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    def get(self, key):
+        """Return the cached value, or None on a miss or expired entry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def stamp(self):
+        """Take before reading from the source; pass to ``put()``"""
+        with self._lock:
+            return self._invalidations
+
+    def put(self, key, value, stamp=None):
+        """Store ``value``, unless an invalidation happened since ``stamp`` was taken"""
+        if not self.enabled:
+            return False
+        with self._lock:
+            if stamp is not None and stamp != self._invalidations:
+                self._stats["stale_puts"] += 1
+                return False
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+            return True
+
+    def invalidate(self, key):
+        with self._lock:
+            self._invalidations += 1
+            if self._entries.pop(key, None) is not None:
+                self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._invalidations += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+            stats["maxsize"] = self.maxsize
+            stats["ttl"] = self.ttl
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,141 @@
+import time
+import threading
+import logging
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+
+class RebuildScheduler:
+    """Coalesces change notifications into rate-limited cache rebuilds.
+
+    ``notify()`` is cheap and never blocks on the rebuild. A background thread
+    waits until no new event has arrived for ``window`` seconds (or until
+    ``max_delay`` has passed since the first pending event, so a steady stream
+    of changes cannot starve the cache), and never starts two rebuilds less
+    than ``min_interval`` seconds apart. Any event that arrives while a rebuild
+    is running schedules a trailing rebuild afterwards.
+    """
+
+    def __init__(self, rebuild_fn, window=0.5, min_interval=2.0, max_delay=10.0, name="cache-rebuild"):
+        self._rebuild_fn = rebuild_fn
+        self.window = window
+        self.min_interval = min_interval
+        self.max_delay = max(max_delay, window)
+        self.name = name
+
+        self._cond = threading.Condition()
+        self._pending = 0
+        self._first_event_at = None
+        self._last_event_at = None
+        self._last_rebuild_at = None
+        self._stopped = False
+        self._thread = None
+
+        self._stats = {
+            "events": 0,
+            "rebuilds": 0,
+            "failed_rebuilds": 0,
+            "last_folded": 0,
+            "max_folded": 0,
+            "last_duration_ms": 0.0,
+        }
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def notify(self, count=1):
+        """Record that ``count`` changes happened and a rebuild is needed"""
+        now = time.monotonic()
+        with self._cond:
+            if self._stopped:
+                return
+            if self._pending == 0:
+                self._first_event_at = now
+            self._pending += count
+            self._last_event_at = now
+            self._stats["events"] += count
+            self._ensure_thread()
+            self._cond.notify()
+
+    def _next_due(self):
+        """Monotonic time at which the pending batch may be rebuilt"""
+        due = min(self._last_event_at + self.window, self._first_event_at + self.max_delay)
+        if self._last_rebuild_at is not None:
+            due = max(due, self._last_rebuild_at + self.min_interval)
+        return due
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if self._pending:
+                        remaining = self._next_due() - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                if self._stopped:
+                    return
+                folded = self._pending
+                self._pending = 0
+                self._first_event_at = None
+                self._last_rebuild_at = time.monotonic()
+
+            self._rebuild(folded)
+
+    def _rebuild(self, folded):
+        start = time.monotonic()
+        try:
+            self._rebuild_fn()
+            ok = True
+        except Exception as e:
+            log.error("Error during scheduled rebuild (%s): %s", self.name, e)
+            ok = False
+        duration = time.monotonic() - start
+        duration_ms = duration * 1000
+        metrics.observe("bridge_rebuild_duration_seconds", duration, name=self.name, outcome="ok" if ok else "error")
+        metrics.inc("bridge_rebuild_folded_events_total", folded, name=self.name)
+
+        with self._cond:
+            if ok:
+                self._stats["rebuilds"] += 1
+            else:
+                self._stats["failed_rebuilds"] += 1
+            self._stats["last_folded"] = folded
+            self._stats["max_folded"] = max(self._stats["max_folded"], folded)
+            self._stats["last_duration_ms"] = duration_ms
+        log.debug("Rebuild '%s' folded %d event(s) in %.1f ms.", self.name, folded, duration_ms)
+
+    def flush(self):
+        """Run any pending rebuild immediately on the calling thread"""
+        with self._cond:
+            folded = self._pending
+            self._pending = 0
+            self._first_event_at = None
+            self._last_rebuild_at = time.monotonic()
+        if folded:
+            self._rebuild(folded)
+
+    def stop(self, flush=True):
+        """Stop the background thread, optionally running a final trailing rebuild"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        if flush:
+            self.flush()
+
+    def stats(self):
+        """Snapshot of scheduler counters"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats["pending"] = self._pending
+            attempts = stats["rebuilds"] + stats["failed_rebuilds"]
+            stats["avg_folded"] = (stats["events"] - self._pending) / attempts if attempts else 0.0
+            return stats
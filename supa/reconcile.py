@@ -0,0 +1,289 @@
+import time
+import hashlib
+import argparse
+import threading
+from bisect import bisect_right
+from decimal import Decimal, ROUND_HALF_UP
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import database_operations as db
+
+MIN_ID = -2 ** 63
+MAX_ID = 2 ** 63 - 1
+
+# First item_id of every chunk of ``chunk_size`` rows (one pass over the primary key index)
+CHUNK_STARTS_SQL = '''
+SELECT "item_id" FROM (
+    SELECT "item_id", row_number() OVER (ORDER BY "item_id") AS rn FROM "public"."items"
+) AS s
+WHERE (rn - 1) %% %s = 0
+ORDER BY "item_id";
+'''
+CHUNK_HASHES_SQL = 'SELECT "chunk", "row_count", "hash" FROM bridge_items_chunk_hashes(%s::bigint[]);'
+CHUNK_HASHES_RPC = "bridge_items_chunk_hashes"
+SUPABASE_PAGE_SIZE = 1000
+
+_CENTS = Decimal("0.01")
+
+
+def canonical_rate(value):
+    """An already parsed rate normalized to two decimals, as bridge_canonical_rate() in migrations/010_items_chunk_hashes_parsed.sql"""
+    number = Decimal(repr(float(value)))
+    if not number.is_finite():
+        return str(number)
+    number = number.quantize(_CENTS, rounding=ROUND_HALF_UP)
+    return str(abs(number) if number == 0 else number)
+
+
+def canonical_line(row):
+    """Hash input for an ``(item_id, name, sku, rate, purchase rate, stock on hand)`` row.
+
+    Both sides are hashed as ``row_to_parsed_item()`` output, which is what
+    the bridge writes to Supabase: missing names/SKUs become "", missing or
+    unparsable rates 0 and a missing stock 0.
+    """
+    item = db.row_to_parsed_item(row)
+    return "|".join((
+        str(int(item["item_id"])),
+        str(item["name"]),
+        str(item["sku"]),
+        canonical_rate(item["rate"]),
+        canonical_rate(item["purchase rate"]),
+        str(item["stock on hand"]),
+    ))
+
+
+def hash_rows(rows):
+    """Chunk hash over rows sorted by item_id, as computed by bridge_items_chunk_hashes()"""
+    return hashlib.md5("\n".join(canonical_line(row) for row in rows).encode()).hexdigest()
+
+
+class ChunkSource:
+    """One side of the comparison: per-chunk hashes and the rows of a chunk.
+
+    Hashes come from bridge_items_chunk_hashes() when the side has it;
+    otherwise the rows are fetched and hashed locally.
+    """
+
+    name = None
+
+    def __init__(self):
+        self.server_hashes = None  # unknown until the first call
+
+    def chunk_hashes(self, bounds):
+        """``{chunk: (row_count, hash)}`` for the chunks ``[bounds[i], bounds[i + 1])``"""
+        if self.server_hashes is not False:
+            try:
+                hashes = self._server_chunk_hashes(bounds)
+                self.server_hashes = True
+                return hashes
+            except Exception as e:
+                if self.server_hashes:
+                    raise
+                self.server_hashes = False
+                print(f"Reconcile: {self.name} has no {CHUNK_HASHES_RPC}() ({e}); hashing fetched rows instead.")
+        rows = self.fetch(bounds[0], bounds[-1])
+        chunks = {}
+        for item_id in sorted(rows):
+            chunks.setdefault(bisect_right(bounds, item_id) - 1, []).append(rows[item_id])
+        return {chunk: (len(chunk_rows), hash_rows(chunk_rows)) for chunk, chunk_rows in chunks.items()}
+
+    def _server_chunk_hashes(self, bounds):
+        raise NotImplementedError
+
+    def fetch(self, lo, hi):
+        """``{item_id: row}`` for lo <= item_id < hi"""
+        raise NotImplementedError
+
+
+class PostgresSource(ChunkSource):
+    name = "postgres"
+
+    def __init__(self, pool):
+        super().__init__()
+        self.pool = pool
+
+    def chunk_starts(self, chunk_size):
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(CHUNK_STARTS_SQL, (chunk_size,))
+                return [row[0] for row in cur.fetchall()]
+
+    def _server_chunk_hashes(self, bounds):
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(CHUNK_HASHES_SQL, (bounds,))
+                return {chunk: (count, digest) for chunk, count, digest in cur.fetchall()}
+
+    def fetch(self, lo, hi):
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(db.ITEM_SELECT_SQL + ' WHERE "item_id" >= %s AND "item_id" < %s ORDER BY "item_id";', (lo, hi))
+                return {int(row[0]): row for row in cur.fetchall()}
+
+
+class SupabaseSource(ChunkSource):
+    name = "supabase"
+
+    def __init__(self, client, table):
+        super().__init__()
+        self.client = client
+        self.table = table
+
+    def _server_chunk_hashes(self, bounds):
+        response = self.client.rpc(CHUNK_HASHES_RPC, {"bounds": bounds}).execute()
+        return {row["chunk"]: (row["row_count"], row["hash"]) for row in response.data or []}
+
+    def fetch(self, lo, hi):
+        rows = {}
+        start = 0
+        while True:
+            response = (self.client.table(self.table).select("*")
+                        .gte("item_id", lo).lt("item_id", hi).order("item_id")
+                        .range(start, start + SUPABASE_PAGE_SIZE - 1).execute())
+            page = response.data or []
+            for row in page:
+                item_id = int(row["item_id"])
+                rows[item_id] = (item_id, row.get("name"), row.get("sku"), row.get("rate"),
+                                 row.get("purchase rate"), row.get("stock on hand"))
+            if len(page) < SUPABASE_PAGE_SIZE:
+                return rows
+            start += SUPABASE_PAGE_SIZE
+
+
+class Reconciler:
+    """Compares Postgres and Supabase chunk by chunk and repairs the chunks that differ.
+
+    The items are split into chunks of ``chunk_size`` rows by item_id (the
+    last chunk is open-ended, the first reaches down to the smallest id, so
+    rows that only exist in Supabase fall into a chunk too). ``workers``
+    threads each take ``slice_chunks`` chunks at a time: hash them on both
+    sides, then pull and diff only the chunks whose hashes differ, upserting
+    missing or changed rows and deleting rows Postgres no longer has.
+
+    Changes made while a chunk is being repaired can be overwritten by the
+    repair; a following pass (``passes``) catches them.
+    """
+
+    def __init__(self, postgres, supabase, syncer, chunk_size=10000, workers=8, slice_chunks=20, dry_run=False):
+        self.postgres = postgres
+        self.supabase = supabase
+        self.syncer = syncer
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.slice_chunks = slice_chunks
+        self.dry_run = dry_run
+
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _count(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                self._stats[name] += value
+
+    def bounds(self):
+        starts = self.postgres.chunk_starts(self.chunk_size)
+        return [MIN_ID] + starts[1:] + [MAX_ID]
+
+    def run(self, passes=2, report_interval=5.0):
+        """Reconcile until a pass finds no differences (at most ``passes`` passes). Returns the last pass's stats"""
+        for number in range(1, passes + 1):
+            stats = self.run_pass(number, report_interval)
+            if not stats["differing_chunks"] or self.dry_run:
+                break
+        return stats
+
+    def run_pass(self, number=1, report_interval=5.0):
+        bounds = self.bounds()
+        slices = [bounds[i:i + self.slice_chunks + 1] for i in range(0, len(bounds) - 1, self.slice_chunks)]
+        self._stats = {
+            "chunks": len(bounds) - 1,
+            "chunks_compared": 0,
+            "differing_chunks": 0,
+            "rows_compared": 0,
+            "rows_upserted": 0,
+            "rows_deleted": 0,
+            "failed_slices": 0,
+        }
+        print(f"Reconcile pass {number}: {self._stats['chunks']} chunk(s) of up to {self.chunk_size} rows, "
+              f"{self.workers} worker(s){' (dry run)' if self.dry_run else ''}.")
+
+        start = time.monotonic()
+        done = threading.Event()
+        reporter = threading.Thread(target=self._report, args=(start, done, report_interval), daemon=True)
+        reporter.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="reconcile") as executor:
+                futures = [executor.submit(self.reconcile_slice, bounds_slice) for bounds_slice in slices]
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        self._count(failed_slices=1)
+                        print(f"Error reconciling a slice of chunks: {e}")
+        finally:
+            done.set()
+            reporter.join()
+
+        elapsed = time.monotonic() - start
+        stats = dict(self._stats, elapsed_s=round(elapsed, 2),
+                     rows_per_sec=round(self._stats["rows_compared"] / elapsed, 1) if elapsed else 0.0)
+        print(f"Reconcile pass {number} complete in {elapsed:.1f}s: {stats['rows_compared']} rows compared "
+              f"({stats['rows_per_sec']:.0f}/s), {stats['differing_chunks']} differing chunk(s), "
+              f"{stats['rows_upserted']} upserted, {stats['rows_deleted']} deleted, {stats['failed_slices']} failed slice(s).")
+        return stats
+
+    def reconcile_slice(self, bounds):
+        ours = self.postgres.chunk_hashes(bounds)
+        theirs = self.supabase.chunk_hashes(bounds)
+        differing = [chunk for chunk in range(len(bounds) - 1) if ours.get(chunk) != theirs.get(chunk)]
+        for chunk in differing:
+            self.repair_chunk(bounds[chunk], bounds[chunk + 1])
+        self._count(chunks_compared=len(bounds) - 1, differing_chunks=len(differing),
+                    rows_compared=sum(count for count, _ in ours.values()))
+
+    def repair_chunk(self, lo, hi):
+        """Pull one chunk from both sides and push the rows that differ"""
+        ours = self.postgres.fetch(lo, hi)
+        theirs = self.supabase.fetch(lo, hi)
+        upserts = [db.row_to_parsed_item(row) for item_id, row in ours.items()
+                   if item_id not in theirs or canonical_line(row) != canonical_line(theirs[item_id])]
+        deletes = [item_id for item_id in theirs if item_id not in ours]
+        if self.dry_run:
+            print(f"Reconcile: item_id [{lo}, {hi}) would upsert {len(upserts)} and delete {len(deletes)} row(s).")
+            self._count(rows_upserted=len(upserts), rows_deleted=len(deletes))
+            return
+        # This thread is already one of the reconcile workers: send the chunk's batches serially
+        upserted = self.syncer.sync_all(upserts) if upserts else 0
+        deleted = self.syncer.delete_all(deletes) if deletes else 0
+        self._count(rows_upserted=upserted, rows_deleted=deleted)
+
+    def _report(self, start, done, interval):
+        while not done.wait(interval):
+            with self._lock:
+                stats = dict(self._stats)
+            elapsed = time.monotonic() - start
+            print(f"Reconcile: {stats['chunks_compared']}/{stats['chunks']} chunks, "
+                  f"{stats['rows_compared']} rows compared ({stats['rows_compared'] / elapsed:.0f}/s), "
+                  f"{stats['differing_chunks']} differing, {stats['rows_upserted']} upserted, {stats['rows_deleted']} deleted...")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare Postgres and Supabase items chunk by chunk and repair drift")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Rows per compared chunk")
+    parser.add_argument("--workers", type=int, default=db.SUPABASE_SYNC_WORKERS * 2)
+    parser.add_argument("--slice-chunks", type=int, default=20, help="Chunks hashed per round trip")
+    parser.add_argument("--passes", type=int, default=2, help="Repeat while differences are found, at most this often")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be repaired")
+    args = parser.parse_args()
+    reconciler = Reconciler(
+        PostgresSource(db.pg_pool),
+        SupabaseSource(db.supabase, db.ITEMS_TABLE.supabase_table),
+        db.supabase_syncer,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        slice_chunks=args.slice_chunks,
+        dry_run=args.dry_run,
+    )
+    reconciler.run(passes=args.passes)
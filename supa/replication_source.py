@@ -0,0 +1,341 @@
+import time
+import select
+import struct
+import logging
+from datetime import datetime
+
+import psycopg2
+import psycopg2.errors
+import psycopg2.extras
+
+import serialization
+from change_log import ChangeLogProgress
+from pipeline import ChangeEvent
+
+log = logging.getLogger(__name__)
+
+# pgoutput timestamps are microseconds since 2000-01-01 UTC
+PG_EPOCH = 946684800
+
+# Type OIDs whose text output is converted to Python values
+INT_TYPES = {20, 21, 23, 26}
+FLOAT_TYPES = {700, 701}
+JSON_TYPES = {114, 3802}
+BOOL_TYPE = 16
+
+_MISSING = object()  # unchanged TOAST value: not sent by the server
+
+
+def _convert(type_oid, text):
+    if type_oid in INT_TYPES:
+        return int(text)
+    if type_oid in FLOAT_TYPES:
+        return float(text)
+    if type_oid in JSON_TYPES:
+        return serialization.loads(text)
+    if type_oid == BOOL_TYPE:
+        return text == 't'
+    return text
+
+
+class _Reader:
+    """Sequential reader over a binary replication message"""
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def unpack(self, fmt):
+        values = struct.unpack_from(fmt, self.data, self.pos)
+        self.pos += struct.calcsize(fmt)
+        return values if len(values) > 1 else values[0]
+
+    def byte(self):
+        value = self.data[self.pos:self.pos + 1]
+        self.pos += 1
+        return value
+
+    def string(self):
+        end = self.data.index(b'\0', self.pos)
+        value = self.data[self.pos:end].decode()
+        self.pos = end + 1
+        return value
+
+    def raw(self, length):
+        value = self.data[self.pos:self.pos + length]
+        self.pos += length
+        return value
+
+
+class PgOutputDecoder:
+    """Decodes pgoutput (protocol version 1) messages.
+
+    ``decode()`` returns one of ``("BEGIN", commit_time)``, ``("COMMIT",
+    end_lsn)``, ``(op, table, new_row, old_row)`` for INSERT/UPDATE/DELETE,
+    or None for messages the bridge does not need (types, origins, truncates).
+    """
+
+    plugin = "pgoutput"
+
+    def __init__(self, publication):
+        self.publication = publication
+        self.relations = {}  # oid -> (table, [(name, type_oid)])
+
+    def options(self):
+        return {"proto_version": "1", "publication_names": self.publication}
+
+    def decode(self, data):
+        reader = _Reader(bytes(data))
+        kind = reader.byte()
+        if kind == b'B':
+            _final_lsn, commit_ts, _xid = reader.unpack("!qqi")
+            return ("BEGIN", PG_EPOCH + commit_ts / 1e6)
+        if kind == b'C':
+            _flags, _commit_lsn, end_lsn, _commit_ts = reader.unpack("!bqqq")
+            return ("COMMIT", end_lsn)
+        if kind == b'R':
+            oid = reader.unpack("!i")
+            namespace = reader.string()
+            name = reader.string()
+            _identity, ncols = reader.unpack("!bh")
+            columns = []
+            for _ in range(ncols):
+                reader.unpack("!b")  # column flags
+                column = reader.string()
+                type_oid, _typmod = reader.unpack("!ii")
+                columns.append((column, type_oid))
+            self.relations[oid] = (f"{namespace}.{name}", columns)
+            return None
+        if kind in (b'I', b'U', b'D'):
+            oid = reader.unpack("!i")
+            table, columns = self.relations[oid]
+            old_row = new_row = None
+            marker = reader.byte()
+            if marker in (b'K', b'O'):
+                old_row = self._tuple(reader, columns)
+                marker = reader.byte() if kind == b'U' else None
+            if marker == b'N':
+                new_row = self._tuple(reader, columns)
+            op = {b'I': "INSERT", b'U': "UPDATE", b'D': "DELETE"}[kind]
+            return (op, table, new_row, old_row)
+        return None
+
+    @staticmethod
+    def _tuple(reader, columns):
+        row = {}
+        ncols = reader.unpack("!h")
+        for name, type_oid in columns[:ncols]:
+            kind = reader.byte()
+            if kind == b'n':
+                row[name] = None
+            elif kind == b'u':
+                row[name] = _MISSING
+            else:
+                row[name] = _convert(type_oid, reader.raw(reader.unpack("!i")).decode())
+        return row
+
+
+class Wal2JsonDecoder:
+    """Decodes wal2json (format version 2) messages into the same shapes as ``PgOutputDecoder``"""
+
+    plugin = "wal2json"
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    def options(self):
+        return {"format-version": "2", "include-timestamp": "1", "add-tables": ",".join(self.tables)}
+
+    def decode(self, data):
+        message = serialization.loads(data)
+        action = message.get("action")
+        if action == "B":
+            return ("BEGIN", self._timestamp(message.get("timestamp")))
+        if action == "C":
+            return ("COMMIT", None)
+        if action in ("I", "U", "D"):
+            table = f"{message['schema']}.{message['table']}"
+            new_row = {c["name"]: c["value"] for c in message.get("columns", [])} if action != "D" else None
+            old_row = {c["name"]: c["value"] for c in message.get("identity", [])} if action != "I" else None
+            return ({"I": "INSERT", "U": "UPDATE", "D": "DELETE"}[action], table, new_row, old_row)
+        return None
+
+    @staticmethod
+    def _timestamp(value):
+        if not value:
+            return None
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            return None
+
+
+class LogicalReplicationSource:
+    """Change source that streams decoded changes from a logical replication slot.
+
+    Changes arrive in commit order, whole transactions at a time, and are
+    handed to ``submit`` as ``ChangeEvent`` objects numbered with a local
+    sequence. The slot's flushed LSN is only acknowledged once every event
+    of a transaction has been processed (``progress``) and, when a buffering
+    ``sink`` is given, once it has sent everything it held at that point
+    (its non-blocking ``mark()``/``sent(mark)``), so after a crash the
+    server resends anything that was not fully applied.
+    """
+
+    def __init__(self, connect_params, submit, tables=("public.items",), key_column="item_id",
+                 slot_name="bridge_items", plugin="pgoutput", publication="bridge_items",
+                 feedback_interval=5.0, max_in_flight=5000, sink=None):
+        self.connect_params = connect_params
+        self.submit = submit
+        self.tables = tuple(tables)
+        self.key_column = key_column
+        self.slot_name = slot_name
+        self.publication = publication
+        self.feedback_interval = feedback_interval
+        self.max_in_flight = max_in_flight
+        self.sink = sink
+        if plugin == "wal2json":
+            self.decoder = Wal2JsonDecoder(self.tables)
+        else:
+            self.decoder = PgOutputDecoder(publication)
+
+        self.progress = ChangeLogProgress()
+        self._seq = 0
+        self._pending_commits = []  # [(last seq of the transaction, end lsn)] not yet acknowledged
+        self._held = None  # (last seq, end lsn, sink mark) waiting for the sink to send
+        self._txn = []
+        self._txn_time = None
+
+        self._stats = {
+            "plugin": self.decoder.plugin,
+            "slot": slot_name,
+            "transactions": 0,
+            "changes": 0,
+            "received_lsn": 0,
+            "flushed_lsn": 0,
+            "feedback_skipped": 0,
+        }
+
+    # Setup
+    def ensure_slot(self, cur):
+        """Create the publication (pgoutput) and the replication slot if they do not exist yet"""
+        if self.decoder.plugin == "pgoutput":
+            conn = psycopg2.connect(**self.connect_params)
+            try:
+                with conn, conn.cursor() as setup:
+                    setup.execute("SELECT 1 FROM pg_publication WHERE pubname = %s;", (self.publication,))
+                    if setup.fetchone() is None:
+                        tables = ", ".join(self.tables)
+                        setup.execute(f'CREATE PUBLICATION "{self.publication}" FOR TABLE {tables};')
+                        log.info("Replication: created publication '%s' for %s.", self.publication, tables)
+            finally:
+                conn.close()
+        try:
+            cur.create_replication_slot(self.slot_name, output_plugin=self.decoder.plugin)
+            log.info("Replication: created slot '%s' (%s).", self.slot_name, self.decoder.plugin)
+        except psycopg2.errors.DuplicateObject:
+            pass
+
+    # Streaming
+    def run(self):
+        """Stream changes until the connection fails"""
+        conn = psycopg2.connect(connection_factory=psycopg2.extras.LogicalReplicationConnection, **self.connect_params)
+        cur = conn.cursor()
+        try:
+            self.ensure_slot(cur)
+            # Transactions that were submitted but never acknowledged are resent by the server
+            self.progress.reset(self._seq)
+            self._pending_commits = []
+            self._held = None
+            self._txn = []
+            cur.start_replication(slot_name=self.slot_name, decode=False, options=self.decoder.options())
+            log.info("Replication: streaming changes from slot '%s'...", self.slot_name)
+
+            last_feedback = time.monotonic()
+            while True:
+                if self.progress.in_flight >= self.max_in_flight:
+                    # Leave messages unread (the socket stays readable) until the sinks catch up
+                    self.progress.wait_below(self.max_in_flight, timeout=1.0)
+                    message = None
+                else:
+                    message = cur.read_message()
+                    if message is not None:
+                        self._handle(message)
+                    else:
+                        select.select([cur], [], [], 0.05 if self.progress.in_flight else 1.0)
+                if time.monotonic() - last_feedback >= self.feedback_interval:
+                    self.send_feedback(cur)
+                    last_feedback = time.monotonic()
+        finally:
+            cur.close()
+            conn.close()
+            log.info("Replication: Stopped.")
+
+    def _handle(self, message):
+        self._stats["received_lsn"] = message.data_start
+        decoded = self.decoder.decode(message.payload)
+        if decoded is None:
+            return
+        if decoded[0] == "BEGIN":
+            self._txn = []
+            self._txn_time = decoded[1]
+        elif decoded[0] == "COMMIT":
+            self._commit(decoded[1] or message.data_start)
+        else:
+            op, table, new_row, old_row = decoded
+            if table in self.tables:
+                self._txn.append((op, table, new_row, old_row))
+
+    def _commit(self, end_lsn):
+        """Submit a finished transaction's changes in order and remember its LSN for acknowledgement"""
+        received_at = time.monotonic()
+        for op, table, new_row, old_row in self._txn:
+            key = (new_row or old_row or {}).get(self.key_column)
+            if new_row is not None and any(value is _MISSING for value in new_row.values()):
+                new_row = None  # unchanged TOAST columns: let the resolver read the row instead
+            if old_row is not None:
+                old_row = {k: v for k, v in old_row.items() if v is not _MISSING}
+            self._seq += 1
+            event = ChangeEvent(op, key, received_at=received_at, seq=self._seq, payload={
+                "TG_OP": op, self.key_column: key, "table": table, "new": new_row, "old": old_row,
+                "lsn": end_lsn, "created_at": self._txn_time,
+            })
+            self.progress.started(self._seq)
+            self.submit(event)
+            self._stats["changes"] += 1
+        self._pending_commits.append((self._seq, end_lsn))
+        self._stats["transactions"] += 1
+        self._txn = []
+
+    def send_feedback(self, cur):
+        """Acknowledge the LSN of every transaction whose changes have all been applied (and sent by ``sink``)"""
+        position = self.progress.position
+        ready = None
+        for last_seq, end_lsn in self._pending_commits:
+            if last_seq > position:
+                break
+            ready = (last_seq, end_lsn)
+        if self.sink is not None:
+            # Hold the LSN until the sink has sent everything it had been handed by now
+            if self._held is None and ready is not None:
+                self._held = ready + (self.sink.mark(),)
+            ready = None
+            if self._held is not None:
+                if self.sink.sent(self._held[2]):
+                    ready, self._held = self._held[:2], None
+                else:
+                    self._stats["feedback_skipped"] += 1
+        if ready is None:
+            cur.send_feedback()  # keepalive only
+            return
+        last_seq, ack_lsn = ready
+        while self._pending_commits and self._pending_commits[0][0] <= last_seq:
+            self._pending_commits.pop(0)
+        cur.send_feedback(flush_lsn=ack_lsn)
+        self._stats["flushed_lsn"] = ack_lsn
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats.update(self.progress.stats())
+        stats["unacknowledged_transactions"] = len(self._pending_commits)
+        return stats
@@ -0,0 +1,166 @@
+import os
+import json
+import uuid
+import logging
+import datetime
+import decimal
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional dependency, the stdlib encoder is used instead
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # Optional dependency
+    msgspec = None
+
+log = logging.getLogger(__name__)
+
+# Item fields in the order of row_to_item() / the Redis cache shape
+ITEM_FIELDS = ("item_id", "name", "sku", "rate", "purchase rate", "stock on hand")
+
+
+def _default(obj):
+    """Types the bridge produces that JSON has no native form for"""
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, (datetime.date, datetime.datetime)):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _pick_backend(name):
+    available = {"orjson": orjson is not None, "msgspec": msgspec is not None, "stdlib": True}
+    if name in available and available[name]:
+        return name
+    if name not in ("auto", "") and name not in available:
+        log.warning("Unknown JSON_BACKEND '%s'; choosing automatically.", name)
+    elif name not in ("auto", ""):
+        log.warning("JSON_BACKEND '%s' is not installed; choosing automatically.", name)
+    return "orjson" if available["orjson"] else "msgspec" if available["msgspec"] else "stdlib"
+
+
+# orjson, msgspec or stdlib (JSON_BACKEND=auto picks the fastest one installed). Every backend provides
+# dumps() -> str, dumps_bytes() -> UTF-8 bytes, dumps_sorted() (stable row digests) and loads(str or bytes),
+# all producing compact JSON; invalid input makes loads() raise ValueError.
+BACKEND = _pick_backend(os.getenv("JSON_BACKEND", "auto").lower())
+
+if BACKEND == "orjson":
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+    _SORTED_OPTIONS = _OPTIONS | orjson.OPT_SORT_KEYS
+
+    def dumps_bytes(obj):
+        return orjson.dumps(obj, default=_default, option=_OPTIONS)
+
+    def dumps(obj):
+        return orjson.dumps(obj, default=_default, option=_OPTIONS).decode()
+
+    def dumps_sorted(obj):
+        return orjson.dumps(obj, default=_default, option=_SORTED_OPTIONS).decode()
+
+    loads = orjson.loads
+
+elif BACKEND == "msgspec":
+    _encoder = msgspec.json.Encoder(enc_hook=_default)
+    _sorted_encoder = msgspec.json.Encoder(enc_hook=_default, order="sorted")
+    _decoder = msgspec.json.Decoder()
+
+    def dumps_bytes(obj):
+        return _encoder.encode(obj)
+
+    def dumps(obj):
+        return _encoder.encode(obj).decode()
+
+    def dumps_sorted(obj):
+        return _sorted_encoder.encode(obj).decode()
+
+    def loads(data):
+        try:
+            return _decoder.decode(data)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+
+else:
+    _stdlib_encoder = json.JSONEncoder(default=_default, separators=(",", ":"))
+    _stdlib_sorted_encoder = json.JSONEncoder(default=_default, separators=(",", ":"), sort_keys=True)
+
+    def dumps_bytes(obj):
+        return _stdlib_encoder.encode(obj).encode()
+
+    def dumps(obj):
+        return _stdlib_encoder.encode(obj)
+
+    def dumps_sorted(obj):
+        return _stdlib_sorted_encoder.encode(obj)
+
+    loads = json.loads
+
+
+# Typed item rows: with msgspec, items are encoded straight from a struct instead of an intermediate dict
+if msgspec is not None:
+    class ItemStruct(msgspec.Struct, rename={"purchase_rate": "purchase rate", "stock_on_hand": "stock on hand"}):
+        item_id: Any
+        name: Any
+        sku: Any
+        rate: Any
+        purchase_rate: Any
+        stock_on_hand: Any
+
+    _item_encoder = msgspec.json.Encoder(enc_hook=_default)
+
+    def encode_item(item_id, name, sku, rate, purchase_rate, stock_on_hand):
+        """JSON of one item in the API/cache shape"""
+        return _item_encoder.encode(ItemStruct(item_id, name, sku, rate, purchase_rate, stock_on_hand)).decode()
+else:
+    ItemStruct = None
+
+    def encode_item(item_id, name, sku, rate, purchase_rate, stock_on_hand):
+        """JSON of one item in the API/cache shape"""
+        return dumps(dict(zip(ITEM_FIELDS, (item_id, name, sku, rate, purchase_rate, stock_on_hand))))
+
+
+def join_array(encoded):
+    """A JSON array from already encoded elements"""
+    return "[" + ",".join(encoded) + "]"
+
+
+class SocketIOJSON:
+    """``json`` module stand-in for python-socketio packets"""
+
+    @staticmethod
+    def dumps(obj, *args, **kwargs):
+        return dumps(obj)
+
+    @staticmethod
+    def loads(data, *args, **kwargs):
+        return loads(data)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider (``jsonify``, ``request.get_json``) on the configured backend.
+
+    Keys are not sorted (Flask's default sorts them). With orjson, dates are
+    still sent as HTTP dates like the default provider does; indented output
+    falls back to the stdlib encoder.
+    """
+
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        if kwargs.get("indent") is not None or kwargs.get("sort_keys"):
+            return super().dumps(obj, **kwargs)
+        if BACKEND == "orjson":
+            return orjson.dumps(obj, default=DefaultJSONProvider.default,
+                                option=_OPTIONS | orjson.OPT_PASSTHROUGH_DATETIME).decode()
+        if BACKEND == "stdlib":
+            return super().dumps(obj, **kwargs)
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return loads(s)
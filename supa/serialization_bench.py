@@ -0,0 +1,115 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+
+from benchmark import git_revision
+
+BACKENDS = ("stdlib", "orjson", "msgspec")
+
+
+def make_rows(count, seed=1):
+    """Snapshot-shaped rows: (item_id, name, sku, rate, purchase rate, stock on hand, rate, purchase rate)"""
+    rng = random.Random(seed)
+    rows = []
+    for item_id in range(1, count + 1):
+        rate = round(rng.uniform(1, 5000), 2)
+        purchase_rate = round(rate * rng.uniform(0.5, 0.9), 2)
+        stock = rng.randint(0, 500)
+        rows.append((item_id, f"Item {item_id} {rng.choice(['Bolt', 'Nut', 'Washer', 'Gear'])}",
+                     f"SKU-{item_id:06d}", f"Rs.{rate:,.2f}", f"Rs.{purchase_rate:,.2f}", stock, rate, purchase_rate))
+    return rows
+
+
+def best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 2)
+
+
+def run_backend(count, repeat):
+    """Time one backend (selected through JSON_BACKEND) in this process"""
+    import serialization
+    from flask import Flask
+
+    rows = make_rows(count)
+    items = [{"item_id": r[0], "name": r[1], "sku": r[2], "rate": r[6], "purchase rate": r[7],
+              "stock on hand": r[5]} for r in rows]
+    blob = serialization.dumps(items)
+    app = Flask(__name__)
+    app.json = serialization.FastJSONProvider(app)
+    notifies = [serialization.dumps({"TG_OP": "UPDATE", "item_id": r[0], "seq": r[0], "name": r[1], "sku": r[2],
+                                     "rate": r[3], "purchase rate": r[4], "stock on hand": r[5]}) for r in rows]
+    return {
+        "backend": serialization.BACKEND,
+        "payload_bytes": len(blob.encode()),
+        # Full cache rebuild, as snapshot_rows_to_cache_json(): every item encoded once for the hash, then joined
+        # for the legacy blob
+        "cache_rebuild_ms": best_of(lambda: serialization.join_array(
+            [serialization.encode_item(r[0], r[1], r[2], r[6], r[7], r[5]) for r in rows]), repeat),
+        "dumps_items_ms": best_of(lambda: serialization.dumps(items), repeat),
+        "flask_jsonify_ms": best_of(lambda: flask_jsonify(app, items), repeat),
+        "loads_items_ms": best_of(lambda: serialization.loads(blob), repeat),
+        "loads_notifications_ms": best_of(lambda: [serialization.loads(n) for n in notifies], repeat),
+    }
+
+
+def flask_jsonify(app, items):
+    with app.app_context():
+        return app.json.response(items).get_data()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the JSON backends on the bridge's item payloads")
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5, help="Best of this many runs")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_backend(args.items, args.repeat)))
+        return 0
+
+    # The backend is picked at import time, so each one runs in its own interpreter
+    results = {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "config": {"items": args.items, "repeat": args.repeat},
+        "backends": {},
+    }
+    for backend in args.backends.split(","):
+        env = dict(os.environ, JSON_BACKEND=backend, LOG_LEVEL="ERROR")
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", backend,
+                               "--items", str(args.items), "--repeat", str(args.repeat)],
+                              capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+        if proc.returncode != 0:
+            print(f"Serialization: {backend} failed:\n{proc.stderr}")
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        if result["backend"] != backend:
+            print(f"Serialization: {backend} is not installed, skipped.")
+            continue
+        results["backends"][backend] = result
+        print(f"Serialization: {backend}: " + ", ".join(f"{k} {v}" for k, v in result.items() if k != "backend"))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Serialization: results written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
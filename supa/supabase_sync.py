@@ -0,0 +1,254 @@
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+
+def _chunks(seq, size):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+class SupabaseBatchSyncer:
+    """Buffers item changes and sends them to Supabase in bulk.
+
+    Upserts go out as ``upsert(rows, on_conflict=<key>)`` and deletes as
+    ``delete().in_(<key>, ids)``. Changes to the same key are folded together
+    (last operation wins), and the buffer is flushed whenever it reaches
+    ``batch_size`` or ``flush_interval`` seconds after the first buffered change.
+    """
+
+    def __init__(self, client, table="items", key="item_id", batch_size=500, flush_interval=1.0,
+                 history_size=50):
+        self.client = client
+        self.table = table
+        self.key = key
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()  # one flush at a time, so batches are sent in order
+        self._upserts = {}
+        self._deletes = set()
+        self._received_at = {}  # key -> monotonic time the oldest buffered change was received
+        self._first_buffered_at = None
+        self._enqueued = 0  # changes buffered so far
+        self._sent_through = 0  # value of _enqueued at the start of the last fully successful flush
+        self._thread = None
+        self._stopped = False
+
+        self._history = deque(maxlen=history_size)
+        self._stats = {
+            "batches": 0,
+            "failed_batches": 0,
+            "rows_upserted": 0,
+            "rows_deleted": 0,
+            "batch_time_total": 0.0,
+            "last_lag_ms": 0.0,
+            "max_lag_ms": 0.0,
+        }
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"supabase-sync-{self.table}", daemon=True)
+            self._thread.start()
+
+    def _buffered(self):
+        return len(self._upserts) + len(self._deletes)
+
+    # Buffering
+    def enqueue_upsert(self, row, received_at=None):
+        """Buffer an insert/update of ``row``.
+
+        ``received_at`` (``time.monotonic()``) is when the change was first
+        observed; it is used to report the change-to-commit lag.
+        """
+        row = {k: v for k, v in row.items() if k != 'TG_OP'}
+        key = row[self.key]
+        with self._cond:
+            self._deletes.discard(key)
+            self._upserts[key] = row
+            self._track_received(key, received_at)
+            self._mark_buffered()
+
+    def enqueue_delete(self, key, received_at=None):
+        """Buffer a delete of the row identified by ``key``"""
+        with self._cond:
+            self._upserts.pop(key, None)
+            self._deletes.add(key)
+            self._track_received(key, received_at)
+            self._mark_buffered()
+
+    def _track_received(self, key, received_at):
+        self._received_at.setdefault(key, received_at if received_at is not None else time.monotonic())
+
+    def _mark_buffered(self, requeued=False):
+        if not requeued:
+            self._enqueued += 1
+        if self._first_buffered_at is None:
+            self._first_buffered_at = time.monotonic()
+        self._ensure_thread()
+        self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if self._buffered() >= self.batch_size:
+                        break
+                    if self._first_buffered_at is not None:
+                        remaining = self._first_buffered_at + self.flush_interval - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                if self._stopped:
+                    return
+            self.flush()
+
+    # Sending
+    def flush(self):
+        """Send everything currently buffered. Returns the number of rows sent"""
+        return self._flush()[0]
+
+    def drain(self):
+        """Send everything currently buffered. Returns True if every batch succeeded.
+
+        Anything enqueued before this call has reached Supabase once it returns True.
+        """
+        return self._flush()[1] == 0
+
+    def mark(self):
+        """Position covering every change enqueued so far; pass it to ``sent()``"""
+        with self._cond:
+            return self._enqueued
+
+    def sent(self, mark):
+        """Whether every change enqueued before ``mark()`` returned ``mark`` has reached Supabase. Never blocks"""
+        with self._cond:
+            return self._sent_through >= mark
+
+    def _flush(self):
+        with self._flush_lock:
+            with self._cond:
+                through = self._enqueued
+                upserts = list(self._upserts.values())
+                deletes = list(self._deletes)
+                received_at = self._received_at
+                self._upserts = {}
+                self._deletes = set()
+                self._received_at = {}
+                self._first_buffered_at = None
+
+            sent = failed = 0
+            for chunk in _chunks(upserts, self.batch_size):
+                oldest = min(received_at.get(row[self.key], time.monotonic()) for row in chunk)
+                if self._send("upsert", chunk, oldest):
+                    sent += len(chunk)
+                else:
+                    failed += len(chunk)
+                    self._requeue_upserts(chunk, received_at)
+            for chunk in _chunks(deletes, self.batch_size):
+                oldest = min(received_at.get(key, time.monotonic()) for key in chunk)
+                if self._send("delete", chunk, oldest):
+                    sent += len(chunk)
+                else:
+                    failed += len(chunk)
+                    self._requeue_deletes(chunk, received_at)
+            if not failed:
+                with self._cond:
+                    self._sent_through = max(self._sent_through, through)
+            return sent, failed
+
+    def _requeue_upserts(self, rows, received_at):
+        with self._cond:
+            for row in rows:
+                key = row[self.key]
+                if key not in self._deletes:
+                    self._upserts.setdefault(key, row)
+                self._track_received(key, received_at.get(key))
+            if self._buffered():
+                self._mark_buffered(requeued=True)
+
+    def _requeue_deletes(self, keys, received_at):
+        with self._cond:
+            for key in keys:
+                if key not in self._upserts:
+                    self._deletes.add(key)
+                self._track_received(key, received_at.get(key))
+            if self._buffered():
+                self._mark_buffered(requeued=True)
+
+    def _send(self, op, chunk, oldest_received_at=None):
+        start = time.monotonic()
+        try:
+            with metrics.span("supabase", op):
+                if op == "upsert":
+                    self.client.table(self.table).upsert(chunk, on_conflict=self.key).execute()
+                else:
+                    self.client.table(self.table).delete().in_(self.key, chunk).execute()
+            ok = True
+        except Exception as e:
+            log.error("Error sending %s batch of %s row(s) to Supabase: %s", op, len(chunk), e)
+            ok = False
+        end = time.monotonic()
+        duration_ms = (end - start) * 1000
+        metrics.inc("bridge_sync_batches_total", table=self.table, op=op, outcome="ok" if ok else "error")
+        if ok:
+            metrics.inc("bridge_sync_rows_total", len(chunk), table=self.table, op=op)
+
+        with self._cond:
+            self._stats["batches" if ok else "failed_batches"] += 1
+            if ok:
+                self._stats["rows_upserted" if op == "upsert" else "rows_deleted"] += len(chunk)
+                self._stats["batch_time_total"] += duration_ms
+                if oldest_received_at is not None:
+                    lag_ms = (end - oldest_received_at) * 1000
+                    self._stats["last_lag_ms"] = lag_ms
+                    self._stats["max_lag_ms"] = max(self._stats["max_lag_ms"], lag_ms)
+            self._history.append({"op": op, "rows": len(chunk), "duration_ms": duration_ms, "ok": ok})
+        if ok:
+            log.debug("Supabase %s batch: %d row(s) in %.1f ms", op, len(chunk), duration_ms)
+        return ok
+
+    def sync_all(self, rows, workers=1):
+        """Upsert ``rows`` in batches, ``workers`` batches at a time (used for initial loads and repairs). Returns rows sent"""
+        rows = [{k: v for k, v in row.items() if k != 'TG_OP'} for row in rows]
+        return self._send_all("upsert", rows, workers)
+
+    def delete_all(self, keys, workers=1):
+        """Delete the rows identified by ``keys`` in batches, ``workers`` batches at a time. Returns rows deleted"""
+        return self._send_all("delete", list(keys), workers)
+
+    def _send_all(self, op, items, workers):
+        chunks = list(_chunks(items, self.batch_size))
+        if workers <= 1 or len(chunks) <= 1:
+            return sum(len(chunk) for chunk in chunks if self._send(op, chunk))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"supabase-{op}") as executor:
+            results = executor.map(lambda chunk: len(chunk) if self._send(op, chunk) else 0, chunks)
+            return sum(results)
+
+    def stop(self, flush=True):
+        """Stop the background thread, optionally flushing what is still buffered"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        if flush:
+            self.flush()
+
+    def stats(self):
+        """Counters and recent per-batch timings"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats["buffered"] = self._buffered()
+            stats["avg_batch_ms"] = stats["batch_time_total"] / stats["batches"] if stats["batches"] else 0.0
+            stats["recent_batches"] = list(self._history)
+            return stats
@@ -0,0 +1,389 @@
+import json
+import time
+import select
+import threading
+import logging
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2 import sql
+
+import serialization
+from cache_backend import RedisItemCache
+from pipeline import ChangeEvent, ChangePipeline, SinkResync, RESYNC
+from rebuild_scheduler import RebuildScheduler
+from supabase_sync import SupabaseBatchSyncer
+
+log = logging.getLogger(__name__)
+
+# Column transforms available to table configs; more can be added with register_transform()
+TRANSFORMS = {
+    "int": lambda v: int(v) if v not in (None, "") else 0,
+    "float": lambda v: float(v) if v not in (None, "") else 0.0,
+    "str": lambda v: str(v) if v is not None else "",
+    "strip": lambda v: v.strip() if isinstance(v, str) else v,
+    "lower": lambda v: v.lower() if isinstance(v, str) else v,
+    "upper": lambda v: v.upper() if isinstance(v, str) else v,
+    # SKU cleanup: "(LP1001)" -> "LP1001"
+    "strip_parens": lambda v: v.replace("(", "").replace(")", "") if isinstance(v, str) else v,
+}
+
+
+def register_transform(name, fn):
+    """Make ``fn(value) -> value`` available to table configs as ``name``"""
+    TRANSFORMS[name] = fn
+
+
+class TableConfig:
+    """Declarative mapping of one Postgres table onto its Supabase table and Redis cache.
+
+    Built from one entry of the bridge tables config (``bridge_tables.json``)::
+
+        {"table": "public.vendors", "primary_key": "vendor_id",
+         "columns": ["vendor_id", "name", "code", "balance"],
+         "transforms": {"code": ["strip_parens", "upper"], "balance": "currency"},
+         "supabase_table": "vendors", "cache_key": "cache:vendors"}
+
+    ``columns`` limits what is mirrored (default: every column), ``transforms``
+    maps a column to one or more named transforms applied in order, and
+    ``supabase_table``/``cache_key`` may be null to skip that target. Tables
+    with ``"handler": "inventory"`` are served by the dedicated inventory path
+    in database_operations.py instead of the generic ``TableBridge``.
+    """
+
+    def __init__(self, entry, default_workers=2):
+        if "table" not in entry or "primary_key" not in entry:
+            raise ValueError(f"Bridge table config needs 'table' and 'primary_key': {entry}")
+        schema, _, table = entry["table"].rpartition(".")
+        self.schema = schema or "public"
+        self.table = table
+        self.name = f"{self.schema}.{self.table}"
+        self.primary_key = entry["primary_key"]
+        self.columns = entry.get("columns")
+        if self.columns is not None and self.primary_key not in self.columns:
+            raise ValueError(f"{self.name}: primary key '{self.primary_key}' must be one of the mirrored columns")
+        self.transforms = {}
+        for column, names in (entry.get("transforms") or {}).items():
+            names = [names] if isinstance(names, str) else list(names)
+            unknown = [name for name in names if name not in TRANSFORMS]
+            if unknown:
+                raise ValueError(f"{self.name}: unknown transform(s) {unknown} for column '{column}'")
+            self.transforms[column] = names
+        self.supabase_table = entry.get("supabase_table", self.table)
+        self.cache_key = entry.get("cache_key", f"cache:{self.table}")
+        self.channel = entry.get("channel", f"bridge_{self.table}")
+        self.handler = entry.get("handler")
+        self.workers = max(1, int(entry.get("workers", default_workers)))
+        self.batch_size = int(entry.get("batch_size", 500))
+        self.flush_interval = float(entry.get("flush_interval", 1.0))
+        self.install_trigger = bool(entry.get("install_trigger", True))
+
+    def mirror_row(self, row):
+        """Project a row image (column -> JSON value) onto the mirrored columns and apply the transforms"""
+        if self.columns is not None:
+            row = {column: row.get(column) for column in self.columns}
+        else:
+            row = dict(row)
+        for column, names in self.transforms.items():
+            if column in row:
+                value = row[column]
+                for name in names:
+                    value = TRANSFORMS[name](value)
+                row[column] = value
+        return row
+
+    def summary(self):
+        return {
+            "table": self.name,
+            "primary_key": self.primary_key,
+            "supabase_table": self.supabase_table,
+            "cache_key": self.cache_key,
+            "channel": self.channel,
+            "workers": self.workers,
+        }
+
+
+def load_table_configs(path, default_workers=2):
+    """Read the bridge tables config. Returns ``[TableConfig]`` (empty when the file does not exist)"""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return []
+    entries = data.get("tables", []) if isinstance(data, dict) else data
+    configs = [TableConfig(entry, default_workers) for entry in entries]
+    names = [config.name for config in configs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Bridge tables config lists {duplicates} more than once")
+    return configs
+
+
+class TableBridge:
+    """Mirrors one configured table into Supabase and a Redis hash.
+
+    Changes arrive as notifications from the generic trigger
+    (migrations/005_bridge_table_notify.sql). Each table has a pool of
+    ``config.workers`` pipelines; events are sharded by primary key, so
+    changes to one row stay in order while different rows are processed in
+    parallel. The Supabase syncer and the Redis cache are shared by the
+    shards. A dropped event, or a listener reconnect, schedules a full
+    resync of the table instead.
+    """
+
+    def __init__(self, config, pool, supabase_client=None, redis_client=None, queue_size=10000,
+                 put_timeout=0.1, resync_min_interval=30.0):
+        self.config = config
+        self.pool = pool
+        self.syncer = None
+        if supabase_client is not None and config.supabase_table:
+            self.syncer = SupabaseBatchSyncer(supabase_client, table=config.supabase_table, key=config.primary_key,
+                                              batch_size=config.batch_size, flush_interval=config.flush_interval)
+        self.cache = None
+        self.cache_scheduler = None
+        if redis_client is not None and config.cache_key:
+            self.cache = RedisItemCache(redis_client, hash_key=config.cache_key,
+                                        version_key=f"{config.cache_key}:version", key_field=config.primary_key)
+            self.cache_scheduler = RebuildScheduler(self.cache.flush, window=0.5, min_interval=1.0, max_delay=5.0,
+                                                    name=f"redis-cache-{config.table}")
+        self.resync_scheduler = RebuildScheduler(self.full_sync, window=1.0, min_interval=resync_min_interval,
+                                                 max_delay=resync_min_interval, name=f"resync-{config.table}")
+        # Rows whose Supabase change was dropped by a full sink are resent on their own
+        self.supabase_resync = SinkResync("supabase", self.pipeline_for, name=f"supabase-resync-{config.table}")
+
+        self.pipelines = []
+        for _ in range(config.workers):
+            pipeline = ChangePipeline(self.resolve, maxsize=queue_size, put_timeout=put_timeout,
+                                      on_overflow=self.request_resync, name=config.name)
+            if self.syncer:
+                pipeline.add_sink("supabase", self.supabase_sink, on_overflow=self.supabase_resync.mark)
+            if self.cache:
+                pipeline.add_sink("redis", self.redis_sink, on_overflow=self.request_resync)
+            self.pipelines.append(pipeline)
+        self.started = False
+
+        self._lock = threading.Lock()
+        self._stats = {
+            "events": 0,
+            "inserts": 0,
+            "updates": 0,
+            "deletes": 0,
+            "row_fetches": 0,
+            "full_syncs": 0,
+            "rows_loaded": 0,
+            "last_full_sync_ms": 0.0,
+        }
+
+    # SQL
+    def _table_sql(self):
+        return sql.Identifier(self.config.schema, self.config.table)
+
+    def ensure_trigger(self):
+        """(Re)create this table's notify trigger on the generic bridge_notify_table_change() function"""
+        trigger = sql.Identifier(f"bridge_notify_{self.config.table}")
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql.SQL("DROP TRIGGER IF EXISTS {} ON {};").format(trigger, self._table_sql()))
+                cur.execute(
+                    sql.SQL("CREATE TRIGGER {} AFTER INSERT OR UPDATE OR DELETE ON {} "
+                            "FOR EACH ROW EXECUTE FUNCTION bridge_notify_table_change({}, {});").format(
+                        trigger, self._table_sql(), sql.Literal(self.config.channel),
+                        sql.Literal(self.config.primary_key)),
+                )
+
+    def fetch_row(self, key):
+        """Read one row as a JSON row image (same shape as the trigger payload), or None"""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    sql.SQL("SELECT to_jsonb(t) FROM {} AS t WHERE {} = %s;").format(
+                        self._table_sql(), sql.Identifier(self.config.primary_key)),
+                    (key,),
+                )
+                row = cur.fetchone()
+        with self._lock:
+            self._stats["row_fetches"] += 1
+        return row[0] if row else None
+
+    def load_rows(self, batch_size=5000):
+        """Read every row of the table as mirrored rows"""
+        with self.pool.connection() as conn:
+            with conn.cursor(name=f"bridge_load_{self.config.table}") as cur:
+                cur.itersize = batch_size
+                cur.execute(sql.SQL("SELECT to_jsonb(t) FROM {} AS t;").format(self._table_sql()))
+                return [self.config.mirror_row(row[0]) for row in cur]
+
+    # Lifecycle
+    def start(self):
+        """Initial load, then start the workers (events received meanwhile are queued and replayed)"""
+        self.initial_load()
+        for pipeline in self.pipelines:
+            pipeline.start()
+        self.started = True
+        return self
+
+    def initial_load(self):
+        """Fill the Redis hash, and Supabase if its table is still empty"""
+        upsert_all = False
+        if self.syncer:
+            try:
+                response = (self.syncer.client.table(self.config.supabase_table)
+                            .select(self.config.primary_key, count='exact').limit(1).execute())
+                upsert_all = response.count == 0
+            except Exception as e:
+                log.error("Error checking Supabase table '%s': %s", self.config.supabase_table, e)
+        self.full_sync(upsert_all=upsert_all)
+
+    def full_sync(self, upsert_all=True):
+        """Reload the table from Postgres into the Redis hash (and Supabase when ``upsert_all``)"""
+        start = time.monotonic()
+        if self.cache:
+            # Before the read: anything staged from now on is newer than the rows and still gets flushed
+            self.cache.discard_pending()
+        rows = self.load_rows()
+        if self.syncer and upsert_all:
+            sent = self.syncer.sync_all(rows)
+            log.info("Bridge %s: upserted %s/%s row(s) to Supabase '%s'.", self.config.name, sent, len(rows), self.config.supabase_table)
+        if self.cache:
+            version = self.cache.replace_all(rows)
+            log.info("Bridge %s: cached %s row(s) to '%s' (version %s).", self.config.name, len(rows), self.cache.hash_key, version)
+        with self._lock:
+            self._stats["full_syncs"] += 1
+            self._stats["rows_loaded"] += len(rows)
+            self._stats["last_full_sync_ms"] = (time.monotonic() - start) * 1000
+
+    def request_resync(self, event=None):
+        """Schedule a full resync (events were dropped or may have been missed)"""
+        self.resync_scheduler.notify()
+
+    # Change handling
+    def submit_notification(self, payload, received_at=None):
+        """Decode a notification from the generic trigger and hand it to the key's shard"""
+        key = payload.get("key")
+        event = ChangeEvent(payload.get("TG_OP"), key, payload=payload, received_at=received_at)
+        return self.pipeline_for(key).submit(event)
+
+    def pipeline_for(self, key):
+        """The shard handling ``key``"""
+        return self.pipelines[hash(key) % len(self.pipelines)]
+
+    def resolve(self, event):
+        """Complete INSERT/UPDATE events with the mirrored row (from the payload, or read when it was too large)"""
+        payload = event.payload or {}
+        with self._lock:
+            self._stats["events"] += 1
+            counter = {"INSERT": "inserts", "UPDATE": "updates", "DELETE": "deletes"}.get(event.tg_op)
+            if counter:
+                self._stats[counter] += 1
+        if event.tg_op in ('INSERT', 'UPDATE') and event.item_id is not None:
+            row = payload.get("new")
+            if row is None:
+                row = self.fetch_row(event.item_id)
+                if row is None:
+                    return None  # deleted again before we got to it; the DELETE follows
+            event.item = self.config.mirror_row(row)
+        if payload.get("old"):
+            event.old_item = self.config.mirror_row(payload["old"])
+        return event
+
+    def supabase_sink(self, event):
+        if event.tg_op == RESYNC:
+            try:
+                row = self.fetch_row(event.item_id)
+            except Exception:
+                self.supabase_resync.mark(event)
+                raise
+            if row is not None:
+                self.syncer.enqueue_upsert(self.config.mirror_row(row), received_at=event.received_at)
+            else:
+                self.syncer.enqueue_delete(event.item_id, received_at=event.received_at)
+        elif event.tg_op == 'DELETE':
+            if event.item_id is not None:
+                self.syncer.enqueue_delete(event.item_id, received_at=event.received_at)
+        elif event.item:
+            self.syncer.enqueue_upsert(event.item, received_at=event.received_at)
+
+    def redis_sink(self, event):
+        if event.tg_op == 'DELETE':
+            self.cache.stage_delete(event.item_id)
+        elif event.item:
+            self.cache.stage_upsert(event.item)
+        self.cache_scheduler.notify()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(self.config.summary())
+        stats["started"] = self.started
+        stats["shards"] = [pipeline.stats() for pipeline in self.pipelines]
+        stats["supabase"] = self.syncer.stats() if self.syncer else None
+        stats["redis"] = self.cache_scheduler.stats() if self.cache_scheduler else None
+        stats["resync"] = self.resync_scheduler.stats()
+        stats["supabase_resync_pending"] = self.supabase_resync.pending()
+        return stats
+
+
+class MultiTableListener:
+    """One LISTEN connection for every bridged table, dispatching notifications by channel"""
+
+    def __init__(self, connect, bridges):
+        self.connect = connect
+        self.bridges = {bridge.config.channel: bridge for bridge in bridges}
+        self.listening = threading.Event()
+        self._stats = {"notifications": 0, "unknown_channel": 0, "errors": 0, "reconnects": 0}
+
+    def run(self):
+        """LISTEN and dispatch until the connection fails"""
+        conn = self.connect()
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        cur = conn.cursor()
+        try:
+            for channel in self.bridges:
+                cur.execute(sql.SQL("LISTEN {};").format(sql.Identifier(channel)))
+            log.info("Table bridge listener: listening on %s...", ', '.join(self.bridges))
+            self.listening.set()
+            while True:
+                if select.select([conn], [], [], 5) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    self.dispatch(notify.channel, notify.payload)
+        finally:
+            cur.close()
+            conn.close()
+            log.info("Table bridge listener: Stopped.")
+
+    def dispatch(self, channel, raw_payload):
+        bridge = self.bridges.get(channel)
+        if bridge is None:
+            self._stats["unknown_channel"] += 1
+            return
+        self._stats["notifications"] += 1
+        try:
+            bridge.submit_notification(serialization.loads(raw_payload), received_at=time.monotonic())
+        except Exception as e:
+            self._stats["errors"] += 1
+            log.error("Error handling notification on '%s': %s", channel, e)
+
+    def run_forever(self):
+        """``run()`` with reconnects; tables are resynced after a reconnect since notifications were missed"""
+        backoff = 1.0
+        while True:
+            started_at = time.monotonic()
+            try:
+                self.run()
+            except Exception as e:
+                log.error("Error in table bridge listener: %s", e)
+            self._stats["reconnects"] += 1
+            if time.monotonic() - started_at > 60:
+                backoff = 1.0
+            log.info("Table bridge listener: Reconnecting in %.0fs...", backoff)
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+            for bridge in self.bridges.values():
+                if bridge.started:
+                    bridge.request_resync()
+
+    def stats(self):
+        return dict(self._stats)
@@ -0,0 +1,21 @@
+"""WSGI entry point for production API workers.
+
+Run one worker process per port behind a load balancer with sticky sessions
+(Socket.IO long-polling needs them), all sharing SOCKETIO_MESSAGE_QUEUE so
+broadcasts reach every client, e.g.::
+
+    SOCKETIO_MESSAGE_QUEUE=redis://localhost:6379/0 gunicorn -w 1 --threads 100 -b :5001 wsgi:app
+
+Workers are stateless API servers unless BRIDGE_ROLE is ``all`` or
+``bridge``; then every worker also stands by for the bridge leader lock and
+exactly one of them runs the bridge.
+"""
+import os
+import threading
+
+from api import app, socketio  # noqa: F401
+from main import run_bridge
+
+if os.getenv("BRIDGE_ROLE", "api") in ("all", "bridge"):
+    threading.Thread(target=run_bridge, args=(os.getenv("BRIDGE_ENGINE", "threaded"), os.getenv("CHANGE_SOURCE", "listen")),
+                     name="bridge-leader", daemon=True).start()